@@ -2,6 +2,9 @@
  * _quiz2.js - Versão Definitiva v10
  * - Correção de Persistência em CH/CN/MT: Aplica offset (45/90/135) na chave de busca.
  * - Sincronia total entre checkAnswer (HTML) e checkStatistcs (JSON).
+ * - CCI desenhada no navegador (SVG) a partir de FIGS/<CO_PROVA>_estatisticas_<AMOSTRA>.json;
+ *   sem o JSON, os links abrem os PNGs.
+ * - Figuras e questões em WebP/AVIF com srcset quando FIGS/imagens.json (enem_imagens) existir.
  */
 
 var userAnswers = {};
@@ -336,13 +339,15 @@ function checkStatistcs(type) {
             // Lógica para TRI e BOX (Respeitando a regra do idioma)
             if (!isEspanhol) {
                 // Só cria o HTML se a variável tiver conteúdo (não for null ou string vazia)
-                if (triImg) linkTRI = '<a href="../FIGS/' + triImg + '" target="_blank">Ver</a>';
-                if (boxImg) linkBOX = '<a href="../FIGS/' + boxImg + '" target="_blank">Ver</a>';
+                // A CCI é desenhada no navegador (abrirItem) a partir do JSON de estatísticas do _05;
+                // sem o JSON, o link abre o PNG
+                if (triImg) linkTRI = linkItem("tri", triImg, triImg);
+                if (boxImg) linkBOX = linkItem("box", triImg, boxImg);
             }
 
             // A imagem da questão (dataImg)
             if (dataImg) {
-                linkQuestion = '<a href="../FIGS/' + dataImg + '" target="_blank">Ver</a>';
+                linkQuestion = linkImagem(dataImg);
             }
 
             // O arquivo de ajuda (helpFile)
@@ -375,6 +380,239 @@ function checkStatistcs(type) {
     }
 }
 
+// --- GRÁFICOS NO NAVEGADOR ---
+// FIGS/<CO_PROVA>_estatisticas_<AMOSTRA>.json (_05_matriz2graficos.py --saida json):
+// a, b, c, estatísticas e CCI empírica de cada item da prova, por q_id.
+
+var globalStats = {}; // Promise do JSON por "<CO_PROVA>_<AMOSTRA>"
+
+function linkItem(tipo, triImg, pngImg) {
+    // Link da tabela do relatório (janela aberta por checkStatistcs): chama abrirItem na página
+    return '<a href="../FIGS/' + pngImg + '" target="_blank" onclick="if (window.opener && window.opener.abrirItem) { ' +
+        'window.opener.abrirItem(\'' + tipo + '\', \'' + triImg + '\', \'' + pngImg + '\'); return false; }">Ver</a>';
+}
+
+function refFigura(triImg) {
+    // <CO_PROVA>_<q_id>_fig_tri_<AMOSTRA>.png (convenção do _02c_addJson.py)
+    var m = /^(.+?)_(\w+)_fig_tri_(\d+)\.png$/.exec(triImg || "");
+    return m ? { coProva: m[1], qId: m[2], amostra: m[3] } : null;
+}
+
+function carregarEstatisticas(coProva, amostra) {
+    var chave = coProva + "_" + amostra;
+    if (!globalStats[chave]) {
+        globalStats[chave] = fetch("../FIGS/" + coProva + "_estatisticas_" + amostra + ".json")
+            .then(function(response) {
+                if (!response.ok) throw new Error(response.status);
+                return response.json();
+            });
+        // Falha não fica no cache (o JSON pode ser gerado depois)
+        globalStats[chave].catch(function() { delete globalStats[chave]; });
+    }
+    return globalStats[chave];
+}
+
+function abrirItem(tipo, triImg, pngImg) {
+    var ref = refFigura(triImg);
+    var png = new URL("../FIGS/" + pngImg, document.baseURI).href;
+    // A janela é aberta já no clique (bloqueadores de pop-up) e preenchida depois do fetch
+    var win = window.open('', '_blank', 'height=780,width=1000,scrollbars=yes,resizable=yes');
+    if (!win) return;
+    if (!ref) { mostrarImagem(win, pngImg); return; }
+
+    carregarEstatisticas(ref.coProva, ref.amostra)
+        .then(function(stats) {
+            var item = stats.itens[ref.qId];
+            if (!item) throw new Error("q_id " + ref.qId + " ausente");
+            var titulo = "Questão " + ref.qId + " - " + stats.area + " (" + (stats.cor || "") + ")";
+            var grafico = (tipo === "tri") ? svgCCI(stats, item) : svgAcertos(item);
+            var html = '<html><head><meta charset="utf-8"><title>' + titulo + '</title><style type="text/css">' +
+                'body{font-family:Arial,sans-serif; background:#FDFCF6; color:#4a5568; padding:20px;}' +
+                '.painel{display:flex; gap:20px; align-items:flex-start;}' +
+                '.tg{border-collapse:collapse; font-size:13px; background:#fff;}' +
+                '.tg td, .tg th{border:1px solid #DDDDDD; padding:4px 8px; text-align:left;}' +
+                '.tg th{background-color:#f0f0f0;}' +
+                '.alerta{color:#E74C3C; font-weight:bold;}' +
+                '</style></head><body>';
+            html += '<h2>' + (tipo === "tri" ? "Curva Característica do Item (CCI) " : "Distribuição de Acertos ") + titulo + '</h2>';
+            html += '<div class="painel">' + grafico + tabelaItem(stats, item) + '</div>';
+            html += '<p><small><a href="' + png + '" target="_blank">Figura estática (PNG)</a></small></p>';
+            html += '</body></html>';
+            win.document.write(html);
+            win.document.close();
+        })
+        .catch(function(err) {
+            console.warn("Estatísticas indisponíveis, abrindo a figura:", err);
+            mostrarImagem(win, pngImg);
+        });
+}
+
+// --- IMAGENS OTIMIZADAS ---
+// FIGS/imagens.json (enem_imagens.py): formato e larguras das versões WebP/AVIF
+// gravadas ao lado de cada PNG ('fig' pelo _05, 'img_data' pelo _06b).
+
+var globalManifesto = null; // Promise do FIGS/imagens.json ({} se ausente)
+
+function carregarManifesto() {
+    if (!globalManifesto) {
+        globalManifesto = fetch("../FIGS/imagens.json")
+            .then(function(response) { return response.ok ? response.json() : {}; })
+            .catch(function() { return {}; });
+    }
+    return globalManifesto;
+}
+
+function linkImagem(pngImg) {
+    // Como linkItem: sem a página (janela órfã), o link abre o PNG
+    return '<a href="../FIGS/' + pngImg + '" target="_blank" onclick="if (window.opener && window.opener.abrirImagem) { ' +
+        'window.opener.abrirImagem(\'' + pngImg + '\'); return false; }">Ver</a>';
+}
+
+function htmlPicture(pngImg, config) {
+    // <BASE>.<FMT> e <BASE>_<L>w.<FMT> com as larguras reais de config.larguras; o PNG fica no <img>
+    var src = "../FIGS/" + pngImg;
+    var base = src.replace(/\.png$/, ""), fmt = config && config.formato;
+    var img = '<img src="' + src + '" style="max-width:100%; height:auto;" alt="' + pngImg + '">';
+    if (!fmt || fmt === "png") return img;
+    var versoes = (config.larguras || {})[pngImg.replace(/\.png$/, "")];
+    // Sem o registro (manifesto antigo): só a versão principal, sem descritor de largura
+    var candidatos = versoes ? versoes.map(function(v) { return base + v[0] + "." + fmt + " " + v[1] + "w"; })
+                             : [base + "." + fmt];
+    return '<picture><source type="image/' + fmt + '" srcset="' + candidatos.join(", ") + '" sizes="100vw">' + img + '</picture>';
+}
+
+function mostrarImagem(win, pngImg) {
+    var png = new URL("../FIGS/" + pngImg, document.baseURI).href;
+    carregarManifesto().then(function(manifesto) {
+        var config = manifesto[/_img_data\.png$/.test(pngImg) ? "img_data" : "fig"];
+        if (!config || config.formato === "png") { win.location.href = png; return; }
+        // Caminhos relativos da janela (about:blank) resolvidos pela página
+        var html = '<html><head><meta charset="utf-8"><title>' + pngImg + '</title>' +
+            '<base href="' + document.baseURI + '"></head><body style="margin:0; background:#FFFFFF;">' +
+            htmlPicture(pngImg, config) + '</body></html>';
+        win.document.write(html);
+        win.document.close();
+    });
+}
+
+function abrirImagem(pngImg) {
+    // Janela aberta já no clique (bloqueadores de pop-up), preenchida depois do manifesto
+    var win = window.open('', '_blank', 'height=800,width=900,scrollbars=yes,resizable=yes');
+    if (win) mostrarImagem(win, pngImg);
+}
+
+function probabilidade3PL(theta, a, b, c, D) {
+    return c + (1 - c) / (1 + Math.exp(-D * a * (theta - b)));
+}
+
+function svgCCI(stats, item) {
+    // Mesmos elementos e cores da CCI do _05 (plot_TRI)
+    var W = 640, H = 460, ml = 50, mr = 15, mt = 15, mb = 45;
+    var D = stats.D || 1.0, a = item.a, b = item.b, c = Math.max(0, Math.min(1, item.c));
+    var x = function(t) { return ml + (t + 4) / 8 * (W - ml - mr); };
+    var y = function(p) { return mt + (1.05 - p) / 1.07 * (H - mt - mb); };
+    var s = '<svg xmlns="http://www.w3.org/2000/svg" width="' + W + '" height="' + H + '" style="background:#FFFFFF">';
+    s += '<defs><clipPath id="area"><rect x="' + x(-4) + '" y="' + y(1.05) + '" width="' + (x(4) - x(-4)) + '" height="' + (y(-0.02) - y(1.05)) + '"/></clipPath></defs>';
+
+    // Grade e eixos
+    for (var t = -4; t <= 4; t++) {
+        s += '<line x1="' + x(t) + '" y1="' + y(-0.02) + '" x2="' + x(t) + '" y2="' + y(1.05) + '" stroke="#E5E7E9" stroke-dasharray="4,3"/>';
+        s += '<text x="' + x(t) + '" y="' + (y(-0.02) + 18) + '" font-size="12" text-anchor="middle" fill="#4a5568">' + t + '</text>';
+    }
+    for (var p = 0; p <= 1.0001; p += 0.2) {
+        s += '<line x1="' + x(-4) + '" y1="' + y(p) + '" x2="' + x(4) + '" y2="' + y(p) + '" stroke="#E5E7E9" stroke-dasharray="4,3"/>';
+        s += '<text x="' + (x(-4) - 6) + '" y="' + (y(p) + 4) + '" font-size="12" text-anchor="end" fill="#4a5568">' + p.toFixed(1) + '</text>';
+    }
+    s += '<line x1="' + x(-4) + '" y1="' + y(-0.02) + '" x2="' + x(4) + '" y2="' + y(-0.02) + '" stroke="#4a5568"/>';
+    s += '<line x1="' + x(-4) + '" y1="' + y(-0.02) + '" x2="' + x(-4) + '" y2="' + y(1.05) + '" stroke="#4a5568"/>';
+    s += '<text x="' + x(0) + '" y="' + (H - 8) + '" font-size="14" text-anchor="middle" fill="#4a5568">Habilidade (θ)</text>';
+
+    // Curva do modelo (com a área abaixo), assíntota c e dificuldade b
+    var pontos = [];
+    for (var k = 0; k <= 160; k++) {
+        var th = -4 + k * 0.05;
+        pontos.push(x(th).toFixed(1) + "," + y(probabilidade3PL(th, a, b, c, D)).toFixed(1));
+    }
+    s += '<polygon points="' + x(-4) + ',' + y(0) + ' ' + pontos.join(" ") + ' ' + x(4) + ',' + y(0) + '" fill="#7DCEA0" fill-opacity="0.15"/>';
+    s += '<line x1="' + x(-4) + '" y1="' + y(c) + '" x2="' + x(4) + '" y2="' + y(c) + '" stroke="#F7DC6F" stroke-width="2" stroke-dasharray="6,4"/>';
+    var yb = (1 + c) / 2;
+    if (b >= -4 && b <= 4) {
+        s += '<line x1="' + x(b) + '" y1="' + y(0) + '" x2="' + x(b) + '" y2="' + y(yb) + '" stroke="#85C1E9" stroke-width="2" stroke-dasharray="6,4"/>';
+    }
+    s += '<polyline points="' + pontos.join(" ") + '" fill="none" stroke="#7DCEA0" stroke-width="4"/>';
+
+    // Tangente no ponto de inflexão: inclinação D a (1 - c) / 4
+    var inclinacao = D * a * (1 - c) / 4;
+    s += '<line x1="' + x(b - 1.2) + '" y1="' + y(yb - 1.2 * inclinacao) + '" x2="' + x(b + 1.2) + '" y2="' + y(yb + 1.2 * inclinacao) +
+        '" stroke="#F1948A" stroke-width="3" stroke-opacity="0.8" clip-path="url(#area)"/>';
+
+    // CCI empírica: proporção de acerto por grupo (área ∝ nº de alunos)
+    if (stats.empirica && item.empirica) {
+        var n = stats.empirica.n, nMax = Math.max.apply(null, n);
+        for (var g = 0; g < n.length; g++) {
+            var tg = stats.empirica.theta[g], pg = item.empirica[g];
+            if (n[g] < stats.empirica.min_grupo || pg === null || tg < -4 || tg > 4) continue;
+            var r = Math.sqrt(20 + 80 * n[g] / nMax) / 2;
+            s += '<circle cx="' + x(tg) + '" cy="' + y(pg) + '" r="' + r.toFixed(1) + '" fill="#2E86C1" fill-opacity="0.9" stroke="#fff"/>';
+        }
+    }
+    if (b >= -4 && b <= 4) {
+        s += '<circle cx="' + x(b) + '" cy="' + y(yb) + '" r="6" fill="#E74C3C" stroke="#fff" stroke-width="2"/>';
+    }
+    s += '<text x="' + (x(-4) + 8) + '" y="' + (y(c) - 6) + '" font-size="12" font-weight="bold" fill="#4a5568">c=' + c.toFixed(2) + '</text>';
+    s += '</svg>';
+    return s;
+}
+
+function svgAcertos(item) {
+    // Itens 0/1: a distribuição de acertos se resume à proporção de acerto
+    var W = 640, H = 160, acerto = item.media || 0;
+    var s = '<svg xmlns="http://www.w3.org/2000/svg" width="' + W + '" height="' + H + '">';
+    s += '<rect x="0" y="40" width="' + (W * acerto).toFixed(1) + '" height="60" fill="rgba(168, 218, 181, 0.8)" stroke="#88B04B" stroke-width="2"/>';
+    s += '<rect x="' + (W * acerto).toFixed(1) + '" y="40" width="' + (W * (1 - acerto)).toFixed(1) + '" height="60" fill="#FFFFFF" stroke="#E5E7E9" stroke-width="2"/>';
+    s += '<text x="8" y="30" font-size="14" fill="#4a5568">Acertos: ' + (100 * acerto).toFixed(1) + '%</text>';
+    s += '<text x="' + (W - 8) + '" y="30" font-size="14" text-anchor="end" fill="#4a5568">Erros: ' + (100 * (1 - acerto)).toFixed(1) + '%</text>';
+    s += '</svg>';
+    return s;
+}
+
+function tabelaItem(stats, item) {
+    var f = function(v, casas) { return (v === null || v === undefined) ? "-" : Number(v).toFixed(casas); };
+    var linhas = '<tr><th colspan="2">Estatísticas</th></tr>' +
+        '<tr><td>Amostras</td><td>' + stats.amostra + '</td></tr>' +
+        '<tr><td>Média</td><td>' + f(item.media, 3) + '</td></tr>' +
+        '<tr><td>Mediana</td><td>' + f(item.mediana, 3) + '</td></tr>' +
+        '<tr><td>D.P.</td><td>' + f(item.dp, 3) + '</td></tr>' +
+        '<tr><th colspan="2">Parâmetros TRI' + (stats.modelo ? ' (' + stats.modelo + ')' : '') + '</th></tr>' +
+        '<tr><td>a</td><td>' + f(item.a, 3) + '</td></tr>' +
+        '<tr><td>b</td><td>' + f(item.b, 3) + '</td></tr>' +
+        '<tr><td>c</td><td>' + f(item.c, 3) + '</td></tr>';
+    if (item.ic) {
+        linhas += '<tr><th colspan="2">IC ' + Math.round(100 * stats.nivel_ic) + '% (bootstrap)</th></tr>';
+        ["a", "b", "c"].forEach(function(p) {
+            linhas += '<tr><td>' + p + '</td><td>[' + f(item.ic[p][0], 2) + '; ' + f(item.ic[p][1], 2) + ']</td></tr>';
+        });
+    }
+    if (item.ajuste) {
+        var aj = item.ajuste;
+        linhas += '<tr><th colspan="2">Ajuste do item</th></tr>' +
+            '<tr><td>S-X²</td><td>' + f(aj.S_X2, 1) + ' (gl ' + aj.gl + ', p=' + f(aj.p_SX2, 3) + ')</td></tr>' +
+            '<tr><td>Q3*</td><td>' + f(aj.Q3_max, 2) + ' (com ' + aj.Q3_par + ')</td></tr>';
+        var alertas = [];
+        if (aj.desajuste) alertas.push("desajuste");
+        if (aj.dependencia) alertas.push("dependência local");
+        if (alertas.length) linhas += '<tr><td colspan="2" class="alerta">ATENÇÃO: ' + alertas.join(" e ") + '</td></tr>';
+    }
+    if (item.ctt) {
+        linhas += '<tr><th colspan="2">TCT (todos os alunos)</th></tr>' +
+            '<tr><td>p</td><td>' + f(item.ctt.p, 3) + '</td></tr>' +
+            '<tr><td>r ponto-bisserial</td><td>' + f(item.ctt.r_pb, 3) + '</td></tr>' +
+            '<tr><td>r item-resto</td><td>' + f(item.ctt.r_item_resto, 3) + '</td></tr>' +
+            '<tr><td>alfa sem o item</td><td>' + f(item.ctt.alfa_sem_item, 3) + '</td></tr>';
+    }
+    return '<table class="tg">' + linhas + '</table>';
+}
+
 // --- CRONÔMETRO ---
 var timerInterval, startTime, elapsedTime = 0;
 function inicio() { if (!timerInterval) { startTime = Date.now() - elapsedTime; timerInterval = setInterval(updateTimer, 10); toggleBtn(true); } }
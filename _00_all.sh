@@ -10,6 +10,18 @@
 #   AMOSTRA  - Tamanho da amostra (padrão: 2000)
 #   TOP      - Nº de PDFs por dia (padrão: 2)
 #
+# Variáveis de ambiente opcionais:
+#   AMOSTRAGEM - primeiros (padrão) | reservatorio (amostra uniforme)
+#   SEMENTE    - semente do reservatório (padrão: 0)
+#   ADAPTATIVO - 1: AMOSTRA passa a ser o teto; o _04 usa só o necessário
+#                para estabilizar os itens de cada prova (padrão: 0)
+#   MODELO     - modelo TRI do _04: auto (padrão: 1PL/2PL/3PL escolhido por
+#                prova pelo BIC) | 1PL | 2PL | 3PL
+#   VIOLINO    - auto (padrão) | kaleido (plotly, requer Chrome) | matplotlib
+#   SAIDA      - png (padrão) | json (CCI desenhada na página) | ambos
+#   OPCOES_IMAGENS - opções de imagem do _05 e do _06b (enem_imagens), ex.:
+#                "--formato webp --largura-max 1200 --srcset 640 --orcamento-kb 120 --paleta"
+#
 # Exemplos:
 #   ./_00_all.sh 2020              # Usa padrões (2000, 2)
 #   ./_00_all.sh 2020 5000         # Amostra 5000, TOP 2
@@ -57,6 +69,13 @@ fi
 ANO="$1"
 AMOSTRA="${2:-2000}"  # Padrão: 2000
 TOP="${3:-2}"         # Padrão: 2
+AMOSTRAGEM="${AMOSTRAGEM:-primeiros}"  # primeiros | reservatorio (variável de ambiente)
+SEMENTE="${SEMENTE:-0}"                # semente do reservatório
+ADAPTATIVO="${ADAPTATIVO:-0}"          # 1: amostra adaptativa no _04 (AMOSTRA = teto)
+MODELO="${MODELO:-auto}"               # modelo TRI do _04: auto (seleção por BIC) | 1PL | 2PL | 3PL
+VIOLINO="${VIOLINO:-auto}"             # motor dos violinos do _05: auto | kaleido | matplotlib
+SAIDA="${SAIDA:-png}"                  # saída do _05: png | json | ambos
+export OPCOES_IMAGENS="${OPCOES_IMAGENS:-}"  # WebP/AVIF, largura, paleta, orçamento e srcset (_05 e _06b)
 
 # Valida se ANO é número
 if ! [[ "$ANO" =~ ^[0-9]{4}$ ]]; then
@@ -119,6 +138,12 @@ fi
 log_info "Validando estrutura de pastas: \npython3 _00_enem_config.py --validate $ANO"
 python3 _00_enem_config.py --validate "$ANO"
 
+# Cache Parquet dos microdados (conversão única; _01a e _03 passam a usá-lo)
+log_info "Convertendo microdados para Parquet: \npython3 enem_microdados.py $ANO"
+if ! python3 enem_microdados.py "$ANO"; then
+    log_warning "Conversão Parquet falhou (pyarrow instalado?). Usando o CSV original."
+fi
+
 # ==================== ETAPA 2: LIMPEZA DE PROVAS ====================
 
 echo ""
@@ -130,8 +155,8 @@ if [ ! -d "$DIR_ORIGEM" ]; then
     log_error "Diretório de provas não encontrado: $DIR_ORIGEM"
 fi
 
-log_info "Gerarndo top ranking das provas: \npython3 _01a_gerar_json_ranking.py $ANO"
-python3 _01a_gerar_json_ranking.py "$ANO" 
+log_info "Gerarndo top ranking das provas (e amostras do _03): \npython3 _01a_gerar_json_ranking.py $ANO $AMOSTRA $AMOSTRAGEM $SEMENTE"
+python3 _01a_gerar_json_ranking.py "$ANO" "$AMOSTRA" "$AMOSTRAGEM" "$SEMENTE"
 log_success "Ranking concluído e salvo em "$ANO"/DADOS/ranking_provas.csv"
 
 log_info "Selecionando top $TOP provas por dia: \npython3 _01b_limpar_provas.py $ANO $TOP"
@@ -163,16 +188,30 @@ echo "======================================================================"
 echo "📊 ETAPA 4/5: ANÁLISE ESTATÍSTICA E TRI"
 echo "======================================================================"
 
-log_info "Extraindo matrizes de resposta: \npython3 _03_enem2matriz.py $ANO $AMOSTRA"
-python3 _03_enem2matriz.py "$ANO" "$AMOSTRA"
+log_info "Extraindo matrizes de resposta: \npython3 _03_enem2matriz.py $ANO $AMOSTRA --amostragem $AMOSTRAGEM --semente $SEMENTE"
+python3 _03_enem2matriz.py "$ANO" "$AMOSTRA" --amostragem "$AMOSTRAGEM" --semente "$SEMENTE"
 
-log_info "Calculando parâmetros TRI (Modelo 3PL): \npython3 _04_matriz2TRI.py $ANO"
 # muito lento para grandes amostras
-python3 _04_matriz2TRI.py "$ANO"
+if [ "$ADAPTATIVO" = "1" ]; then
+    log_info "Calculando parâmetros TRI (modelo $MODELO, amostra adaptativa até $AMOSTRA): \npython3 _04_matriz2TRI.py $ANO --modelo $MODELO --adaptativo --amostra $AMOSTRA"
+    python3 _04_matriz2TRI.py "$ANO" --modelo "$MODELO" --adaptativo --amostra "$AMOSTRA"
+    # Figuras e estatísticas de cada prova levam a AMOSTRA final dela
+    log_info "Atualizando estrutura de imagens (AMOSTRA final por prova): \npython3 _02c_addJson.py $ANO $AMOSTRA"
+    python3 _02c_addJson.py "$ANO" "$AMOSTRA"
+else
+    log_info "Calculando parâmetros TRI (modelo $MODELO): \npython3 _04_matriz2TRI.py $ANO --modelo $MODELO"
+    python3 _04_matriz2TRI.py "$ANO" --modelo "$MODELO"
+fi
+
+log_info "Calculando escores θ de todos os alunos (EAP/MAP): \npython3 _04b_tri2theta.py $ANO"
+python3 _04b_tri2theta.py "$ANO"
+
+log_info "Calculando TCT de todos os alunos (p, ponto-bisserial, alfa): \npython3 _04d_enem2CTT.py $ANO"
+python3 _04d_enem2CTT.py "$ANO"
 
-log_info "Gerando gráficos (CCI e Boxplot): \npython3 _05_matriz2graficos.py $ANO"
+log_info "Gerando gráficos (CCI e Boxplot): \npython3 _05_matriz2graficos.py $ANO --violino $VIOLINO --saida $SAIDA $OPCOES_IMAGENS"
 # muito lento para grandes amostras
-python3 _05_matriz2graficos.py "$ANO"
+python3 _05_matriz2graficos.py "$ANO" --violino "$VIOLINO" --saida "$SAIDA" $OPCOES_IMAGENS
 
 log_success "Análises concluídas"
 
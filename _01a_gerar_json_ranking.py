@@ -5,6 +5,7 @@ import sys
 import glob
 from sklearn.cluster import KMeans
 import numpy as np
+from enem_microdados import buscar_path_microdados, contar_provas, varrer_microdados, salvar_amostras
 
 def carregar_itens_mapeamento(ano):
     """Lê o CSV de itens para traduzir o ID da prova em Cor, Dia, Área e Posição."""
@@ -75,46 +76,41 @@ def listar_pdfs_disponiveis(ano):
         })
     return lista_pdfs
 
-def gerar_json_ranking(ano):
+def gerar_json_ranking(ano, amostra_alvo=None, metodo='primeiros', semente=0):
+    """
+    Gera ranking_provas_<ANO>.json. Com `amostra_alvo`, a mesma varredura dos
+    microdados também coleta as amostras de respostas usadas pelo _03
+    (salvas em ENEM/<ANO>/DADOS/amostras_respostas_<AMOSTRA>.json), pelo
+    `metodo` de amostragem "primeiros" ou "reservatorio" (com `semente`).
+    Retorna (lista_final, amostras) — amostras é None sem `amostra_alvo`.
+    """
     # 1. Definição de caminhos e busca flexível do arquivo
+    # Prefere o cache Parquet (enem_microdados.py); cai para o CSV (Padrão Antigo e Novo)
     dados_dir = os.path.join(ano, "DADOS")
-    
-    # Lista de nomes possíveis para os microdados (Padrão Antigo e Novo)
-    nomes_possiveis = [
-        f"MICRODADOS_ENEM_{ano}.csv",
-        f"RESULTADOS_{ano}.csv"
-    ]
-    
-    path_microdados = None
-    for nome in nomes_possiveis:
-        tentativa = os.path.join(dados_dir, nome)
-        if os.path.exists(tentativa):
-            path_microdados = tentativa
-            print(f"📖 Microdados encontrados: {path_microdados}")
-            break
+    path_microdados = buscar_path_microdados(ano)
 
     if not path_microdados:
         print(f"❌ Erro: Nenhum arquivo de microdados encontrado em {dados_dir}.")
-        print(f"   Procurados: {', '.join(nomes_possiveis)}")
-        return
+        print(f"   Procurados: MICRODADOS_ENEM_{ano}.csv, RESULTADOS_{ano}.csv")
+        return None, None
+    print(f"📖 Microdados encontrados: {path_microdados}")
 
     # Carrega metadados e lista arquivos físicos
     id_map = carregar_itens_mapeamento(ano) or {}
     pdfs_fisicos = listar_pdfs_disponiveis(ano)
 
     print(f"⏳ Processando microdados de {ano}...")
-    cols = ['CO_PROVA_CN', 'CO_PROVA_CH', 'CO_PROVA_LC', 'CO_PROVA_MT']
-    
-    # Leitura dos microdados usando o path_microdados definido acima
-    # Adicionado low_memory=False para evitar warnings em arquivos grandes
-    df = pd.read_csv(path_microdados, sep=';', encoding='latin1', usecols=cols, low_memory=False)
-    
-    counts_dict = {}
-    for col in cols:
-        counts = df[col].dropna().value_counts().to_dict()
-        for pid, qtd in counts.items():
-            pid_str = str(int(pid))
-            counts_dict[pid_str] = counts_dict.get(pid_str, 0) + qtd
+    amostras = None
+    if amostra_alvo:
+        # Varredura única: contagem do ranking + amostras para o _03
+        counts_dict, amostras = varrer_microdados(path_microdados, amostra_alvo, lingua=0,
+                                                  metodo=metodo, semente=semente)
+        path_amostras = salvar_amostras(ano, amostra_alvo, amostras, path_microdados, lingua=0,
+                                        metodo=metodo, semente=semente)
+        print(f"📦 Amostras de {amostra_alvo} alunos/prova salvas em: {path_amostras}")
+    else:
+        # Contagem por CO_PROVA: no Parquet lê apenas a coluna de partição
+        counts_dict = contar_provas(path_microdados)
 
     # 1. Preparar dados para o Ranking e Clusterização
     ranking_raw = []
@@ -137,7 +133,7 @@ def gerar_json_ranking(ano):
 
     if not ranking_raw:
         print("⚠️ Nenhum dado encontrado.")
-        return
+        return None, amostras
 
     # 2. LÓGICA DE CLUSTERIZAÇÃO (K-Means)
     X = np.array(volumes).reshape(-1, 1)
@@ -176,7 +172,14 @@ def gerar_json_ranking(ano):
         json.dump(lista_final, f, indent=4, ensure_ascii=False)
 
     print(f"✅ Sucesso! JSON salvo em: {output_path}")
+    return lista_final, amostras
 
 if __name__ == "__main__":
     if len(sys.argv) > 1:
-        gerar_json_ranking(sys.argv[1])
\ No newline at end of file
+        # AMOSTRA opcional: ativa a varredura única (ranking + amostras do _03)
+        amostra = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        metodo  = sys.argv[3] if len(sys.argv) > 3 else 'primeiros'
+        semente = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+        gerar_json_ranking(sys.argv[1], amostra, metodo, semente)
+    else:
+        print("Uso: python _01a_gerar_json_ranking.py <ANO> [AMOSTRA] [primeiros|reservatorio] [SEMENTE]")
\ No newline at end of file
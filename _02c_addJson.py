@@ -17,6 +17,16 @@ CONVENÇÃO DE NOMES — IMAGENS EM ENEM/<ANO>/FIGS/
  <CO_PROVA>_<NNN>_fig_tri_<AMOSTRA>.png   ← curva TRI   (varia por amostra)
  <CO_PROVA>_<NNN>_img_data.png            ← fatia prova (independe de amostra)
  <CO_PROVA>_<NNN>_help.html               ← ajuda contextual (independe de amostra)
+ <CO_PROVA>_estatisticas_<AMOSTRA>.json   ← a, b, c e estatísticas da prova (_05 --saida json);
+                                            a página desenha a CCI e usa os PNGs se ele faltar
+ <CO_PROVA>_fig_teste_<AMOSTRA>.png      ← informação, erro-padrão e escore esperado da prova (_05)
+ <CO_PROVA>_curvas_teste_<AMOSTRA>.json  ← as mesmas curvas na grade de θ, para a página
+ <BASE>.webp|avif, <BASE>_<L>w.webp|avif  ← versões otimizadas de cada PNG (enem_imagens.py),
+                                            descritas em imagens.json; o JSON segue com o PNG
+
+Com a amostra adaptativa (_04 --adaptativo), a AMOSTRA de cada prova é a
+final dela, lida de DADOS/MATRIZ/amostras_adaptativas.json (a AMOSTRA pedida
+vale só para as provas sem registro).
 
 NNN é exatamente a chave q_id do JSON:
 
@@ -38,9 +48,26 @@ import json
 import sys
 import os
 
+def amostras_adaptativas(ano, amostra_str):
+    """{co_prova: AMOSTRA final} das provas ajustadas pelo _04 --adaptativo a partir da AMOSTRA pedida."""
+    dir_matriz = os.path.join('ENEM', ano, 'DADOS', 'MATRIZ')
+    caminho = os.path.join(dir_matriz, 'amostras_adaptativas.json')
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, 'r', encoding='utf-8') as f:
+        registro = json.load(f)
+    finais = {}
+    for co_prova, info in registro.items():
+        # Só vale se veio da matriz desta AMOSTRA e o ajuste final ainda existe
+        origem_amostra = info.get('origem', '').split('_')[1:2]
+        if origem_amostra == [amostra_str] and os.path.exists(os.path.join(dir_matriz, info.get('matriz', ''))):
+            finais[co_prova] = str(info['amostra_final']).zfill(6)
+    return finais
+
 def alteraChave(ano, amostra_raw):
     CHAVE = 'images'
     amostra_str = str(amostra_raw).zfill(6) # Ex: 000100
+    finais = amostras_adaptativas(ano, amostra_str)
     
     arquivo_json = os.path.join('ENEM', ano, 'DADOS', f'ITENS_PROVA_{ano}.json')
 
@@ -49,6 +76,8 @@ def alteraChave(ano, amostra_raw):
         return
 
     print(f"Processando {ano} com amostra {amostra_str} em: {arquivo_json}")
+    if finais:
+        print(f"   ↪ {len(finais)} provas com a AMOSTRA final da amostra adaptativa")
 
     with open(arquivo_json, 'r', encoding='utf-8') as f:
         data = json.load(f)
@@ -56,6 +85,7 @@ def alteraChave(ano, amostra_raw):
     # Percorre cada prova no JSON de itens
     for co_prova in data:
         questions = data[co_prova].get('QUESTIONS', {})
+        amostra_prova = finais.get(str(co_prova), amostra_str)
         for q_id in questions:
             # Limpa a lista para evitar duplicações em re-execuções
             questions[q_id][CHAVE] = []
@@ -64,8 +94,8 @@ def alteraChave(ano, amostra_raw):
             nnn = q_id 
             
             # Montagem dos nomes seguindo a nova convenção: <CO_PROVA>_<NNN>_fig_...
-            f_tri  = f"{co_prova}_{nnn}_fig_tri_{amostra_str}.png"
-            f_box  = f"{co_prova}_{nnn}_fig_box_{amostra_str}.png"
+            f_tri  = f"{co_prova}_{nnn}_fig_tri_{amostra_prova}.png"
+            f_box  = f"{co_prova}_{nnn}_fig_box_{amostra_prova}.png"
             f_data = f"{co_prova}_{nnn}_img_data.png"
             f_help = f"{co_prova}_{nnn}_help.html"
 
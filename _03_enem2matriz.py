@@ -42,21 +42,19 @@ O casamento correto para aluno de Inglês seria:
 '''
 
 import pandas as pd
-import sys
 import os
 import json
 import warnings
 
+# Busca prefere o cache Parquet (enem_microdados.py) e cai para o CSV
+from enem_microdados import (buscar_path_microdados, coletar_respostas, carregar_amostras,
+                             descrever_amostragem, METODOS_AMOSTRAGEM)
+from enem_matriz import (pontuar_respostas, salvar_matriz, salvar_cabecalho, salvar_padroes,
+                         hash_gabarito, agrupar_cores, montar_gabarito)
+
 # Silencia avisos de performance do pandas
 warnings.filterwarnings("ignore")
 
-def buscar_path_microdados(ano):
-    """Garante a busca no caminho correto sem o prefixo ENEM"""
-    caminho = os.path.join(ano, "DADOS", f"RESULTADOS_{ano}.csv")
-    if not os.path.exists(caminho):
-        caminho = os.path.join(ano, "DADOS", f"MICRODADOS_ENEM_{ano}.csv")
-    return caminho if os.path.exists(caminho) else None
-
 def carregar_mapa_provas(ano):
     path = os.path.join("ENEM", ano, "DADOS", "mapa_provas.json")
     if os.path.exists(path):
@@ -73,7 +71,20 @@ def carregar_id_map(ano):
         ranking = json.load(f)
     return {item['co_prova']: item for item in ranking}
 
-def processar_matrizes(ano, amostra_alvo):
+def processar_matrizes(ano, amostra_alvo, amostras=None, formato="npy", workers=1,
+                       metodo="primeiros", semente=0, agrupar=False):
+    """
+    `amostras` ({pid: [respostas]}) permite reaproveitar, no mesmo processo, a
+    varredura feita por gerar_json_ranking(ano, amostra_alvo). Sem ela, tenta o
+    arquivo salvo por essa varredura e, por último, lê os microdados.
+    `formato`: "npy" (bits compactados + cabeçalho JSON, ver enem_matriz.py) ou "csv" (legado).
+    `workers` > 1 lê o CSV em intervalos de bytes paralelos (mesmo resultado da leitura serial).
+    `metodo`: "primeiros" (primeiras AMOSTRA respostas em ordem de arquivo) ou
+    "reservatorio" (amostra uniforme reprodutível pela `semente`). O método e a
+    semente ficam registrados no cabeçalho JSON de cada matriz.
+    `agrupar`: também gera, por área, a matriz agrupada por CO_ITEM com os alunos
+    de todas as cores (enem_matriz.agrupar_cores), calibrada uma única vez no _04.
+    """
     path_dados = buscar_path_microdados(ano)
     mapa_top   = carregar_mapa_provas(ano)
 
@@ -122,37 +133,18 @@ def processar_matrizes(ano, amostra_alvo):
         print(f"❌ Erro: Nenhum pid com área reconhecida. Verifique ranking_provas_{ano}.json.")
         return
 
-    amostras_coletadas = {pid: [] for pid in pid_para_colunas}
-
-    print(f"🚀 Lendo: {path_dados}")
-    print(f"🚀 Coletando amostra de {amostra_alvo} alunos p/ cada prova TOP (Somente Inglês)...")
-
-    # Chunking para performance
-    reader = pd.read_csv(path_dados, sep=';', encoding='latin1', chunksize=100000, low_memory=False)
-
-    for chunk in reader:
-        # FILTRO: Somente Inglês
-        if 'TP_LINGUA' in chunk.columns:
-            chunk = chunk[chunk['TP_LINGUA'] == 0]
-
-        if chunk.empty:
-            continue
-
-        # Cada pid sabe exatamente qual coluna usar — sem testar as 4 áreas
-        for pid, (cp, cr) in pid_para_colunas.items():
-            if len(amostras_coletadas[pid]) >= amostra_alvo:
-                continue
-
-            # Robustez: converte float -> int -> str para evitar "1395.0"
-            mask  = chunk[cp].fillna(-1).astype(int).astype(str) == pid
-            resps = chunk.loc[mask, cr].dropna().tolist()
+    if amostras is None:
+        amostras = carregar_amostras(ano, amostra_alvo, lingua=0, metodo=metodo, semente=semente)
 
-            vagas = amostra_alvo - len(amostras_coletadas[pid])
-            amostras_coletadas[pid].extend(resps[:vagas])
-
-        # Para se já atingiu a amostra em todas as provas
-        if all(len(amostras_coletadas[pid]) >= amostra_alvo for pid in pid_para_colunas):
-            break
+    if amostras is not None:
+        print(f"♻️  Reutilizando amostras da varredura do ranking ({amostra_alvo} alunos/prova, Somente Inglês)")
+        amostras_coletadas = {pid: amostras.get(pid, [])[:amostra_alvo] for pid in pid_para_colunas}
+    else:
+        print(f"🚀 Lendo: {path_dados}")
+        print(f"🚀 Coletando amostra ({metodo}) de {amostra_alvo} alunos p/ cada prova TOP (Somente Inglês)...")
+        amostras_coletadas = coletar_respostas(path_dados, pid_para_colunas, amostra_alvo,
+                                               lingua=0, workers=workers,
+                                               metodo=metodo, semente=semente)
 
     # --- GERAÇÃO DAS MATRIZES BINÁRIAS ---
     dir_matriz = os.path.join("ENEM", ano, "DADOS", "MATRIZ")
@@ -169,30 +161,60 @@ def processar_matrizes(ano, amostra_alvo):
         # LÓGICA DO GABARITO:
         # Como filtramos por Inglês, ignoramos as chaves de Espanhol ("01" a "05")
         # para que o tamanho do gabarito (45) bata com a string TX_RESPOSTAS_LC (45)
-        chaves_validas = [k for k in questions.keys() if k not in ["01", "02", "03", "04", "05"]]
-        chaves_ord     = sorted(chaves_validas, key=lambda x: int(x))
+        gabarito, chaves_ord = montar_gabarito(questions)
 
-        gabarito = "".join([questions[k]['answer'] for k in chaves_ord])
+        # Compara resposta do aluno com gabarito (Matriz de Acertos, uint8 vetorizado)
+        matriz_bin, _ = pontuar_respostas(resps, gabarito)
 
-        # Compara resposta do aluno com gabarito (Matriz de Acertos)
-        matriz_bin = []
-        for r in resps:
-            if len(r) == len(gabarito):
-                linha = [1 if a == b else 0 for a, b in zip(r, gabarito)]
-                matriz_bin.append(linha)
-
-        if matriz_bin:
+        if len(matriz_bin):
             amostra_str = str(amostra_alvo).zfill(6)
-            nome_arq    = f"{pid}_{amostra_str}_data.csv"
-            pd.DataFrame(matriz_bin).to_csv(
-                os.path.join(dir_matriz, nome_arq), index=False, header=False
-            )
-            print(f"✅ Matriz salva: {nome_arq} ({len(matriz_bin)} alunos)")
+            nome_base   = f"{pid}_{amostra_str}_data"
+            # Tabela de padrões distintos (+ contagens) usada pela estimação TRI do _04
+            n_padroes = salvar_padroes(os.path.join(dir_matriz, nome_base), matriz_bin)
+            meta = dict(co_prova=pid, sg_area=id_map.get(pid, {}).get('sg_area'),
+                        lingua=0, amostra=amostra_alvo,
+                        gabarito_sha1=hash_gabarito(gabarito),
+                        amostragem=descrever_amostragem(metodo, semente),
+                        n_padroes=n_padroes,
+                        # CO_ITEM de cada coluna: liga o mesmo item entre cadernos (cores)
+                        co_itens=[str(questions[k]['id']) for k in chaves_ord])
+            if formato == "csv":
+                nome_arq = f"{nome_base}.csv"
+                pd.DataFrame(matriz_bin).to_csv(
+                    os.path.join(dir_matriz, nome_arq), index=False, header=False
+                )
+                salvar_cabecalho(os.path.join(dir_matriz, nome_base), matriz_bin.shape,
+                                 formato='csv', **meta)
+            else:
+                nome_arq = os.path.basename(salvar_matriz(
+                    os.path.join(dir_matriz, nome_base), matriz_bin, **meta
+                ))
+            print(f"✅ Matriz salva: {nome_arq} ({len(matriz_bin)} alunos, {n_padroes} padrões distintos)")
         else:
             print(f"⚠️  Prova {pid}: Nenhuma resposta com tamanho compatível com o gabarito ({len(gabarito)}).")
 
+    if agrupar:
+        for caminho in agrupar_cores(dir_matriz, amostra_alvo):
+            print(f"🧩 Matriz agrupada por CO_ITEM: {os.path.basename(caminho)}")
+
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Uso: python _03_enem2matriz.py <ANO> <AMOSTRA>")
-    else:
-        processar_matrizes(sys.argv[1], int(sys.argv[2]))
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Gera as matrizes de acertos das provas TOP')
+    parser.add_argument('ano', help='Ano do ENEM')
+    parser.add_argument('amostra', type=int, help='Alunos por prova')
+    parser.add_argument('--formato', choices=['npy', 'csv'], default='npy',
+                        help='npy: bits compactados + cabeçalho JSON (padrão) | csv: texto legado')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processos para ler o CSV de microdados em paralelo (padrão: 1)')
+    parser.add_argument('--amostragem', choices=METODOS_AMOSTRAGEM, default='primeiros',
+                        help='primeiros: ordem do arquivo (padrão) | reservatorio: amostra uniforme com semente')
+    parser.add_argument('--semente', type=int, default=0,
+                        help='Semente do reservatório (mesma semente → mesma matriz)')
+    parser.add_argument('--agrupar-cores', action='store_true',
+                        help='Gera também a matriz por CO_ITEM com todas as cores de cada área '
+                             '(uma calibração e um conjunto de figuras por item)')
+    args = parser.parse_args()
+
+    processar_matrizes(args.ano, args.amostra, formato=args.formato, workers=args.workers,
+                       metodo=args.amostragem, semente=args.semente, agrupar=args.agrupar_cores)
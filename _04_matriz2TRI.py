@@ -1,190 +1,320 @@
-import sys
-import subprocess
 import os
-import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 
-# Obter o ano da linha de comando
-ano = sys.argv[1] if len(sys.argv) > 1 else "2019"
-
-# --- CAMINHOS (Mantendo sua estrutura original) ---
-input_dir = f"./ENEM/{ano}/DADOS/MATRIZ"
-# --------------------------------------------------
-
-# Ajuste no Pattern: Buscamos especificamente as matrizes geradas pelo script 03
-# Elas terminam com "_data.csv" (ex: 512_010000_data.csv)
-pattern = os.path.join(input_dir, "*_data.csv")
-all_files = glob.glob(pattern)
-
-# Filtrar arquivos para processamento
-file_list = []
-for f in all_files:
-    # Definimos o nome do arquivo de saída esperado
-    tri_file = f.replace("_data.csv", "_TRI.csv")
-    
-    # Só adiciona à fila se o arquivo TRI ainda não existir
-    if not os.path.exists(tri_file):
-        file_list.append(f)
-
-total_files = len(file_list)
-
-print(f"=" * 60)
-print(f"Processando TRI - ENEM {ano}")
-print(f"Diretório: {input_dir}")
-print(f"Matrizes encontradas para processar: {total_files}")
-print(f"=" * 60)
-
-if total_files == 0:
-    print("Nenhuma matriz nova encontrada. Certifique-se de que os arquivos terminam em '_data.csv'.")
-    sys.exit(0)
-
-# Código R (Mantido igual, mas a string de regex foi ajustada para segurança)
-r_script = f"""
-# Função para instalar pacotes se necessário
-ensure_package <- function(pkg) {{
-    if (!require(pkg, character.only = TRUE)) {{
-        cat(sprintf("INSTALLING:%s\\n", pkg))
-        install.packages(pkg, repos = "https://cloud.r-project.org/", quiet = FALSE)
-        if (!require(pkg, character.only = TRUE)) {{
-            stop(paste("Falha ao instalar pacote:", pkg))
-        }}
-    }}
-}}
-
-tryCatch({{
-    ensure_package("ltm")
-    ensure_package("irtoys")
-    ensure_package("data.table")
-}}, error = function(e) {{
-    cat(sprintf("FATAL_ERROR:Erro na instalacao de pacotes: %s\\n", e$message))
-    quit(save="no", status=1)
-}})
-
-suppressMessages({{
-  library(ltm)
-  library(irtoys)
-  library(data.table)
-}})
-
-setDTthreads(1) # Usar 1 thread para evitar conflitos em subprocessos simples
-
-# Busca na pasta ENEM/ANO/DADOS/MATRIZ
-path_pattern <- "./ENEM/{ano}/DADOS/MATRIZ/*_data.csv"
-all_files <- Sys.glob(path_pattern)
-# FILTRO: Só coloca na lista se o arquivo _TRI.csv correspondente NÃO existir
-file_list <- Filter(function(f) !file.exists(sub("\\\\.csv$", "_TRI.csv", f)), all_files)
-
-total <- length(file_list)
-cat(sprintf("TOTAL_FILES_R:%d\\n", total))
-
-process_file <- function(f, i, total) {{
-  cat(sprintf("PROGRESS:%d/%d\\n", i, total))
-  cat(sprintf("FILE:%s\\n", basename(f)))
-  
-  tryCatch({{
-    data <- fread(f, showProgress = FALSE)
-    
-    if(ncol(data) < 5) stop("Menos de 5 itens na prova")
-    if(nrow(data) < 100) stop("Menos de 100 respondentes")
-
-    data_matrix <- as.matrix(data)
-    
-    # TPM (3PL)
-    m3PL <- tpm(data_matrix, type = "latent.trait", IRT.param = TRUE, 
-                max.guessing = 0.3, 
-                control = list(iter.em = 150))
-    
-    coeffs_raw <- coef(m3PL)
-    
-    # Organizar output
-    result_df <- data.frame(matrix(ncol = 3, nrow = nrow(coeffs_raw)))
-    colnames(result_df) <- c("Discrimination", "Difficulty", "Guessing")
-    rownames(result_df) <- rownames(coeffs_raw)
-    
-    cols <- colnames(coeffs_raw)
-    if("Dscrmn" %in% cols) {{
-        result_df$Discrimination <- coeffs_raw[, "Dscrmn"]
-        result_df$Difficulty     <- coeffs_raw[, "Dffclt"]
-        result_df$Guessing       <- coeffs_raw[, "Gussng"]
-    }} else {{
-        result_df$Discrimination <- coeffs_raw[, 3]
-        result_df$Difficulty     <- coeffs_raw[, 2]
-        result_df$Guessing       <- coeffs_raw[, 1]
-    }}
-    
-    output_file <- sub("\\\\.csv$", "_TRI.csv", f)
-    fwrite(result_df, file = output_file, row.names = TRUE)
-    
-    cat(sprintf("MODEL:3PL\\n"))
-    cat(sprintf("SUCCESS:%s\\n", basename(output_file)))
-    
-  }}, error = function(e) {{
-    cat(sprintf("ERROR:%s\\n", e$message))
-  }})
-}}
-
-if (total > 0) {{
-    for (i in 1:total) {{
-      process_file(file_list[i], i, total)
-    }}
-}} else {{
-    cat("WARNING: R nao encontrou arquivos para processar.\\n")
-}}
-"""
-
-script_path = f"_temp_tri_{ano}.R"
-with open(script_path, 'w') as f:
-    f.write(r_script)
-
-try:
-    # Executa o R capturando stdout e stderr
-    process = subprocess.Popen(
-        ['Rscript', '--vanilla', script_path],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1
-    )
-    
-    # Ler stdout linha por linha em tempo real
-    while True:
-        line = process.stdout.readline()
-        if not line and process.poll() is not None:
-            break
-        if line:
-            line = line.strip()
-            # Mostra o que está acontecendo (inclusive erros de instalação)
-            if line.startswith("INSTALLING:"):
-                print(f"📦 Instalando pacote R: {line.split(':')[1]}")
-            elif line.startswith("PROGRESS:"):
-                parts = line.split(":")[1].split("/")
-                print(f"[{parts[0]}/{parts[1]}]", end=" ", flush=True)
-            elif line.startswith("FILE:"):
-                print(f"📄 {line.split(':',1)[1]}", end=" ", flush=True)
-            elif line.startswith("SUCCESS:"):
-                print("✅")
-            elif line.startswith("ERROR:") or line.startswith("FATAL_ERROR:"):
-                print(f"\n❌ {line}")
-            elif line.startswith("TOTAL_FILES_R:"):
-                print(f"[R] Arquivos vistos pelo R: {line.split(':')[1]}")
-            else:
-                # Imprime linhas desconhecidas para debug
-                print(f"[R log] {line}")
-
-    # Captura o erro final (stderr) se houver
-    stdout, stderr = process.communicate()
-    
-    if process.returncode != 0:
-        print(f"\n🔴 O R terminou com erro (código {process.returncode}).")
-        if stderr:
-            print(f"--- LOG DE ERRO (STDERR) ---\n{stderr}\n----------------------------")
-    elif stderr:
-        # Às vezes o R escreve warnings no stderr mesmo com sucesso
-        print(f"\n⚠️ Avisos do R (stderr):\n{stderr}")
-
-except Exception as e:
-    print(f"\n❌ Erro crítico no Python: {e}")
-    
-finally:
-    if os.path.exists(script_path):
-        os.remove(script_path)
+from enem_matriz import (listar_matrizes, caminho_tri, eh_agrupada, membros_agrupados, base_matriz,
+                         ler_cabecalho, caminho_ajuste_itens, caminho_q3, origens_adaptativas)
+from enem_tri import (ajustar_matriz, configuracao_ajuste, tri_atualizado, salvar_visoes,
+                      ajustar_matriz_adaptativo, configuracao_adaptativa, buscar_adaptativa,
+                      salvar_ajuste_itens, ajuste_itens_atualizado, limitar_threads_blas)
+
+def listar_pendentes(input_dir, config):
+    """Matrizes geradas pelo _03 cujo _TRI.csv falta ou veio de outra matriz/configuração."""
+    # Elas terminam com "_data.npy" (ex: 512_010000_data.npy) ou "_data.csv" (legado)
+    # Só entram na fila se o _TRI.json (ex: 512_010000_data_TRI.json) não tiver a
+    # mesma chave (hash do conteúdo da matriz + configuração do ajuste).
+    # Cadernos contidos em uma matriz agrupada por CO_ITEM (ITENS-*) não são
+    # ajustados: o _TRI.csv deles é uma visão do ajuste agrupado. Origens da
+    # amostra adaptativa com prefixo final também não: a prova é o prefixo.
+    ignoradas = set(membros_agrupados(input_dir)) | origens_adaptativas(input_dir)
+    return [f for f in listar_matrizes(input_dir)
+            if base_matriz(f) not in ignoradas and not tri_atualizado(f, config)]
+
+def listar_pendentes_adaptativo(input_dir, config_adapt, config_ajuste, amostra=None):
+    """
+    Modo --adaptativo: uma matriz de origem por CO_PROVA — a da `amostra` pedida
+    ou, sem ela, a de maior AMOSTRA do _03 — sem prefixo final atual. Prefixos
+    gerados por execuções anteriores e matrizes agrupadas por CO_ITEM (cores
+    empilhadas: prefixo não é amostra da prova) ficam de fora. A escolha é
+    feita antes dos ajustes: origens da mesma prova gravariam os mesmos prefixos.
+    """
+    membros, origens = membros_agrupados(input_dir), {}
+    for f in listar_matrizes(input_dir):
+        cabecalho = ler_cabecalho(f)
+        origem = (cabecalho.get('adaptativa') or {}).get('origem')
+        if eh_agrupada(f) or base_matriz(f) in membros or origem not in (None, os.path.basename(f)):
+            continue
+        co_prova, n = os.path.basename(f).split('_')[:2]
+        n = int(cabecalho.get('amostra') or n)
+        if amostra is not None and n != amostra:
+            continue
+        if co_prova not in origens or n > origens[co_prova][0]:
+            origens[co_prova] = (n, f)
+
+    pendentes = []
+    for _, f in sorted(origens.values(), key=lambda v: v[1]):
+        final = buscar_adaptativa(f, config_adapt)
+        if final is None or not tri_atualizado(final, config_ajuste):
+            pendentes.append(f)
+    return pendentes
+
+def salvar_amostras_adaptativas(input_dir, resultados):
+    """Acumula {CO_PROVA: AMOSTRA final} em MATRIZ/amostras_adaptativas.json."""
+    caminho = os.path.join(input_dir, "amostras_adaptativas.json")
+    registro = {}
+    if os.path.exists(caminho):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            registro = json.load(f)
+    for r in resultados:
+        if r['status'] == 'sucesso' and 'amostra_final' in r:
+            registro[r['arquivo'].split('_')[0]] = {'amostra_final': r['amostra_final'],
+                                                     'estabilizou': r['estabilizou'],
+                                                     'origem': r['arquivo'], 'matriz': r['saida']}
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(registro.items())), f, indent=2, ensure_ascii=False)
+    return caminho
+
+def gerar_ajuste_itens(input_dir):
+    """
+    S-X² e Q3 (enem_tri.salvar_ajuste_itens) de cada matriz ajustada cujo
+    _TRI_ajuste.json falta ou veio de outro ajuste. Roda sobre a tabela de
+    padrões, em segundos por prova; cadernos de matrizes agrupadas recebem visões.
+    """
+    ignoradas = set(membros_agrupados(input_dir)) | origens_adaptativas(input_dir)
+    for m in listar_matrizes(input_dir):
+        if base_matriz(m) in ignoradas or not os.path.exists(caminho_tri(m)) or ajuste_itens_atualizado(m):
+            continue
+        try:
+            tabela = salvar_ajuste_itens(m)
+        except Exception as e:
+            print(f"❌ Ajuste dos itens de {os.path.basename(m)}: {e}")
+            continue
+        sinalizados = tabela.index[tabela['desajuste'] | tabela['dependencia']]
+        aviso = f" ⚠️ itens sinalizados: {', '.join(sinalizados)}" if len(sinalizados) else ""
+        print(f"🔎 {os.path.basename(caminho_ajuste_itens(m))} (S-X², Q3){aviso}")
+
+def gerar_visoes(input_dir):
+    """_TRI.csv (e S-X²/Q3) de cada cor a partir dos ajustes das matrizes agrupadas por CO_ITEM."""
+    for m in listar_matrizes(input_dir):
+        if eh_agrupada(m) and os.path.exists(caminho_tri(m)):
+            visoes = salvar_visoes(m)
+            for sufixo, caminho in (('_TRI_ajuste', caminho_ajuste_itens(m)), ('_TRI_Q3', caminho_q3(m))):
+                if os.path.exists(caminho):
+                    salvar_visoes(m, sufixo=sufixo)
+            print(f"🧩 {os.path.basename(caminho_tri(m))} → {len(visoes)} cadernos (visões por CO_ITEM)")
+
+
+# ==================== MOTOR PYTHON (enem_tri.py) ====================
+#
+# As matrizes são independentes: cada uma é ajustada em um processo do pool
+# (`workers`), com teto de memória virtual por processo (`memoria_mb`, via
+# RLIMIT_AS — um ajuste que estoure o teto falha sozinho com MemoryError) e
+# BLAS de 1 thread (enem_tri.limitar_threads_blas): o paralelismo vem do pool.
+# Cada ajuste devolve um resultado estruturado (arquivo, status, erro,
+# iterações, tempo...), gravado em MATRIZ/relatorio_TRI.json.
+
+def _iniciar_worker(memoria_mb, limitar_threads=True):
+    """Inicializador de cada processo do pool: BLAS de 1 thread e teto de memória."""
+    if limitar_threads:
+        limitar_threads_blas()
+    if memoria_mb:
+        import resource
+        limite = int(memoria_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+def ajustar_arquivo(f, opcoes=None):
+    """Ajusta uma matriz e devolve o resultado estruturado (nunca levanta exceção)."""
+    inicio = time.time()
+    resultado = {'arquivo': os.path.basename(f), 'saida': os.path.basename(caminho_tri(f))}
+    opcoes = dict(opcoes or {})
+    adaptativo = opcoes.pop('adaptativo', None)
+    try:
+        if adaptativo is not None:
+            tri_csv, ajuste = ajustar_matriz_adaptativo(f, **adaptativo, **opcoes)
+            resultado.update(saida=os.path.basename(tri_csv), amostra_final=ajuste['amostra_final'],
+                             estabilizou=ajuste['estabilizou'], passos=ajuste['passos'])
+        else:
+            _, ajuste = ajustar_matriz(f, **opcoes)
+        resultado.update(status='sucesso', iteracoes=ajuste['iteracoes'],
+                         convergiu=ajuste['convergiu'], loglik=ajuste['loglik'],
+                         origem=ajuste['origem'], partida=ajuste['partida'],
+                         modelo=ajuste.get('modelo'), selecao=ajuste.get('selecao'))
+        if 'diagnosticos' in ajuste:
+            # Modo streaming: log-verossimilhança e variação dos parâmetros por época
+            resultado['diagnosticos'] = ajuste['diagnosticos']
+    except MemoryError:
+        resultado.update(status='erro', erro='Memória insuficiente (teto do worker excedido)')
+    except Exception as e:
+        resultado.update(status='erro', erro=str(e))
+    resultado['segundos'] = round(time.time() - inicio, 2)
+    return resultado
+
+def _descrever_modelo(resultado):
+    """' [2PL: 3PL não melhora o BIC]' — modelo escolhido e o motivo, quando há seleção."""
+    selecao = resultado.get('selecao')
+    if not resultado.get('modelo'):
+        return ""
+    if not selecao:
+        return f" [{resultado['modelo']}]"
+    queda = "⚠️ " if selecao['modo'] not in ('auto', resultado['modelo']) else ""
+    return f" [{queda}{resultado['modelo']}: {selecao['motivo']}]"
+
+def _mostrar(resultado, i, total):
+    print(f"[{i}/{total}] 📄 {resultado['arquivo']}", end=" ")
+    if resultado['status'] == 'sucesso':
+        aviso = "" if resultado['convergiu'] else f" ⚠️ sem convergência após {resultado['iteracoes']} iterações"
+        aviso = _descrever_modelo(resultado) + aviso
+        if 'amostra_final' in resultado:
+            estavel = "itens estáveis" if resultado['estabilizou'] else "⚠️ amostra máxima sem estabilizar"
+            print(f"✅ ({resultado['segundos']}s, AMOSTRA final {resultado['amostra_final']}: {estavel}){aviso}")
+        elif resultado.get('origem') == 'cache':
+            print(f"♻️  (cache){aviso}")
+        elif resultado.get('partida'):
+            print(f"✅ ({resultado['segundos']}s, {resultado['iteracoes']} iterações, partindo de {resultado['partida']}){aviso}")
+        else:
+            print(f"✅ ({resultado['segundos']}s){aviso}")
+    else:
+        print(f"\n❌ ERROR:{resultado['erro']}")
+
+def processar_python(file_list, workers=1, memoria_mb=None, opcoes=None):
+    """
+    Ajuste 3PL nativo (MML-EM) das matrizes, em paralelo. Retorna os resultados por arquivo.
+    `opcoes`: repassadas a enem_tri.ajustar_matriz (ex.: streaming=True, lote=...).
+    """
+    total, resultados = len(file_list), []
+
+    if workers <= 1 and not memoria_mb:
+        for i, f in enumerate(file_list, 1):
+            resultados.append(ajustar_arquivo(f, opcoes))
+            _mostrar(resultados[-1], i, total)
+        return resultados
+
+    print(f"⚙️  Ajustando {total} matrizes com {workers} workers"
+          + (f" (teto de {memoria_mb} MB por worker)" if memoria_mb else "") + "...")
+    with ProcessPoolExecutor(max_workers=max(1, workers), initializer=_iniciar_worker,
+                             initargs=(memoria_mb, workers > 1)) as pool:
+        futuros = {pool.submit(ajustar_arquivo, f, opcoes): f for f in file_list}
+        for i, futuro in enumerate(as_completed(futuros), 1):
+            f = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except BrokenProcessPool as e:
+                # Worker morto pelo sistema (ex.: OOM killer): registra e segue
+                resultado = {'arquivo': os.path.basename(f), 'saida': os.path.basename(caminho_tri(f)),
+                             'status': 'erro', 'erro': f"Worker encerrado: {e}", 'segundos': None}
+            resultados.append(resultado)
+            _mostrar(resultado, i, total)
+    return sorted(resultados, key=lambda r: r['arquivo'])
+
+def salvar_relatorio(input_dir, motor, resultados):
+    """Grava MATRIZ/relatorio_TRI.json com o resultado de cada arquivo desta execução."""
+    caminho = os.path.join(input_dir, "relatorio_TRI.json")
+    relatorio = {'gerado_em': datetime.now().isoformat(timespec='seconds'),
+                 'motor': motor,
+                 'sucesso': sum(r['status'] == 'sucesso' for r in resultados),
+                 'erro': sum(r['status'] != 'sucesso' for r in resultados),
+                 'arquivos': resultados}
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    return caminho
+
+
+# ==================== MOTOR R (ltm::tpm, processos persistentes) ====================
+
+def processar_r(pool, file_list):
+    """Ajuste via ltm::tpm() nos processos R já aquecidos do `pool` (enem_tri_r.PoolR)."""
+    total, resultados = len(file_list), []
+    for i, resultado in enumerate(pool.mapear(file_list), 1):
+        resultados.append(resultado)
+        _mostrar(resultado, i, total)
+    return resultados
+
+
+def processar_ano(ano, motor, workers, memoria_mb=None, pool_r=None, opcoes=None, ajuste_itens=True,
+                  amostra=None):
+    """Ajusta as matrizes pendentes de um ano e grava o relatório (`amostra`: origem do --adaptativo)."""
+    # --- CAMINHOS (Mantendo sua estrutura original) ---
+    input_dir = f"./ENEM/{ano}/DADOS/MATRIZ"
+    # --------------------------------------------------
+
+    opcoes     = dict(opcoes or {})
+    adaptativo = opcoes.get('adaptativo')
+    if motor == 'r':
+        from enem_tri_r import CONFIG_R as config
+    else:
+        config = configuracao_ajuste(**{k: v for k, v in opcoes.items() if k != 'adaptativo'})
+    file_list   = (listar_pendentes_adaptativo(input_dir, configuracao_adaptativa(**adaptativo), config, amostra)
+                   if adaptativo is not None else listar_pendentes(input_dir, config))
+    total_files = len(file_list)
+
+    print(f"=" * 60)
+    print(f"Processando TRI - ENEM {ano} (motor: {motor})")
+    print(f"Diretório: {input_dir}")
+    print(f"Matrizes encontradas para processar: {total_files}")
+    print(f"=" * 60)
+
+    if total_files == 0:
+        print("Nenhuma matriz nova encontrada. Certifique-se de que os arquivos terminam em '_data.npy' ou '_data.csv'.")
+        if ajuste_itens:
+            gerar_ajuste_itens(input_dir)
+        gerar_visoes(input_dir)
+        return []
+
+    if motor == 'r':
+        resultados = processar_r(pool_r, file_list)
+    else:
+        resultados = processar_python(file_list, workers, memoria_mb, opcoes)
+    n_ok = sum(r['status'] == 'sucesso' for r in resultados)
+    print(f"\n📊 {n_ok}/{total_files} ajustes concluídos — relatório: {salvar_relatorio(input_dir, motor, resultados)}")
+    if adaptativo is not None:
+        print(f"📏 AMOSTRA final de cada prova: {salvar_amostras_adaptativas(input_dir, resultados)}")
+    if ajuste_itens:
+        gerar_ajuste_itens(input_dir)
+    gerar_visoes(input_dir)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Ajusta o modelo TRI (1PL/2PL/3PL) das matrizes de acertos')
+    parser.add_argument('anos', nargs='*', default=['2019'], help='Ano(s) do ENEM')
+    parser.add_argument('--motor', choices=['python', 'r'], default='python',
+                        help='python: estimador nativo enem_tri.py (padrão) | r: processos R persistentes com ltm::tpm()')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Matrizes ajustadas em paralelo (padrão: nº de CPUs)')
+    parser.add_argument('--memoria-mb', type=int, default=None,
+                        help='Teto de memória por worker, em MB (padrão: sem teto; somente motor python)')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Lê a matriz .npy em lotes (EM estocástico + varreduras): memória limitada '
+                             'para matrizes com a população inteira da prova (somente motor python)')
+    parser.add_argument('--lote', type=int, default=50000, help='Alunos por lote no modo --streaming')
+    parser.add_argument('--epocas', type=int, default=3,
+                        help='Épocas de EM estocástico antes das varreduras completas (modo --streaming)')
+    parser.add_argument('--adaptativo', action='store_true',
+                        help='Amostra adaptativa: ajusta prefixos crescentes da matriz (AMOSTRA máxima do _03 ou --amostra) '
+                             'até os parâmetros de todos os itens estabilizarem (somente motor python)')
+    parser.add_argument('--amostra', type=int, default=None,
+                        help='AMOSTRA do _03 usada como origem do modo --adaptativo (padrão: a maior de cada prova)')
+    parser.add_argument('--inicio', type=int, default=1000, help='Primeiro prefixo do modo --adaptativo')
+    parser.add_argument('--tol-ep', type=float, default=0.10,
+                        help='Erro-padrão máximo de a e b por item (modo --adaptativo)')
+    parser.add_argument('--tol-passo', type=float, default=0.05,
+                        help='Ou variação máxima de a, b, c entre passos (modo --adaptativo)')
+    parser.add_argument('--modelo', choices=['auto', '1PL', '2PL', '3PL'], default='auto',
+                        help='auto (padrão): sobe de 1PL → 2PL → 3PL enquanto o critério melhora | '
+                             'modelo fixo, com queda para o mais simples se não convergir (somente motor python)')
+    parser.add_argument('--criterio', choices=['bic', 'aic'], default='bic',
+                        help='Critério de informação do --modelo auto (padrão: bic)')
+    parser.add_argument('--sem-ajuste-itens', action='store_true',
+                        help='Não calcula o S-X² e o Q3 dos itens após o ajuste')
+    args = parser.parse_args()
+
+    if args.motor == 'r':
+        # Os mesmos processos R (bibliotecas já carregadas) atendem todos os anos
+        from enem_tri_r import PoolR
+        with PoolR(args.workers) as pool_r:
+            for ano in args.anos:
+                processar_ano(ano, 'r', args.workers, pool_r=pool_r,
+                              ajuste_itens=not args.sem_ajuste_itens)
+    else:
+        opcoes = dict(streaming=True, lote=args.lote, epocas=args.epocas) if args.streaming else {}
+        if args.adaptativo:
+            opcoes = {'adaptativo': configuracao_adaptativa(inicio=args.inicio, tol_ep=args.tol_ep,
+                                                            tol_passo=args.tol_passo)}
+        opcoes.update(modelo=args.modelo, criterio=args.criterio)
+        for ano in args.anos:
+            processar_ano(ano, 'python', args.workers, args.memoria_mb, opcoes=opcoes,
+                          ajuste_itens=not args.sem_ajuste_itens, amostra=args.amostra)
@@ -0,0 +1,251 @@
+'''
+=============================================================================
+_04b_tri2theta.py
+=============================================================================
+Escores θ de TODOS os alunos de cada prova TOP (não só da amostra do _03),
+com os itens calibrados pelo _04 (_TRI.csv):
+
+  EAP  média a posteriori (priori N(0, 1)) e erro-padrão (dp a posteriori)
+  MAP  moda a posteriori (Fisher scoring) e erro-padrão 1/√(I(θ) + 1)
+
+Os microdados (Parquet ou CSV) são lidos em lotes
+(enem_microdados.iterar_respostas), corrigidos contra o gabarito
+(enem_matriz.pontuar_respostas) e pontuados com as tabelas da grade de θ
+calculadas uma única vez por prova (enem_tri.pontuar_theta): cada lote é
+uma multiplicação de matrizes. A memória fica limitada a um lote — a tabela
+de saída é escrita lote a lote e o resumo é acumulado em histogramas.
+
+Em LC, somente alunos de Inglês (as matrizes e o _TRI.csv do _03/_04 são
+de Inglês); nas demais áreas, todos os alunos da prova.
+
+─────────────────────────────────────────────────────────────────────────────
+SAÍDA — ENEM/<ANO>/DADOS/THETA/
+
+  <CO_PROVA>_theta.parquet  NU_INSCRICAO, ACERTOS, THETA_EAP, EP_EAP,
+                            THETA_MAP, EP_MAP (float32)
+  <CO_PROVA>_theta.json     resumo: nº de alunos, média/dp/percentis de θ,
+                            confiabilidade empírica, histograma de θ,
+                            distribuição dos acertos e θ médio por acertos
+
+USO:
+  python3 _04b_tri2theta.py <ANO> [--amostra N]
+
+  --amostra N   usa o _TRI.csv dessa AMOSTRA (padrão: a maior de cada prova)
+=============================================================================
+'''
+
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+from enem_microdados import buscar_path_microdados, iterar_respostas, COLS_PROVAS, COLS_RESPS
+from enem_matriz import (listar_matrizes, ler_cabecalho, caminho_tri, eh_agrupada, base_matriz,
+                         pontuar_respostas, montar_gabarito, hash_gabarito, origens_adaptativas)
+from enem_tri import ler_parametros, grade_theta, tabelas_theta, pontuar_theta, LIMITE_THETA
+
+COLUNAS   = ['NU_INSCRICAO', 'ACERTOS', 'THETA_EAP', 'EP_EAP', 'THETA_MAP', 'EP_MAP']
+PERCENTIS = [1, 5, 10, 25, 50, 75, 90, 95, 99]
+
+
+def carregar_id_map(ano):
+    """Lê o ranking_provas para obter a área (sg_area) de cada CO_PROVA."""
+    path = os.path.join("ENEM", ano, "DADOS", f"ranking_provas_{ano}.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        ranking = json.load(f)
+    return {item['co_prova']: item for item in ranking}
+
+def localizar_tri(dir_matriz, amostra=None):
+    """{co_prova: (_TRI.csv, cabeçalho da matriz)} — a maior AMOSTRA de cada prova, ou a pedida."""
+    escolhidos, origens = {}, origens_adaptativas(dir_matriz)
+    for m in listar_matrizes(dir_matriz):
+        # Origem da amostra adaptativa: o _TRI.csv da prova é o do prefixo final
+        if eh_agrupada(m) or base_matriz(m) in origens or not os.path.exists(caminho_tri(m)):
+            continue
+        cabecalho = ler_cabecalho(m)
+        # Matrizes CSV legadas sem cabeçalho: CO_PROVA e AMOSTRA vêm do nome
+        pid, am = os.path.basename(m).split('_')[:2]
+        pid = str(cabecalho.get('co_prova', pid))
+        am  = int(cabecalho.get('amostra', am))
+        if amostra is not None and am != amostra:
+            continue
+        if pid not in escolhidos or am > escolhidos[pid][2]:
+            escolhidos[pid] = (caminho_tri(m), cabecalho, am)
+    return {pid: (tri, cabecalho) for pid, (tri, cabecalho, _) in sorted(escolhidos.items())}
+
+
+class ResumoTheta:
+    """Resumo de uma prova acumulado lote a lote (histogramas finos: memória constante)."""
+
+    PASSO = 0.01  # largura dos bins finos de θ (precisão dos percentis)
+
+    def __init__(self, n_itens):
+        self.n_bins  = int(round(2 * LIMITE_THETA / self.PASSO))
+        self.hist    = {k: np.zeros(self.n_bins, dtype=np.int64) for k in ('eap', 'map')}
+        self.somas   = {k: np.zeros(3) for k in ('eap', 'map')}   # Σθ, Σθ², Σ ep²
+        self.acertos = np.zeros(n_itens + 1, dtype=np.int64)
+        self.eap_por_acertos = np.zeros(n_itens + 1)
+        self.n = 0
+        self.descartados = 0
+
+    def adicionar(self, escores):
+        self.n += len(escores['eap'])
+        for k in ('eap', 'map'):
+            theta = escores[k]
+            bins  = np.clip(((theta + LIMITE_THETA) / self.PASSO).astype(np.int64), 0, self.n_bins - 1)
+            self.hist[k]  += np.bincount(bins, minlength=self.n_bins)
+            self.somas[k] += [theta.sum(), (theta ** 2).sum(), (escores[f'ep_{k}'] ** 2).sum()]
+        n_acertos = len(self.acertos)
+        self.acertos         += np.bincount(escores['acertos'], minlength=n_acertos)
+        self.eap_por_acertos += np.bincount(escores['acertos'], weights=escores['eap'], minlength=n_acertos)
+
+    def _estatisticas(self, k):
+        soma, soma2, soma_ep2 = self.somas[k]
+        media = soma / self.n
+        var   = max(soma2 / self.n - media ** 2, 0.0)
+        ep2   = soma_ep2 / self.n
+        acum  = np.cumsum(self.hist[k])
+        centros = -LIMITE_THETA + (np.arange(self.n_bins) + 0.5) * self.PASSO
+        percentis = {f"p{q:02d}": round(float(centros[np.searchsorted(acum, q / 100 * self.n)]), 3)
+                     for q in PERCENTIS}
+        return {'media': round(media, 4), 'dp': round(np.sqrt(var), 4),
+                'ep_medio': round(float(np.sqrt(ep2)), 4),
+                'confiabilidade_empirica': round(var / (var + ep2), 4) if var + ep2 > 0 else None,
+                'percentis': percentis}
+
+    def resultado(self):
+        if not self.n:
+            return {'n_alunos': 0, 'descartados': self.descartados}
+        # Histograma publicado com bins de 0,25 (25 bins finos cada)
+        agrupar = int(round(0.25 / self.PASSO))
+        bordas  = np.linspace(-LIMITE_THETA, LIMITE_THETA, self.n_bins // agrupar + 1)
+        with np.errstate(invalid='ignore'):
+            medio = np.where(self.acertos > 0, self.eap_por_acertos / np.maximum(self.acertos, 1), np.nan)
+        return {'n_alunos': int(self.n),
+                'descartados': int(self.descartados),
+                'eap': self._estatisticas('eap'),
+                'map': self._estatisticas('map'),
+                'histograma': {'bordas': [round(float(b), 2) for b in bordas],
+                               'eap': self.hist['eap'].reshape(-1, agrupar).sum(axis=1).tolist(),
+                               'map': self.hist['map'].reshape(-1, agrupar).sum(axis=1).tolist()},
+                'acertos': {'contagem': self.acertos.tolist(),
+                            'theta_eap_medio': [None if np.isnan(v) else round(float(v), 4) for v in medio]}}
+
+
+class Prova:
+    """Estado de uma prova durante a varredura: parâmetros, tabelas da grade, saída e resumo."""
+
+    def __init__(self, pid, tri_csv, gabarito, dir_saida):
+        import pyarrow as pa
+        self.pid, self.tri_csv, self.gabarito = pid, tri_csv, gabarito
+        self.a, self.b, self.c = ler_parametros(tri_csv)
+        self.grade   = grade_theta()
+        self.tabelas = tabelas_theta(self.a, self.b, self.c, self.grade[0])
+        self.resumo  = ResumoTheta(len(gabarito))
+        self.destino = os.path.join(dir_saida, f"{pid}_theta.parquet")
+        self.schema  = pa.schema([('NU_INSCRICAO', pa.int64()), ('ACERTOS', pa.uint8())] +
+                                 [(c, pa.float32()) for c in COLUNAS[2:]])
+        self._escritor = None
+
+    def adicionar(self, ids, resps):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        X, validos = pontuar_respostas(resps, self.gabarito)
+        self.resumo.descartados += int((~validos).sum())
+        if not len(X):
+            return
+        e = pontuar_theta(X, self.a, self.b, self.c, tabelas=self.tabelas, grade=self.grade)
+        self.resumo.adicionar(e)
+
+        if self._escritor is None:
+            self._escritor = pq.ParquetWriter(self.destino + '.tmp', self.schema, compression='zstd')
+        colunas = [ids[validos].astype(np.int64), e['acertos'].astype(np.uint8),
+                   *(e[k].astype(np.float32) for k in ('eap', 'ep_eap', 'map', 'ep_map'))]
+        self._escritor.write_table(pa.Table.from_arrays(colunas, schema=self.schema))
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            os.replace(self.destino + '.tmp', self.destino)
+
+
+def processar_ano(ano, amostra=None):
+    dir_matriz = os.path.join("ENEM", ano, "DADOS", "MATRIZ")
+    dir_saida  = os.path.join("ENEM", ano, "DADOS", "THETA")
+    path_dados = buscar_path_microdados(ano)
+    path_itens = os.path.join("ENEM", ano, "DADOS", f"ITENS_PROVA_{ano}.json")
+
+    if not path_dados:
+        print(f"❌ Erro: Microdados não encontrados em {ano}/DADOS/")
+        return
+    if not os.path.exists(path_itens):
+        print(f"❌ Erro: {path_itens} não encontrado.")
+        return
+    tri_por_prova = localizar_tri(dir_matriz, amostra)
+    if not tri_por_prova:
+        print(f"⚠️  Nenhum _TRI.csv encontrado em {dir_matriz} (rode o _04 antes).")
+        return
+
+    with open(path_itens, 'r', encoding='utf-8') as f:
+        itens_data = json.load(f)
+    id_map = carregar_id_map(ano)
+    os.makedirs(dir_saida, exist_ok=True)
+
+    provas, pid_para_colunas, linguas = {}, {}, {}
+    for pid, (tri_csv, cabecalho) in tri_por_prova.items():
+        if pid not in itens_data:
+            print(f"⚠️  Prova {pid}: sem gabarito em ITENS_PROVA_{ano}.json — pulando.")
+            continue
+        area = cabecalho.get('sg_area') or id_map.get(pid, {}).get('sg_area')
+        if area not in COLS_PROVAS:
+            print(f"⚠️  Prova {pid}: área '{area}' não reconhecida — pulando.")
+            continue
+        gabarito, _ = montar_gabarito(itens_data[pid]['QUESTIONS'])
+        if cabecalho.get('gabarito_sha1') not in (None, hash_gabarito(gabarito)):
+            print(f"⚠️  Prova {pid}: gabarito mudou desde a matriz do _TRI.csv (refaça _03/_04) — pulando.")
+            continue
+
+        provas[pid] = Prova(pid, tri_csv, gabarito, dir_saida)
+        pid_para_colunas[pid] = (COLS_PROVAS[area], COLS_RESPS[area])
+        if area == 'LC':
+            linguas[pid] = 0  # Somente Inglês
+
+    if not provas:
+        return
+
+    print(f"🚀 Lendo: {path_dados}")
+    print(f"🎯 Escores θ (EAP/MAP) de todos os alunos de {len(provas)} provas...")
+    inicio = time.time()
+    for pid, ids, resps in iterar_respostas(path_dados, pid_para_colunas, linguas):
+        provas[pid].adicionar(ids, resps)
+
+    segundos = round(time.time() - inicio, 1)
+    for pid, prova in provas.items():
+        prova.fechar()
+        resumo = {'co_prova': pid, 'ano': ano, 'tri': os.path.basename(prova.tri_csv),
+                  'lingua': linguas.get(pid), 'n_itens': len(prova.gabarito),
+                  **prova.resumo.resultado()}
+        with open(os.path.join(dir_saida, f"{pid}_theta.json"), 'w', encoding='utf-8') as f:
+            json.dump(resumo, f, indent=2, ensure_ascii=False)
+
+        if resumo['n_alunos']:
+            eap = resumo['eap']
+            print(f"✅ {pid}: {resumo['n_alunos']} alunos | θ EAP média {eap['media']:+.3f} "
+                  f"dp {eap['dp']:.3f} | confiabilidade {eap['confiabilidade_empirica']}")
+        else:
+            print(f"⚠️  {pid}: nenhum aluno pontuado.")
+    print(f"⏱️  Tempo total: {segundos}s → {dir_saida}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Escores θ (EAP/MAP) de todos os alunos das provas TOP')
+    parser.add_argument('ano', help='Ano do ENEM')
+    parser.add_argument('--amostra', type=int, default=None,
+                        help='AMOSTRA do _TRI.csv a usar (padrão: a maior disponível de cada prova)')
+    args = parser.parse_args()
+
+    processar_ano(args.ano, args.amostra)
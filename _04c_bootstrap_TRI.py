@@ -0,0 +1,111 @@
+'''
+=============================================================================
+_04c_bootstrap_TRI.py
+=============================================================================
+Etapa opcional: intervalos de confiança bootstrap dos parâmetros a, b e c
+de cada prova já ajustada pelo _04.
+
+Para cada matriz com _TRI.csv, o 3PL é reajustado em B reamostras dos
+alunos (com reposição), em paralelo (enem_tri.bootstrap_3pl): os workers
+abrem por memmap uma única tabela de padrões distintos e cada réplica é
+apenas um vetor de índices de alunos. Cada réplica parte do ajuste original.
+
+Matrizes agrupadas por CO_ITEM (ITENS-*): o bootstrap roda uma vez na matriz
+agrupada e cada cor recebe o seu _TRI_IC.csv como visão (mesmo esquema do _04).
+Uma prova só é refeita se o _TRI.json mudou (chave do ajuste) ou se B, o
+nível ou a semente forem outros.
+
+─────────────────────────────────────────────────────────────────────────────
+SAÍDA — ENEM/<ANO>/DADOS/MATRIZ/
+
+  <CO_PROVA>_<AMOSTRA>_data_TRI_IC.csv   ← por item: <param>_inf, <param>_sup
+                                           (percentis) e <param>_ep, para
+                                           Discrimination/Difficulty/Guessing
+  <CO_PROVA>_<AMOSTRA>_data_TRI_IC.json  ← B, nível, semente, réplicas sem
+                                           convergência, chave do ajuste
+  <CO_PROVA>_<AMOSTRA>_data_TRI_boot.npz ← a, b, c de cada réplica (B x J),
+                                           usados pelo _05 para a faixa da CCI
+
+USO:
+  python3 _04c_bootstrap_TRI.py <ANO> [ANO ...] [--reamostras B] [--workers N]
+                                [--nivel 0.95] [--semente S] [--forcar]
+=============================================================================
+'''
+
+import os
+import json
+import time
+import argparse
+
+from enem_matriz import (listar_matrizes, caminho_tri, caminho_ic, eh_agrupada,
+                         membros_agrupados, base_matriz, origens_adaptativas)
+from enem_tri import bootstrap_3pl, salvar_bootstrap, salvar_visoes, N_BOOT, NIVEL_IC
+
+
+def _ler_json(caminho):
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def bootstrap_atualizado(caminho_matriz, n_boot, nivel, semente):
+    """True se o _TRI_IC.json existente veio deste mesmo ajuste e configuração."""
+    info = _ler_json(caminho_ic(caminho_matriz)[:-len('.csv')] + '.json')
+    chave = _ler_json(caminho_tri(caminho_matriz)[:-len('.csv')] + '.json').get('chave')
+    return (bool(info) and info.get('chave') == chave and info.get('n_boot') == n_boot
+            and info.get('nivel') == nivel and info.get('semente') == semente)
+
+def listar_pendentes(input_dir, n_boot, nivel, semente, forcar=False):
+    """Matrizes ajustadas pelo _04 (exceto cadernos de matrizes agrupadas e origens adaptativas) sem bootstrap atual."""
+    ignoradas = set(membros_agrupados(input_dir)) | origens_adaptativas(input_dir)
+    return [f for f in listar_matrizes(input_dir)
+            if base_matriz(f) not in ignoradas and os.path.exists(caminho_tri(f))
+            and (forcar or not bootstrap_atualizado(f, n_boot, nivel, semente))]
+
+def processar_ano(ano, n_boot=N_BOOT, workers=1, nivel=NIVEL_IC, semente=0, forcar=False):
+    input_dir = f"./ENEM/{ano}/DADOS/MATRIZ"
+    file_list = listar_pendentes(input_dir, n_boot, nivel, semente, forcar)
+
+    print(f"=" * 60)
+    print(f"Bootstrap TRI - ENEM {ano} ({n_boot} reamostras, IC {nivel:.0%}, {workers} workers)")
+    print(f"Matrizes para processar: {len(file_list)}")
+    print(f"=" * 60)
+
+    for i, f in enumerate(file_list, 1):
+        print(f"[{i}/{len(file_list)}] 📄 {os.path.basename(f)}", end=" ", flush=True)
+        inicio = time.time()
+        try:
+            reamostras = bootstrap_3pl(f, n_boot=n_boot, workers=workers, semente=semente)
+        except Exception as e:
+            print(f"\n❌ ERROR:{e}")
+            continue
+        chave = _ler_json(caminho_tri(f)[:-len('.csv')] + '.json').get('chave')
+        salvar_bootstrap(f, reamostras, nivel, motor='python', semente=semente, chave=chave,
+                         segundos=round(time.time() - inicio, 2))
+        falhas = int((~reamostras['convergiu']).sum())
+        aviso  = f" ⚠️ {falhas} réplicas sem convergência" if falhas else ""
+        print(f"✅ ({time.time() - inicio:.1f}s){aviso}")
+
+    # Cores das matrizes agrupadas: intervalos como visão do bootstrap agrupado
+    for m in listar_matrizes(input_dir):
+        if eh_agrupada(m) and os.path.exists(caminho_ic(m)):
+            visoes = salvar_visoes(m, sufixo='_TRI_IC')
+            print(f"🧩 {os.path.basename(caminho_ic(m))} → {len(visoes)} cadernos (visões por CO_ITEM)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Intervalos bootstrap dos parâmetros TRI (3PL)')
+    parser.add_argument('anos', nargs='*', default=['2019'], help='Ano(s) do ENEM')
+    parser.add_argument('--reamostras', type=int, default=N_BOOT,
+                        help=f'Nº de reamostras bootstrap por prova (padrão: {N_BOOT})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Réplicas ajustadas em paralelo (padrão: nº de CPUs)')
+    parser.add_argument('--nivel', type=float, default=NIVEL_IC,
+                        help=f'Nível de confiança dos intervalos percentis (padrão: {NIVEL_IC})')
+    parser.add_argument('--semente', type=int, default=0,
+                        help='Semente das reamostras (mesma semente → mesmos intervalos)')
+    parser.add_argument('--forcar', action='store_true', help='Refaz mesmo provas com bootstrap atual')
+    args = parser.parse_args()
+
+    for ano in args.anos:
+        processar_ano(ano, args.reamostras, args.workers, args.nivel, args.semente, args.forcar)
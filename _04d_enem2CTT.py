@@ -0,0 +1,199 @@
+'''
+=============================================================================
+_04d_enem2CTT.py
+=============================================================================
+Teoria Clássica dos Testes (TCT) de cada prova TOP sobre TODOS os alunos
+(não só a amostra do _03), numa única passada pelos microdados:
+
+  p             proporção de acerto do item
+  r_pb          correlação ponto-bisserial item x escore total
+  r_item_resto  correlação item x (escore total - item)
+  alfa          alfa de Cronbach da prova
+  alfa_sem_item alfa da prova sem o item
+
+Tudo sai das estatísticas suficientes n, Σx_j (J,) e Σx_j x_k (J x J),
+acumuladas lote a lote (um X^T X por lote): memória constante, qualquer que
+seja o nº de alunos. Com a covariância C (J x J), var(escore) = Σ C e
+cov(x_j, escore) = Σ_k C_jk; o item-resto e o alfa sem o item vêm das
+mesmas somas, sem segunda passada.
+
+Os microdados (Parquet ou CSV) são lidos como no _04b
+(enem_microdados.iterar_respostas); em LC, somente alunos de Inglês.
+
+─────────────────────────────────────────────────────────────────────────────
+SAÍDA — ENEM/<ANO>/DADOS/MATRIZ/ (ao lado do _TRI.csv)
+
+  <CO_PROVA>_CTT.csv   ← por item, linhas V1..VJ como o _TRI.csv:
+                         ,p,r_pb,r_item_resto,alfa_sem_item
+  <CO_PROVA>_CTT.json  ← nº de alunos, alfa, média/dp/erro-padrão de medida
+                         do escore, distribuição dos acertos e os itens
+                         (q_id do ITENS_PROVA_<ANO>.json + estatísticas)
+
+USO:
+  python3 _04d_enem2CTT.py <ANO> [ANO ...]
+=============================================================================
+'''
+
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from enem_microdados import buscar_path_microdados, iterar_respostas, COLS_PROVAS, COLS_RESPS
+from enem_matriz import (listar_matrizes, ler_cabecalho, eh_agrupada, caminho_ctt,
+                         pontuar_respostas, montar_gabarito, hash_gabarito)
+
+
+def carregar_id_map(ano):
+    """Lê o ranking_provas para obter a área (sg_area) de cada CO_PROVA."""
+    path = os.path.join("ENEM", ano, "DADOS", f"ranking_provas_{ano}.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        ranking = json.load(f)
+    return {item['co_prova']: item for item in ranking}
+
+def localizar_provas(dir_matriz):
+    """{co_prova: cabeçalho da matriz} das provas com matriz do _03 (uma por prova)."""
+    provas = {}
+    for m in listar_matrizes(dir_matriz):
+        if eh_agrupada(m):
+            continue
+        cabecalho = ler_cabecalho(m)
+        pid = str(cabecalho.get('co_prova', os.path.basename(m).split('_')[0]))
+        provas.setdefault(pid, cabecalho)
+    return dict(sorted(provas.items()))
+
+
+class EstatisticasCTT:
+    """Estatísticas suficientes de uma prova (n, Σx, Σxx^T, acertos), acumuladas lote a lote."""
+
+    def __init__(self, n_itens):
+        self.n       = 0
+        self.soma    = np.zeros(n_itens)
+        self.cruzado = np.zeros((n_itens, n_itens))
+        self.acertos = np.zeros(n_itens + 1, dtype=np.int64)
+        self.descartados = 0
+
+    def adicionar(self, X):
+        # float32 é exato para somas inteiras até 2^24 (lotes bem menores que isso)
+        xf = X.astype(np.float32)
+        self.n       += len(X)
+        self.soma    += xf.sum(axis=0)
+        self.cruzado += xf.T @ xf
+        self.acertos += np.bincount(X.sum(axis=1), minlength=len(self.acertos))
+
+    def itens(self):
+        """DataFrame por item (p, r_pb, r_item_resto, alfa_sem_item) e o alfa da prova."""
+        J   = len(self.soma)
+        p   = self.soma / self.n
+        cov = self.cruzado / self.n - np.outer(p, p)
+        var_item  = np.diag(cov)
+        var_total = cov.sum()
+        cov_total = cov.sum(axis=1)
+        var_resto = var_total - 2 * cov_total + var_item
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r_pb      = cov_total / np.sqrt(var_item * var_total)
+            r_resto   = (cov_total - var_item) / np.sqrt(var_item * var_resto)
+            alfa      = J / (J - 1) * (1 - var_item.sum() / var_total)
+            alfa_sem  = (J - 1) / (J - 2) * (1 - (var_item.sum() - var_item) / var_resto)
+        tabela = pd.DataFrame({'p': p, 'r_pb': r_pb, 'r_item_resto': r_resto, 'alfa_sem_item': alfa_sem},
+                              index=[f"V{j + 1}" for j in range(J)])
+        return tabela, float(alfa), float(var_total)
+
+    def resultado(self, chaves=None):
+        if not self.n:
+            return {'n_alunos': 0, 'descartados': self.descartados}, None
+        tabela, alfa, var_total = self.itens()
+        media, dp = float(self.soma.sum() / self.n), float(np.sqrt(max(var_total, 0.0)))
+        chaves = chaves if chaves is not None and len(chaves) == len(tabela) else list(tabela.index)
+        itens = [{'q_id': q_id, **{k: (None if not np.isfinite(v) else round(float(v), 4))
+                                   for k, v in linha.items()}}
+                 for q_id, (_, linha) in zip(chaves, tabela.iterrows())]
+        resumo = {'n_alunos': int(self.n),
+                  'descartados': int(self.descartados),
+                  'alfa': round(alfa, 4) if np.isfinite(alfa) else None,
+                  'escore': {'media': round(media, 4), 'dp': round(dp, 4),
+                             'epm': round(dp * np.sqrt(1 - alfa), 4) if 0 <= alfa <= 1 else None},
+                  'acertos': self.acertos.tolist(),
+                  'itens': itens}
+        return resumo, tabela
+
+
+def processar_ano(ano):
+    dir_matriz = os.path.join("ENEM", ano, "DADOS", "MATRIZ")
+    path_dados = buscar_path_microdados(ano)
+    path_itens = os.path.join("ENEM", ano, "DADOS", f"ITENS_PROVA_{ano}.json")
+
+    if not path_dados:
+        print(f"❌ Erro: Microdados não encontrados em {ano}/DADOS/")
+        return
+    if not os.path.exists(path_itens):
+        print(f"❌ Erro: {path_itens} não encontrado.")
+        return
+    cabecalhos = localizar_provas(dir_matriz)
+    if not cabecalhos:
+        print(f"⚠️  Nenhuma matriz encontrada em {dir_matriz} (rode o _03 antes).")
+        return
+
+    with open(path_itens, 'r', encoding='utf-8') as f:
+        itens_data = json.load(f)
+    id_map = carregar_id_map(ano)
+
+    provas, pid_para_colunas, linguas = {}, {}, {}
+    for pid, cabecalho in cabecalhos.items():
+        if pid not in itens_data:
+            print(f"⚠️  Prova {pid}: sem gabarito em ITENS_PROVA_{ano}.json — pulando.")
+            continue
+        area = cabecalho.get('sg_area') or id_map.get(pid, {}).get('sg_area')
+        if area not in COLS_PROVAS:
+            print(f"⚠️  Prova {pid}: área '{area}' não reconhecida — pulando.")
+            continue
+        gabarito, chaves = montar_gabarito(itens_data[pid]['QUESTIONS'])
+        provas[pid] = (gabarito, chaves, EstatisticasCTT(len(gabarito)))
+        pid_para_colunas[pid] = (COLS_PROVAS[area], COLS_RESPS[area])
+        if area == 'LC':
+            linguas[pid] = 0  # Somente Inglês (mesmo recorte das matrizes)
+
+    if not provas:
+        return
+
+    print(f"🚀 Lendo: {path_dados}")
+    print(f"📐 TCT de todos os alunos de {len(provas)} provas (uma passada)...")
+    inicio = time.time()
+    for pid, ids, resps in iterar_respostas(path_dados, pid_para_colunas, linguas):
+        gabarito, _, estat = provas[pid]
+        X, validos = pontuar_respostas(resps, gabarito)
+        estat.descartados += int((~validos).sum())
+        if len(X):
+            estat.adicionar(X)
+
+    segundos = round(time.time() - inicio, 1)
+    for pid, (gabarito, chaves, estat) in provas.items():
+        resumo, tabela = estat.resultado(chaves)
+        destino = caminho_ctt(dir_matriz, pid)
+        if tabela is not None:
+            tabela.to_csv(destino, index_label='')
+        info = {'co_prova': pid, 'ano': ano, 'lingua': linguas.get(pid), 'n_itens': len(gabarito),
+                'gabarito_sha1': hash_gabarito(gabarito), **resumo}
+        with open(destino[:-len('.csv')] + '.json', 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2, ensure_ascii=False)
+
+        if resumo['n_alunos']:
+            print(f"✅ {pid}: {resumo['n_alunos']} alunos | alfa {resumo['alfa']} | "
+                  f"média {resumo['escore']['media']:.2f} dp {resumo['escore']['dp']:.2f}")
+        else:
+            print(f"⚠️  {pid}: nenhum aluno com respostas válidas.")
+    print(f"⏱️  Tempo total: {segundos}s → {dir_matriz}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='TCT (p, ponto-bisserial, item-resto, alfa) de todos os alunos')
+    parser.add_argument('anos', nargs='*', default=['2019'], help='Ano(s) do ENEM')
+    args = parser.parse_args()
+
+    for ano in args.anos:
+        processar_ano(ano)
@@ -31,14 +31,21 @@ MT 136 – 180 ==> ex. 1409_136_fig_tri.png
 import json
 import glob
 import os
-import sys
+import shutil
+import argparse
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
+import plotly.io as pio
 from PIL import Image
 from tqdm import tqdm
+from enem_matriz import (localizar_matriz, carregar_matriz, ler_cabecalho, caminho_ic, caminho_reamostras,
+                         caminho_ajuste_itens, caminho_ctt, origens_adaptativas, base_matriz)
+from enem_tri import pontuar_theta, cci_empirica, curvas_teste
+import enem_imagens
 
 # --- CONFIGURAÇÃO INICIAL ---
 warnings.filterwarnings("ignore")
@@ -49,6 +56,24 @@ DPI_resolution = 200
 width_resolution = 2000 
 height_resolution = 1600
 
+# CCI empírica: alunos da matriz agrupados por θ (EAP) em grupos de tamanho
+# igual ('theta') ou por nº de acertos ('acertos'); grupos com menos de
+# MIN_GRUPO_EMPIRICA alunos não viram ponto na figura (mas vão para o JSON)
+AGRUPAR_POR        = 'theta'
+MIN_GRUPO_EMPIRICA = 5
+
+# Violinos: 'kaleido' (plotly, exportados em lote por uma única sessão do
+# Chrome aberta para o ano inteiro), 'matplotlib' (sem navegador) ou 'auto'
+# (kaleido se o Chrome for encontrado, senão matplotlib)
+MOTORES_VIOLINO = ('auto', 'kaleido', 'matplotlib')
+MOTOR_VIOLINO   = 'auto'
+
+# Saída: 'png' (CCI e violino rasterizados por item), 'json' (um
+# FIGS/<CO_PROVA>_estatisticas_<AMOSTRA>.json por prova; a página desenha a
+# CCI no navegador) ou 'ambos'
+SAIDAS = ('png', 'json', 'ambos')
+SAIDA  = 'png'
+
 # --- PALETA DE CORES (PASTEL & PROFESSIONAL) ---
 COLOR_BG       = "#FDFCF6"  # Creme suave
 COLOR_AXIS     = "#FFFFFF"  # Branco
@@ -70,117 +95,215 @@ def carregar_ranking(ano):
             return {str(item['co_prova']): item for item in json.load(f)}
     return {}
 
-def plot_TRI(a, b, c, D, media, mediana, std, f, TAM, i, titulo_custom=""):
+class RenderizadorCCI:
     """
-    Gera o gráfico da Curva Característica do Item (CCI).
+    Figura da CCI montada uma única vez (fundo, grade, eixos, limites e
+    ticks); a cada item, `desenhar` acrescenta só os artistas do item
+    (título, curva, tangente, anotações, caixa de estatísticas), salva o PNG
+    e os remove. Os artistas entram na mesma ordem (e com os mesmos zorders)
+    de uma figura nova, e as margens voltam ao padrão antes do tight_layout:
+    o PNG sai idêntico, pixel a pixel, ao de uma figura criada do zero.
     """
-    theta_max = 5
-    theta = np.arange(-theta_max, theta_max, .05)
-    
-    c = max(0, min(1, c))
-    irt = c + (1 - c) / (1 + np.exp(-D * a * (theta - b)))
-    
-    plt.clf()
-    fig = plt.figure(figsize=(10, 7), facecolor=COLOR_BG)
-    ax = plt.gca()
-    ax.set_facecolor(COLOR_AXIS)
-
-    # ... (Títulos e labels mantidos iguais) ...
-    #plt.title(f"Curva Característica do Item (CCI) - Questão {i}", fontsize=18, fontweight='bold', color=COLOR_TEXT, pad=20)
-    plt.title(f"Curva Característica do Item (CCI) {titulo_custom}", fontsize=18, fontweight='bold', color=COLOR_TEXT, pad=20)
-    
-    if -1 < b <= 1:
-        xlabel_text = "Habilidade ($\theta$): b próximo de 0 (Item Médio)"
-    elif 1 < b <= 3:
-        xlabel_text = "Habilidade ($\theta$): Item Difícil"
-    elif b > 3:
-        xlabel_text = "Habilidade ($\theta$): Item Muito Difícil"
-    elif -3 < b <= -1:
-        xlabel_text = "Habilidade ($\theta$): Item Fácil"
-    elif b <= -3:
-        xlabel_text = "Habilidade ($\theta$): Item Muito Fácil"
-    else:
-        xlabel_text = "Habilidade ($\theta$)"
-    
-    plt.xlabel(xlabel_text, fontsize=14, color=COLOR_TEXT)
 
-    # Calcula o ponto y exato em b pela fórmula (mais preciso que pegar do array)
-    # P(b) = c + (1-c)/2 = (1+c)/2
-    y_at_b = (1 + c) / 2
+    def __init__(self):
+        self.fig = plt.figure(figsize=(10, 7), facecolor=COLOR_BG)
+        self.ax = ax = self.fig.gca()
+        self.margens = {k: getattr(self.fig.subplotpars, k)
+                        for k in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')}
+        ax.set_facecolor(COLOR_AXIS)
+        ax.grid(True, linestyle='--', alpha=0.5, color=COLOR_GRID, zorder=0)
+        ax.set_ylim(-0.02, 1.05)
+        ax.set_xlim(-4, 4)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.spines['left'].set_color(COLOR_TEXT)
+        ax.spines['bottom'].set_color(COLOR_TEXT)
+        ax.tick_params(colors=COLOR_TEXT, labelsize=12)
 
-    plt.grid(True, linestyle='--', alpha=0.5, color=COLOR_GRID, zorder=0)
+    def desenhar(self, a, b, c, D, media, mediana, std, f, TAM, i, titulo_custom="", reamostras=None, nivel=0.95,
+                 ajuste_item=None, ctt_item=None, empirica_item=None):
+        """Desenha e salva a CCI de um item (argumentos de plot_TRI)."""
+        ax = self.ax
+        theta_max = 5
+        theta = np.arange(-theta_max, theta_max, .05)
 
-    # Elementos do Gráfico
-    plt.hlines(c, -4, 4, colors="#F7DC6F", linestyles='--', linewidth=2, zorder=2)
-    plt.scatter(-4, c, color="#F7DC6F", s=100, zorder=10, clip_on=False, edgecolors=COLOR_TEXT)
-    plt.text(-3.8, c + 0.02, f'c={c:.2f}', color=COLOR_TEXT, fontsize=12, fontweight='bold', ha='left', va='bottom')
+        c = max(0, min(1, c))
+        irt = c + (1 - c) / (1 + np.exp(-D * a * (theta - b)))
 
-    plt.vlines(b, 0, y_at_b, linestyle='--', color="#85C1E9", linewidth=2, zorder=2)
-    ax.annotate(f'b = {b:.2f}\n(Dificuldade)', xy=(b, 0.02), xytext=(b + 0.8, 0.15),
-                arrowprops=dict(arrowstyle="->", connectionstyle="arc3,rad=-.2", color=COLOR_TEXT),
-                fontsize=12, color=COLOR_TEXT, bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="#85C1E9", alpha=0.9))
+        # ... (Títulos e labels mantidos iguais) ...
+        ax.set_title(f"Curva Característica do Item (CCI) {titulo_custom}", fontsize=18, fontweight='bold', color=COLOR_TEXT, pad=20)
 
-    # --- CORREÇÃO DA TANGENTE ---
-    x_range = np.arange(b - 1.2, b + 1.2, .1)
-    
-    # Fórmula correta da derivada no ponto de inflexão para 3PL
-    # Slope = D * a * (1 - c) / 4
-    slope = (D * a * (1 - c)) / 4.0
-    
-    def tangent_line_func(x_val):
-        return slope * (x_val - b) + y_at_b
+        if -1 < b <= 1:
+            xlabel_text = "Habilidade ($\theta$): b próximo de 0 (Item Médio)"
+        elif 1 < b <= 3:
+            xlabel_text = "Habilidade ($\theta$): Item Difícil"
+        elif b > 3:
+            xlabel_text = "Habilidade ($\theta$): Item Muito Difícil"
+        elif -3 < b <= -1:
+            xlabel_text = "Habilidade ($\theta$): Item Fácil"
+        elif b <= -3:
+            xlabel_text = "Habilidade ($\theta$): Item Muito Fácil"
+        else:
+            xlabel_text = "Habilidade ($\theta$)"
 
-    plt.plot(x_range, tangent_line_func(x_range), color="#F1948A", linestyle='-', linewidth=3, alpha=0.8, zorder=4)
-    # ----------------------------
-    
-    offset_text_a = -1.5 if b > 0 else 1.5
-    # Ajustei levemente a posição do texto para não sobrepor a reta corrigida
-    ax.annotate(f'a = {a:.2f}\n(Discriminação)', xy=(b - 0.1, y_at_b), xytext=(b + offset_text_a, y_at_b + 0.20),
-                arrowprops=dict(arrowstyle="->", connectionstyle="arc3,rad=.2", color=COLOR_TEXT),
-                fontsize=12, color=COLOR_TEXT, bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="#F1948A", alpha=0.9))
+        ax.set_xlabel(xlabel_text, fontsize=14, color=COLOR_TEXT)
 
-    plt.plot(theta, irt, color="#7DCEA0", linewidth=4, zorder=3)
-    plt.fill_between(theta, irt, alpha=0.15, color="#7DCEA0", zorder=1)
-    plt.scatter(b, y_at_b, color="#E74C3C", s=120, zorder=5, edgecolors='white', linewidth=2)
+        # Calcula o ponto y exato em b pela fórmula (mais preciso que pegar do array)
+        # P(b) = c + (1-c)/2 = (1+c)/2
+        y_at_b = (1 + c) / 2
 
-    # Legenda Superior Direita (Mantida)
-    stats_text = (
-        r"$\bf{Estatísticas}$" + "\n"
-        f"Amostras: {TAM}\n"
-        f"Média: {media:.3f}\n"
-        f"Mediana: {mediana:.3f}\n"
-        f"D.P.: {std:.3f}\n"
-        f"------------------\n"
-        r"$\bf{Parâmetros\ TRI}$" + "\n"
-        f"a: {a:.3f}\n"
-        f"b: {b:.3f}\n"
-        f"c: {c:.3f}"
-    )
-    props = dict(boxstyle='round,pad=0.6', facecolor='white', alpha=0.85, edgecolor='#DDDDDD')
-    plt.text(0.97, 0.97, stats_text, transform=ax.transAxes, fontsize=11, verticalalignment='top', horizontalalignment='right', bbox=props, color='#333333')
-
-    plt.ylim(-0.02, 1.05)
-    plt.xlim(-4, 4)
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['left'].set_color(COLOR_TEXT)
-    ax.spines['bottom'].set_color(COLOR_TEXT)
-    ax.tick_params(colors=COLOR_TEXT, labelsize=12)
-    plt.tight_layout()
-    plt.savefig(f, dpi=DPI_resolution, bbox_inches='tight', facecolor=COLOR_BG)
-    plt.close('all')
-    
-def drawViolinPlot(f, vet, i, titulo_custom=""):
+        # Artistas do item, removidos depois do savefig
+        artistas = []
+
+        # Elementos do Gráfico
+        artistas.append(ax.hlines(c, -4, 4, colors="#F7DC6F", linestyles='--', linewidth=2, zorder=2))
+        artistas.append(ax.scatter(-4, c, color="#F7DC6F", s=100, zorder=10, clip_on=False, edgecolors=COLOR_TEXT))
+        artistas.append(ax.text(-3.8, c + 0.02, f'c={c:.2f}', color=COLOR_TEXT, fontsize=12, fontweight='bold', ha='left', va='bottom'))
+
+        artistas.append(ax.vlines(b, 0, y_at_b, linestyle='--', color="#85C1E9", linewidth=2, zorder=2))
+        artistas.append(ax.annotate(f'b = {b:.2f}\n(Dificuldade)', xy=(b, 0.02), xytext=(b + 0.8, 0.15),
+                                    arrowprops=dict(arrowstyle="->", connectionstyle="arc3,rad=-.2", color=COLOR_TEXT),
+                                    fontsize=12, color=COLOR_TEXT, bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="#85C1E9", alpha=0.9)))
+
+        # --- CORREÇÃO DA TANGENTE ---
+        x_range = np.arange(b - 1.2, b + 1.2, .1)
+
+        # Fórmula correta da derivada no ponto de inflexão para 3PL
+        # Slope = D * a * (1 - c) / 4
+        slope = (D * a * (1 - c)) / 4.0
+
+        def tangent_line_func(x_val):
+            return slope * (x_val - b) + y_at_b
+
+        artistas.extend(ax.plot(x_range, tangent_line_func(x_range), color="#F1948A", linestyle='-', linewidth=3, alpha=0.8, zorder=4))
+        # ----------------------------
+
+        offset_text_a = -1.5 if b > 0 else 1.5
+        # Ajustei levemente a posição do texto para não sobrepor a reta corrigida
+        artistas.append(ax.annotate(f'a = {a:.2f}\n(Discriminação)', xy=(b - 0.1, y_at_b), xytext=(b + offset_text_a, y_at_b + 0.20),
+                                    arrowprops=dict(arrowstyle="->", connectionstyle="arc3,rad=.2", color=COLOR_TEXT),
+                                    fontsize=12, color=COLOR_TEXT, bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="#F1948A", alpha=0.9)))
+
+        artistas.extend(ax.plot(theta, irt, color="#7DCEA0", linewidth=4, zorder=3))
+
+        # CCI empírica: proporção observada de acerto por grupo (área ∝ nº de alunos)
+        if empirica_item is not None:
+            theta_g, prop_g, n_g = empirica_item
+            visiveis = n_g >= MIN_GRUPO_EMPIRICA
+            if visiveis.any():
+                artistas.append(ax.scatter(theta_g[visiveis], prop_g[visiveis], s=20 + 80 * n_g[visiveis] / n_g.max(),
+                                           color="#2E86C1", edgecolors='white', linewidth=1, alpha=0.9, zorder=6,
+                                           clip_on=False))
+        artistas.append(ax.fill_between(theta, irt, alpha=0.15, color="#7DCEA0", zorder=1))
+
+        # Faixa bootstrap: percentis, em cada θ, das curvas das réplicas
+        texto_ic = ""
+        if reamostras is not None:
+            validas = reamostras[np.all(np.isfinite(reamostras), axis=1)]
+            if len(validas):
+                a_r, b_r, c_r = validas[:, 0:1], validas[:, 1:2], np.clip(validas[:, 2:3], 0, 1)
+                curvas = c_r + (1 - c_r) / (1 + np.exp(-D * a_r * (theta - b_r)))
+                alfa = (1 - nivel) / 2 * 100
+                inf, sup = np.percentile(curvas, [alfa, 100 - alfa], axis=0)
+                artistas.append(ax.fill_between(theta, inf, sup, color="#1E8449", alpha=0.25, linewidth=0, zorder=2))
+                lim = np.percentile(validas, [alfa, 100 - alfa], axis=0)
+                texto_ic = (f"------------------\n"
+                            r"$\bf{IC\ " + f"{nivel:.0%}".replace('%', r'\%') + r"\ (bootstrap)}$" + "\n"
+                            f"a: [{lim[0, 0]:.2f}; {lim[1, 0]:.2f}]\n"
+                            f"b: [{lim[0, 1]:.2f}; {lim[1, 1]:.2f}]\n"
+                            f"c: [{lim[0, 2]:.2f}; {lim[1, 2]:.2f}]")
+
+        # Ajuste do item (_04): S-X² e maior |Q3*| com outro item
+        texto_ajuste = ""
+        if ajuste_item is not None:
+            alertas = [nome for nome, col in (('desajuste', 'desajuste'), ('dependência local', 'dependencia'))
+                       if bool(ajuste_item.get(col))]
+            texto_ajuste = (f"------------------\n"
+                            r"$\bf{Ajuste\ do\ item}$" + "\n"
+                            f"S-X²: {ajuste_item['S_X2']:.1f} (gl {int(ajuste_item['gl'])}, p={ajuste_item['p_SX2']:.3f})\n"
+                            f"Q3*: {ajuste_item['Q3_max']:+.2f} (com {ajuste_item['Q3_par']})"
+                            + (f"\nATENÇÃO: {' e '.join(alertas)}" if alertas else ""))
+
+        # TCT da população inteira (_04d)
+        texto_ctt = ""
+        if ctt_item is not None:
+            texto_ctt = (f"------------------\n"
+                         r"$\bf{TCT\ (todos\ os\ alunos)}$" + "\n"
+                         f"p: {ctt_item['p']:.3f}\n"
+                         f"r ponto-bisserial: {ctt_item['r_pb']:.3f}\n"
+                         f"r item-resto: {ctt_item['r_item_resto']:.3f}\n"
+                         f"alfa sem o item: {ctt_item['alfa_sem_item']:.3f}")
+
+        artistas.append(ax.scatter(b, y_at_b, color="#E74C3C", s=120, zorder=5, edgecolors='white', linewidth=2))
+
+        # Legenda Superior Direita (Mantida)
+        stats_text = (
+            r"$\bf{Estatísticas}$" + "\n"
+            f"Amostras: {TAM}\n"
+            f"Média: {media:.3f}\n"
+            f"Mediana: {mediana:.3f}\n"
+            f"D.P.: {std:.3f}\n"
+            f"------------------\n"
+            r"$\bf{Parâmetros\ TRI}$" + "\n"
+            f"a: {a:.3f}\n"
+            f"b: {b:.3f}\n"
+            f"c: {c:.3f}"
+            + ("\n" + texto_ic if texto_ic else "")
+            + ("\n" + texto_ajuste if texto_ajuste else "")
+            + ("\n" + texto_ctt if texto_ctt else "")
+        )
+        props = dict(boxstyle='round,pad=0.6', facecolor='white', alpha=0.85, edgecolor='#DDDDDD')
+        artistas.append(ax.text(0.97, 0.97, stats_text, transform=ax.transAxes, fontsize=11, verticalalignment='top', horizontalalignment='right', bbox=props, color='#333333'))
+
+        # tight_layout parte sempre das margens de uma figura nova
+        self.fig.subplots_adjust(**self.margens)
+        self.fig.tight_layout()
+        self.fig.savefig(f, dpi=DPI_resolution, bbox_inches='tight', facecolor=COLOR_BG)
+        for artista in artistas:
+            artista.remove()
+
+# Renderizador do processo (criado no primeiro uso ou pelo inicializador do pool)
+_RENDERIZADOR = {}
+
+def _iniciar_renderizador():
+    """Inicializador de cada processo do pool: monta a figura da CCI uma vez."""
+    _RENDERIZADOR['cci'] = RenderizadorCCI()
+
+def _renderizar_cci(tarefa):
+    """Desenha uma CCI (tarefa = kwargs de plot_TRI); devolve o caminho do PNG."""
+    if 'cci' not in _RENDERIZADOR:
+        _iniciar_renderizador()
+    _RENDERIZADOR['cci'].desenhar(**tarefa)
+    return tarefa['f']
+
+def plot_TRI(a, b, c, D, media, mediana, std, f, TAM, i, titulo_custom="", reamostras=None, nivel=0.95,
+             ajuste_item=None, ctt_item=None, empirica_item=None):
     """
-    Gera um gráfico de Violino proporcional, centralizado e com fontes grandes
-    adequadas para exportação em alta resolução.
+    Gera o gráfico da Curva Característica do Item (CCI), com a figura
+    reaproveitada do RenderizadorCCI do processo.
+    `reamostras`: (a, b, c) de cada réplica bootstrap do item (B x 3, _04c);
+    desenha a faixa percentil da curva no `nivel` de confiança.
+    `ajuste_item`: linha do _TRI_ajuste.csv (S-X², Q3*); itens sinalizados
+    recebem o aviso na caixa de estatísticas.
+    `ctt_item`: linha do <CO_PROVA>_CTT.csv (_04d, população inteira).
+    `empirica_item`: (θ médio, proporção de acerto, nº de alunos) por grupo
+    (calcular_empirica); desenhados como pontos sobre a curva do modelo.
+    """
+    _renderizar_cci(dict(a=a, b=b, c=c, D=D, media=media, mediana=mediana, std=std, f=f, TAM=TAM, i=i,
+                         titulo_custom=titulo_custom, reamostras=reamostras, nivel=nivel, ajuste_item=ajuste_item,
+                         ctt_item=ctt_item, empirica_item=empirica_item))
+
+def figura_violino(vet, i, titulo_custom=""):
+    """
+    Monta (plotly) o gráfico de Violino proporcional, centralizado e com fontes
+    grandes adequadas para exportação em alta resolução; None se não há dados.
     """
 
     vet = vet[~np.isnan(vet)]
     
     if len(vet) == 0:
         print(f"⚠️ Aviso: Dados insuficientes para gerar Violin Plot da questão {i}. Pulando.")
-        return
+        return None
     
     s = f'Questão {i}'
 
@@ -299,6 +422,13 @@ def drawViolinPlot(f, vet, i, titulo_custom=""):
         )
     )
 
+    return fig
+
+def drawViolinPlot(f, vet, i, titulo_custom=""):
+    """Gera e exporta (Kaleido, uma sessão do navegador por chamada) o Violino de um item."""
+    fig = figura_violino(vet, i, titulo_custom)
+    if fig is None:
+        return
     try:
         # Exportação usando Kaleido
         # width/height aqui definem a resolução final do pixel
@@ -310,7 +440,203 @@ def drawViolinPlot(f, vet, i, titulo_custom=""):
         print(f"⚠️ Erro ao salvar Violin Plot {i}: {e}")
         print("   DICA: Verifique se o pacote 'kaleido' está instalado: pip install -U kaleido")
 
-def draw_signoits(output_folder, filename_base, mat, mat_raw, ranking):
+def _cor_mpl(cor):
+    """Cor CSS da paleta ('#RRGGBB' ou 'rgba(r, g, b, a)') no formato do matplotlib."""
+    if cor.startswith('rgba('):
+        r, g, b, a = (float(v) for v in cor[5:-1].split(','))
+        return (r / 255, g / 255, b / 255, a)
+    return cor
+
+def violino_matplotlib(f, vet, i, titulo_custom=""):
+    """
+    O mesmo Violino do drawViolinPlot desenhado só com matplotlib, para
+    máquinas sem Chrome (Kaleido): mesma paleta, anotações Q1/Média/Q3 e
+    caixa de estatísticas, PNG de width_resolution x height_resolution.
+    """
+    vet = vet[~np.isnan(vet)]
+
+    if len(vet) == 0:
+        print(f"⚠️ Aviso: Dados insuficientes para gerar Violin Plot da questão {i}. Pulando.")
+        return
+
+    s = f'Questão {i}'
+
+    # Estatísticas
+    q1 = np.percentile(vet, 25)
+    q3 = np.percentile(vet, 75)
+    media = np.mean(vet)
+    n_amostras = len(vet)
+
+    # Tamanhos em pontos (a 200 DPI) equivalentes aos do layout plotly
+    FONT_TITLE = 20
+    FONT_AXIS = 16
+    FONT_ANNOT = 14
+    FONT_LEGEND = 13
+    LINE_WIDTH = 2
+
+    fig, ax = plt.subplots(figsize=(width_resolution / DPI_resolution, height_resolution / DPI_resolution),
+                           dpi=DPI_resolution, facecolor=COLOR_BG)
+    ax.set_facecolor(COLOR_BG)
+
+    # --- Violino (densidade indefinida se todos os valores são iguais) ---
+    if np.ptp(vet) > 0:
+        partes = ax.violinplot(vet, positions=[0], widths=0.8, showextrema=False)
+        for corpo in partes['bodies']:
+            corpo.set_facecolor(_cor_mpl(COLOR_VIOLIN_FILL))
+            corpo.set_edgecolor(COLOR_VIOLIN_LINE)
+            corpo.set_linewidth(1.5)
+            corpo.set_alpha(0.8)
+
+    # Boxplot Interno (Transparente com borda grossa) e Linha da Média
+    ax.boxplot(vet, positions=[0], widths=0.12, showfliers=False, patch_artist=True,
+               boxprops=dict(facecolor='none', edgecolor=COLOR_BOX_LINE, linewidth=LINE_WIDTH),
+               whiskerprops=dict(color=COLOR_BOX_LINE, linewidth=LINE_WIDTH),
+               capprops=dict(color=COLOR_BOX_LINE, linewidth=LINE_WIDTH),
+               medianprops=dict(color=COLOR_BOX_LINE, linewidth=LINE_WIDTH))
+    ax.hlines(media, -0.3, 0.3, color=COLOR_MEAN, linewidth=LINE_WIDTH, zorder=4)
+
+    # --- Anotações Internas (Q1, Média, Q3) ---
+    anotacoes = [
+        (q1, 'Q1', -0.35, COLOR_Q_TEXT), # x_shift negativo = esquerda
+        (media, 'Média', 0.35, COLOR_MEAN), # x_shift positivo = direita
+        (q3, 'Q3', -0.35, COLOR_Q_TEXT)
+    ]
+    for valor, txt, x_shift, cor in anotacoes:
+        ax.annotate(txt, xy=(0, valor), xytext=(x_shift * 100, 0), textcoords='offset points',
+                    ha='right' if x_shift < 0 else 'left', va='center', fontsize=FONT_ANNOT, fontweight='bold',
+                    color=cor, arrowprops=dict(arrowstyle='-|>', color=cor, linewidth=LINE_WIDTH),
+                    bbox=dict(boxstyle='square,pad=0.2', fc='white', ec='none', alpha=0.7))
+
+    # --- Legenda Lateral (caixa no canto superior direito) ---
+    legenda = (r"$\bf{Estatísticas}$" + "\n"
+               f"Q3: {q3:.2f}\n"
+               f"Média: {media:.2f}\n"
+               f"Q1: {q1:.2f}\n\n"
+               f"Amostras: {n_amostras}")
+    ax.text(0.98, 0.98, legenda, transform=ax.transAxes, fontsize=FONT_LEGEND, ha='right', va='top', multialignment='left',
+            color=COLOR_TEXT, bbox=dict(boxstyle='square,pad=0.5', fc='white', ec=COLOR_GRID, lw=2, alpha=0.85))
+
+    # --- Layout ---
+    ax.set_title(f"Distribuição de Acertos {titulo_custom}", fontsize=FONT_TITLE, color=COLOR_TEXT)
+    ax.set_xlim(-1, 1)
+    ax.set_xticks([0], [s])
+    ax.tick_params(axis='x', length=0, labelsize=FONT_TITLE, labelcolor=COLOR_TEXT)
+    ax.tick_params(axis='y', length=0, labelsize=FONT_AXIS, labelcolor=COLOR_TEXT)
+    for t in ax.get_xticklabels():
+        t.set_fontweight('bold')
+    ax.grid(True, axis='y', color=COLOR_GRID, linewidth=1.5)
+    ax.set_axisbelow(True)
+    for lado in ('top', 'right', 'bottom', 'left'):
+        ax.spines[lado].set_visible(False)
+    fig.subplots_adjust(left=0.107, right=0.893, top=0.917, bottom=0.083)  # margens do layout plotly
+    fig.savefig(f, dpi=DPI_resolution, facecolor=COLOR_BG)
+    plt.close(fig)
+
+def _violino_matplotlib(tarefa):
+    """Desenha um Violino (tarefa = f, vet, i, titulo_custom); devolve o caminho do PNG."""
+    violino_matplotlib(*tarefa)
+    return tarefa[0]
+
+def chrome_disponivel():
+    """True se o Kaleido encontra um Chrome/Chromium para exportar as figuras plotly."""
+    try:
+        import kaleido
+        kaleido.Kaleido()  # só localiza o navegador; ele é aberto na exportação
+    except Exception:
+        return False
+    return True
+
+def resolver_motor_violino(motor):
+    """
+    Motor efetivo dos violinos ('kaleido' ou 'matplotlib') para o `motor` pedido.
+    Só 'auto' cai para matplotlib sem Chrome; 'kaleido' explícito gera RuntimeError.
+    """
+    if motor == 'matplotlib':
+        return motor
+    if chrome_disponivel():
+        return 'kaleido'
+    if motor == 'kaleido':
+        raise RuntimeError("Chrome não encontrado para o Kaleido (--violino kaleido). "
+                           "Instale com: kaleido_get_chrome, ou use --violino auto/matplotlib.")
+    print("⚠️  Chrome não encontrado para o Kaleido (instale com: kaleido_get_chrome) "
+          "— violinos desenhados com matplotlib.")
+    return 'matplotlib'
+
+def exportar_violinos(tarefas, motor, pool=None, desc="Violino"):
+    """
+    Violinos pendentes (f, vet, i, titulo_custom). 'kaleido': as figuras plotly
+    vão todas numa única chamada de write_images (na sessão do Chrome aberta
+    pelo genStatistics), em vez de um write_image por figura; se a exportação
+    falhar, os que faltam são desenhados com matplotlib. 'matplotlib':
+    violino_matplotlib, no `pool` de processos quando houver.
+    """
+    if motor == 'kaleido' and tarefas:
+        figuras = [(f, figura_violino(vet, i, titulo)) for f, vet, i, titulo in tarefas]
+        figuras = [(f, fig) for f, fig in figuras if fig is not None]
+        try:
+            pio.write_images([fig for _, fig in figuras], [f for f, _ in figuras],
+                             width=width_resolution, height=height_resolution)
+            print(f"      🎻 {len(figuras)} violinos exportados em lote (Kaleido)")
+            return
+        except Exception as e:
+            print(f"⚠️ Erro ao exportar os Violin Plots em lote: {e}")
+            print("   ↪ desenhando os que faltam com matplotlib")
+            tarefas = [t for t in tarefas if not os.path.exists(t[0])]
+    if not tarefas:
+        return
+    if pool is not None:
+        resultados = pool.map(_violino_matplotlib, tarefas)
+    else:
+        resultados = map(_violino_matplotlib, tarefas)
+    for _ in tqdm(resultados, total=len(tarefas), desc=desc, unit="img"):
+        pass
+
+def q_id_da_coluna(area, i):
+    """q_id (chave JSON / NNN do arquivo) da coluna i da matriz de uma área."""
+    if area == 'LC':
+        # No Dia 1, LC tem 45 itens na matriz (Inglês + Port)
+        # i=0..4 -> "1".."5" | i=5..44 -> "06".."45"
+        return str(i + 1) if i < 5 else str(i + 1).zfill(2)
+    elif area == 'CH':
+        # Matriz 0..44 vira Questões 46..90
+        return str(i + 46)
+    elif area == 'CN':
+        # Matriz 0..44 vira Questões 91..135
+        return str(i + 91)
+    elif area == 'MT':
+        # Matriz 0..44 vira Questões 136..180
+        return str(i + 136)
+    return str(i + 1)
+
+def renderizar_ccis(tarefas, pool=None, desc="CCI"):
+    """
+    Desenha as CCIs de `tarefas` (kwargs de plot_TRI), no `pool` de processos
+    (cada um com o seu RenderizadorCCI) ou, sem pool, no próprio processo.
+    """
+    if not tarefas:
+        return
+    if pool is not None:
+        resultados = pool.map(_renderizar_cci, tarefas)
+    else:
+        resultados = map(_renderizar_cci, tarefas)
+    for _ in tqdm(resultados, total=len(tarefas), desc=desc, unit="img"):
+        pass
+
+def draw_signoits(output_folder, filename_base, mat, mat_raw, ranking, codigo_ref=None, cor_ref=None,
+                  bootstrap=None, ajuste_itens=None, ctt=None, empirica=None, pool=None, motor_violino='kaleido'):
+    """
+    `codigo_ref`/`cor_ref`: usados pela matriz agrupada por CO_ITEM (ITENS-*),
+    cujas figuras levam o nome do caderno de referência.
+    `bootstrap`: réplicas do _04c (carregar_bootstrap); CCIs mais antigas que
+    elas são redesenhadas com a faixa de confiança.
+    `ajuste_itens`: S-X²/Q3 do _04 (carregar_ajuste_itens); idem.
+    `ctt`: TCT do _04d (carregar_ctt); idem.
+    `empirica`: CCI empírica (calcular_empirica); idem.
+    `pool`: processos do RenderizadorCCI (genStatistics); as CCIs pendentes de
+    cada código são distribuídas entre eles.
+    `motor_violino`: 'kaleido' ou 'matplotlib' (exportar_violinos).
+    """
+    fontes = [x['mtime'] for x in (bootstrap, ajuste_itens, ctt, empirica) if x is not None]
     nome_arquivo = os.path.basename(filename_base)
     # Ex: 505_000100_data_TRI.csv
     partes = nome_arquivo.split('_')
@@ -322,7 +648,7 @@ def draw_signoits(output_folder, filename_base, mat, mat_raw, ranking):
     tam = partes[1].zfill(6) 
 
     # Se o ID original contiver um par (ex: 508_512), o split resolve
-    codigos = codigo_original.split('_')
+    codigos = [codigo_ref] if codigo_ref else codigo_original.split('_')
 
     print(f"   -> Processando: {codigo_original} | Amostra: {tam}")
     
@@ -330,36 +656,32 @@ def draw_signoits(output_folder, filename_base, mat, mat_raw, ranking):
         # Busca metadados no ranking para o título
         meta = ranking.get(str(codigo), {})
         area = meta.get('sg_area', 'NI')
-        cor = meta.get('tx_cor', 'NI')
+        cor = cor_ref or meta.get('tx_cor', 'NI')
         print(f"      → Processando código {codigo} ({area} - {cor})...")
         
-        for i in tqdm(range(mat.shape[0]), desc=f"Prova {codigo}", unit="img"):
+        tarefas, violinos = [], []
+        for i in range(mat.shape[0]):
             a, b, c, m, st, med = mat[i][0], mat[i][1], mat[i][2], mat[i][3], mat[i][4], mat[i][5]
-            D = 1.7
+            D = 1.0  # Parametrização do _04 (ltm com IRT.param = TRUE): sem a constante 1.7
 
             # LÓGICA DE MAPEAMENTO NNN (q_id do JSON)
-            if area == 'LC':
-                # No Dia 1, LC tem 45 itens na matriz (Inglês + Port)
-                # i=0..4 -> "1".."5" | i=5..44 -> "06".."45"
-                q_id = str(i + 1) if i < 5 else str(i + 1).zfill(2)
-            elif area == 'CH':
-                # Matriz 0..44 vira Questões 46..90
-                q_id = str(i + 46)
-            elif area == 'CN':
-                # Matriz 0..44 vira Questões 91..135
-                q_id = str(i + 91)
-            elif area == 'MT':
-                # Matriz 0..44 vira Questões 136..180
-                q_id = str(i + 136)
-            else:
-                q_id = str(i + 1)
+            q_id = q_id_da_coluna(area, i)
 
             questao_titulo = f"Questão {q_id} - {area} ({cor})"
             # TRI
             #fimg_tri = os.path.join(output_folder, f"{codigo}_{str(i + 1).zfill(3)}_fig_tri_{tam}.png")
             fimg_tri = os.path.join(output_folder, f"{codigo}_{q_id}_fig_tri_{tam}.png")
-            if not os.path.exists(fimg_tri):
-                plot_TRI(a, b, c, D, m, med, st, fimg_tri, tam, i + 1, titulo_custom=questao_titulo) # Passando o número da questão
+            desatualizada = (bool(fontes) and os.path.exists(fimg_tri)
+                             and os.path.getmtime(fimg_tri) < max(fontes))
+            if not os.path.exists(fimg_tri) or desatualizada:
+                tarefas.append(dict(a=a, b=b, c=c, D=D, media=m, mediana=med, std=st, f=fimg_tri, TAM=tam,
+                                    i=i + 1, titulo_custom=questao_titulo, # Passando o número da questão
+                                    reamostras=bootstrap['reamostras'][:, i, :] if bootstrap is not None else None,
+                                    nivel=bootstrap['nivel'] if bootstrap is not None else 0.95,
+                                    ajuste_item=ajuste_itens['tabela'].iloc[i] if ajuste_itens is not None else None,
+                                    ctt_item=ctt['tabela'].iloc[i] if ctt is not None else None,
+                                    empirica_item=((empirica['theta'], empirica['proporcao'][i], empirica['n'])
+                                                   if empirica is not None else None)))
 
             # Violin
             if i < mat_raw.shape[1]:
@@ -367,9 +689,288 @@ def draw_signoits(output_folder, filename_base, mat, mat_raw, ranking):
                 #fimg_box = os.path.join(output_folder, f"{codigo}_{str(i + 1).zfill(3)}_fig_box_{tam}.png")
                 fimg_box = os.path.join(output_folder, f"{codigo}_{q_id}_fig_box_{tam}.png")
                 if not os.path.exists(fimg_box):
-                    drawViolinPlot(fimg_box, dados_item, i + 1, titulo_custom=questao_titulo)
+                    violinos.append((fimg_box, dados_item, i + 1, questao_titulo))
+
+        renderizar_ccis(tarefas, pool, desc=f"Prova {codigo}")
+        exportar_violinos(violinos, motor_violino, pool, desc=f"Violinos {codigo}")
+
+def carregar_bootstrap(f_data, n_itens):
+    """Réplicas bootstrap (_04c) da matriz: {'reamostras': B x J x 3, 'nivel', 'mtime'} ou None."""
+    caminho = caminho_reamostras(f_data)
+    if not os.path.exists(caminho):
+        return None
+    info_ic = caminho_ic(f_data)[:-len('.csv')] + '.json'
+    nivel = 0.95
+    if os.path.exists(info_ic):
+        with open(info_ic, 'r', encoding='utf-8') as f:
+            nivel = json.load(f).get('nivel', nivel)
+    with np.load(caminho) as z:
+        reamostras = np.stack([z['a'], z['b'], z['c']], axis=-1)[:, :n_itens, :]
+    return {'reamostras': reamostras, 'nivel': nivel, 'mtime': os.path.getmtime(caminho)}
+
+def carregar_ajuste_itens(f_data, n_itens):
+    """S-X²/Q3 (_TRI_ajuste.csv do _04) da matriz: {'tabela': DataFrame (J linhas), 'mtime'} ou None."""
+    caminho = caminho_ajuste_itens(f_data)
+    if not os.path.exists(caminho):
+        return None
+    tabela = pd.read_csv(caminho, index_col=0).iloc[:n_itens]
+    return {'tabela': tabela, 'mtime': os.path.getmtime(caminho)}
+
+def carregar_ctt(input_dir, co_prova, n_itens):
+    """TCT da prova (<CO_PROVA>_CTT.csv do _04d): {'tabela': DataFrame (J linhas), 'mtime'} ou None."""
+    caminho = caminho_ctt(input_dir, co_prova)
+    if not os.path.exists(caminho):
+        return None
+    tabela = pd.read_csv(caminho, index_col=0)
+    if len(tabela) < n_itens:
+        return None
+    return {'tabela': tabela.iloc[:n_itens], 'mtime': os.path.getmtime(caminho)}
+
+def membros_da_matriz(cabecalho, f_tri):
+    """{co_prova: mapa} das provas da matriz (mapa: coluna da matriz de cada item; None = mesma ordem)."""
+    if cabecalho.get('agrupada'):
+        return cabecalho['membros']
+    return {str(cabecalho.get('co_prova', os.path.basename(f_tri).split('_')[0])): None}
+
+def _arredondar(valor, casas=4):
+    """Número para o JSON da página: arredondado, None se não finito."""
+    return round(float(valor), casas) if np.isfinite(valor) else None
+
+def salvar_estatisticas(output_folder, f_tri, mat, cabecalho, ranking, tam, input_dir,
+                        bootstrap=None, ajuste_itens=None, empirica=None):
+    """
+    JSON compacto de cada prova da matriz para a página desenhar as CCIs no
+    navegador (em vez dos PNGs): FIGS/<CO_PROVA>_estatisticas_<AMOSTRA>.json,
+    com a, b, c, média/mediana/DP de acertos, IC bootstrap, S-X²/Q3*, TCT e
+    a CCI empírica (θ e nº de alunos dos grupos; proporções por item), por q_id.
+    Matriz agrupada: um JSON por cor, na ordem do caderno. Retorna os caminhos.
+    """
+    membros = membros_da_matriz(cabecalho, f_tri)
+    area = (ranking.get(cabecalho.get('referencia') or next(iter(membros)), {}).get('sg_area')
+            or cabecalho.get('sg_area'))
+    f_info = f_tri[:-len('.csv')] + '.json'
+    modelo = None
+    if os.path.exists(f_info):
+        with open(f_info, 'r', encoding='utf-8') as f:
+            modelo = json.load(f).get('modelo')
 
-def genStatistics(ano):
+    limites_ic = None
+    if bootstrap is not None:
+        alfa = (1 - bootstrap['nivel']) / 2 * 100
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            limites_ic = np.nanpercentile(bootstrap['reamostras'], [alfa, 100 - alfa], axis=0)  # 2 x J x 3
+
+    destinos = []
+    for co_prova, mapa in membros.items():
+        colunas = mapa if mapa is not None else range(len(mat))
+        ctt = carregar_ctt(input_dir, co_prova, len(colunas))
+        meta = ranking.get(co_prova, {})
+        itens = {}
+        for k, j in enumerate(colunas):
+            if j >= len(mat):
+                continue
+            a, b, c, media, dp, mediana = mat[j][:6]
+            item = {'a': _arredondar(a), 'b': _arredondar(b), 'c': _arredondar(c),
+                    'media': _arredondar(media), 'mediana': _arredondar(mediana), 'dp': _arredondar(dp)}
+            if limites_ic is not None:
+                item['ic'] = {p: [_arredondar(limites_ic[0, j, n]), _arredondar(limites_ic[1, j, n])]
+                              for n, p in enumerate(('a', 'b', 'c'))}
+            if ajuste_itens is not None:
+                linha = ajuste_itens['tabela'].iloc[j]
+                item['ajuste'] = {'S_X2': _arredondar(linha['S_X2'], 2), 'gl': int(linha['gl']),
+                                  'p_SX2': _arredondar(linha['p_SX2']), 'Q3_max': _arredondar(linha['Q3_max']),
+                                  'Q3_par': str(linha['Q3_par']),
+                                  'desajuste': bool(linha['desajuste']), 'dependencia': bool(linha['dependencia'])}
+            if ctt is not None:
+                item['ctt'] = {col: _arredondar(v) for col, v in ctt['tabela'].iloc[k].items()}
+            if empirica is not None:
+                item['empirica'] = [_arredondar(v) for v in empirica['proporcao'][j]]
+            itens[q_id_da_coluna(area, k)] = item
+
+        info = {'co_prova': co_prova, 'amostra': int(tam), 'area': area, 'cor': meta.get('tx_cor'),
+                'modelo': modelo, 'D': 1.0, 'nivel_ic': bootstrap['nivel'] if bootstrap is not None else None}
+        if empirica is not None:
+            info['empirica'] = {'agrupar_por': AGRUPAR_POR, 'min_grupo': MIN_GRUPO_EMPIRICA,
+                                'theta': [_arredondar(v) for v in empirica['theta']],
+                                'n': empirica['n'].tolist()}
+        info['itens'] = itens
+        destino = os.path.join(output_folder, f"{co_prova}_estatisticas_{tam}.json")
+        with open(destino, 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False, separators=(',', ':'))
+        destinos.append(destino)
+    return destinos
+
+def plot_curvas_teste(curvas, f, titulo_custom, TAM):
+    """Informação da prova com o erro-padrão condicional (eixo da direita) e o escore esperado."""
+    theta, n_itens = curvas['theta'], curvas['P'].shape[0]
+    fig, (ax_info, ax_escore) = plt.subplots(1, 2, figsize=(16, 7), facecolor=COLOR_BG)
+    fig.suptitle(f"Curvas da Prova {titulo_custom}", fontsize=18, fontweight='bold', color=COLOR_TEXT)
+    for ax in (ax_info, ax_escore):
+        ax.set_facecolor(COLOR_AXIS)
+        ax.grid(True, linestyle='--', alpha=0.5, color=COLOR_GRID, zorder=0)
+        ax.set_xlim(theta[0], theta[-1])
+        ax.set_xlabel(r"Habilidade ($\theta$)", fontsize=14, color=COLOR_TEXT)
+        ax.spines['top'].set_visible(False)
+        for lado in ('left', 'bottom', 'right'):
+            ax.spines[lado].set_color(COLOR_TEXT)
+        ax.tick_params(colors=COLOR_TEXT, labelsize=12)
+
+    # Informação: soma das informações dos itens (faixas finas ao fundo)
+    ax_info.plot(theta, curvas['info_itens'].T, color="#A9CCE3", linewidth=1, alpha=0.6, zorder=2)
+    ax_info.fill_between(theta, curvas['info'], alpha=0.15, color="#2E86C1", zorder=1)
+    linha_info, = ax_info.plot(theta, curvas['info'], color="#2E86C1", linewidth=4, zorder=3, label="Informação")
+    ax_info.axvline(curvas['theta_info_max'], linestyle='--', color="#85C1E9", linewidth=2, zorder=2)
+    ax_info.set_ylim(0, curvas['info_max'] * 1.1)
+    ax_info.set_ylabel("Informação da prova I($\\theta$)", fontsize=14, color="#2E86C1")
+    ax_info.set_title("Informação e erro-padrão", fontsize=14, color=COLOR_TEXT)
+
+    ax_ep = ax_info.twinx()
+    linha_ep, = ax_ep.plot(theta, curvas['ep'], color="#EC7063", linewidth=3, linestyle='--', zorder=4,
+                           label="Erro-padrão")
+    ax_ep.set_ylim(0, min(curvas['ep'].max(), 2.0) * 1.1)
+    ax_ep.set_ylabel("Erro-padrão EP($\\theta$)", fontsize=14, color="#EC7063")
+    ax_ep.spines['top'].set_visible(False)
+    ax_ep.spines['right'].set_color(COLOR_TEXT)
+    ax_ep.tick_params(colors=COLOR_TEXT, labelsize=12)
+    ax_info.legend([linha_info, linha_ep], [linha_info.get_label(), linha_ep.get_label()], loc='upper left',
+                   fontsize=11)
+
+    stats_text = (
+        r"$\bf{Prova}$" + "\n"
+        f"Amostras: {TAM}\n"
+        f"Itens: {n_itens}\n"
+        f"Máx. informação: {curvas['info_max']:.2f}\n"
+        f"em $\\theta$ = {curvas['theta_info_max']:.2f}\n"
+        f"Confiabilidade marginal: {curvas['confiabilidade']:.3f}"
+    )
+
+    # Escore esperado: nº de acertos previsto pelo modelo em cada θ (caixa da prova no canto livre)
+    ax_escore.fill_between(theta, curvas['escore'], alpha=0.15, color="#7DCEA0", zorder=1)
+    ax_escore.plot(theta, curvas['escore'], color="#7DCEA0", linewidth=4, zorder=3)
+    ax_escore.set_ylim(0, n_itens)
+    ax_escore.set_ylabel("Escore esperado (acertos)", fontsize=14, color=COLOR_TEXT)
+    ax_escore.set_title("Escore esperado", fontsize=14, color=COLOR_TEXT)
+    props = dict(boxstyle='round,pad=0.6', facecolor='white', alpha=0.85, edgecolor='#DDDDDD')
+    ax_escore.text(0.97, 0.03, stats_text, transform=ax_escore.transAxes, fontsize=11, verticalalignment='bottom',
+                   horizontalalignment='right', bbox=props, color='#333333', zorder=10)
+
+    fig.tight_layout()
+    fig.savefig(f, dpi=DPI_resolution, bbox_inches='tight', facecolor=COLOR_BG)
+    plt.close(fig)
+
+def salvar_curvas_teste(output_folder, f_tri, mat, cabecalho, ranking, tam, png=True):
+    """
+    Curvas de cada prova da matriz (enem_tri.curvas_teste: CCIs e informação
+    de todos os itens na grade de θ numa única operação): informação, erro-
+    padrão condicional e escore esperado, em FIGS/<CO_PROVA>_curvas_teste_<AMOSTRA>.json
+    e, com `png`, em FIGS/<CO_PROVA>_fig_teste_<AMOSTRA>.png. Refeitos só se
+    o _TRI.csv mudou. Retorna os caminhos gravados.
+    """
+    membros = membros_da_matriz(cabecalho, f_tri)
+    area = (ranking.get(cabecalho.get('referencia') or next(iter(membros)), {}).get('sg_area')
+            or cabecalho.get('sg_area'))
+    origem = os.path.getmtime(f_tri)
+
+    destinos = []
+    for co_prova, mapa in membros.items():
+        f_json = os.path.join(output_folder, f"{co_prova}_curvas_teste_{tam}.json")
+        f_png  = os.path.join(output_folder, f"{co_prova}_fig_teste_{tam}.png")
+        pendentes = [f for f in ((f_json, f_png) if png else (f_json,))
+                     if not os.path.exists(f) or os.path.getmtime(f) < origem]
+        if not pendentes:
+            continue
+        colunas = [j for j in (mapa if mapa is not None else range(len(mat))) if j < len(mat)]
+        params = mat[colunas, :3]
+        curvas = curvas_teste(params[:, 0], params[:, 1], np.clip(params[:, 2], 0, 1))
+
+        if f_json in pendentes:
+            # Informação de cada item só no máximo (a curva inteira sai de a, b, c)
+            k_max = curvas['info_itens'].argmax(axis=1)
+            itens = {q_id_da_coluna(area, k): {'theta_info_max': _arredondar(curvas['theta'][k_max[k]]),
+                                               'info_max': _arredondar(curvas['info_itens'][k, k_max[k]])}
+                     for k in range(len(colunas))}
+            info = {'co_prova': co_prova, 'amostra': int(tam), 'area': area,
+                    'cor': ranking.get(co_prova, {}).get('tx_cor'), 'D': 1.0, 'n_itens': len(colunas),
+                    'theta': [_arredondar(v, 2) for v in curvas['theta']],
+                    'info': [_arredondar(v) for v in curvas['info']],
+                    'ep': [_arredondar(v) for v in curvas['ep']],
+                    'escore': [_arredondar(v) for v in curvas['escore']],
+                    'theta_info_max': _arredondar(curvas['theta_info_max']),
+                    'info_max': _arredondar(curvas['info_max']),
+                    'confiabilidade': _arredondar(curvas['confiabilidade']),
+                    'itens': itens}
+            with open(f_json, 'w', encoding='utf-8') as f:
+                json.dump(info, f, ensure_ascii=False, separators=(',', ':'))
+            destinos.append(f_json)
+        if f_png in pendentes:
+            cor = ranking.get(co_prova, {}).get('tx_cor', 'NI')
+            plot_curvas_teste(curvas, f_png, f"{co_prova} - {area} ({cor})", tam)
+            destinos.append(f_png)
+    return destinos
+
+def calcular_empirica(output_folder, f_tri, f_data, mat_respostas, params, cabecalho, ranking, tam):
+    """
+    CCI empírica da matriz (enem_tri.cci_empirica, com θ = EAP dos parâmetros
+    do _TRI.csv) e o seu JSON para a página: FIGS/<CO_PROVA>_cci_empirica_<AMOSTRA>.json,
+    com as proporções por q_id. Matriz agrupada: um JSON por cor, na ordem do
+    caderno. O JSON só é refeito se a matriz ou o _TRI.csv mudaram; o seu mtime
+    decide o redesenho das CCIs. Retorna {theta, n, proporcao, mtime}.
+    """
+    a, b, c = (params[:, k] for k in range(3))
+    theta    = pontuar_theta(mat_respostas, a, b, c)['eap']
+    empirica = cci_empirica(mat_respostas, theta, por=AGRUPAR_POR)
+
+    membros = membros_da_matriz(cabecalho, f_tri)
+    area = (ranking.get(cabecalho.get('referencia') or next(iter(membros)), {}).get('sg_area')
+            or cabecalho.get('sg_area'))
+    origem = max(os.path.getmtime(f_tri), os.path.getmtime(f_data))
+    grupos = {'theta': [round(float(v), 4) for v in empirica['theta']],
+              'n': empirica['n'].tolist(),
+              'acertos_min': empirica['acertos_min'].tolist(),
+              'acertos_max': empirica['acertos_max'].tolist()}
+
+    mtimes = []
+    for co_prova, mapa in membros.items():
+        destino = os.path.join(output_folder, f"{co_prova}_cci_empirica_{tam}.json")
+        if not os.path.exists(destino) or os.path.getmtime(destino) < origem:
+            colunas = mapa if mapa is not None else range(len(params))
+            itens = {q_id_da_coluna(area, k): [round(float(v), 4) for v in empirica['proporcao'][j]]
+                     for k, j in enumerate(colunas) if j < len(params)}
+            with open(destino, 'w', encoding='utf-8') as f:
+                json.dump({'co_prova': co_prova, 'amostra': int(tam), 'agrupar_por': AGRUPAR_POR,
+                           'grupos': grupos, 'itens': itens}, f, ensure_ascii=False)
+        mtimes.append(os.path.getmtime(destino))
+    return {**empirica, 'mtime': max(mtimes)}
+
+def ligar_figuras(output_folder, cabecalho, ranking, tam):
+    """
+    Matriz agrupada por CO_ITEM: cada cor aponta (link simbólico) para a figura
+    do mesmo item no caderno de referência, em vez de desenhá-la de novo.
+    """
+    ref  = cabecalho['referencia']
+    area = ranking.get(ref, {}).get('sg_area') or cabecalho.get('sg_area')
+    n_links = 0
+    for co_prova, mapa in cabecalho['membros'].items():
+        if co_prova == ref:
+            continue
+        for k, j_ref in enumerate(mapa):
+            for tipo in ('tri', 'box'):
+                alvo = f"{ref}_{q_id_da_coluna(area, j_ref)}_fig_{tipo}_{tam}.png"
+                link = os.path.join(output_folder, f"{co_prova}_{q_id_da_coluna(area, k)}_fig_{tipo}_{tam}.png")
+                if not os.path.exists(os.path.join(output_folder, alvo)):
+                    continue
+                if os.path.lexists(link):
+                    os.remove(link)
+                try:
+                    os.symlink(alvo, link)
+                except OSError:
+                    # Sistemas sem links simbólicos: cópia do arquivo
+                    shutil.copyfile(os.path.join(output_folder, alvo), link)
+                n_links += 1
+    print(f"      🔗 {n_links} figuras das outras cores ligadas ao caderno {ref}")
+
+def genStatistics(ano, workers=1, motor_violino=MOTOR_VIOLINO, saida=SAIDA, imagens=None):
     # --- CAMINHOS ATUALIZADOS ---
     input_dir = f"./ENEM/{ano}/DADOS/MATRIZ"
     output_dir = f"./ENEM/{ano}/FIGS"
@@ -396,22 +997,69 @@ def genStatistics(ano):
     # Dentro de genStatistics...
     ranking = carregar_ranking(ano)
 
+    # Processos de desenho das CCIs: a figura de cada um é montada uma só vez
+    png = saida in ('png', 'ambos')
+    motor_violino = resolver_motor_violino(motor_violino) if png else None
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_renderizador) if png and workers > 1 else None
+
+    # Violinos: um único Chrome (servidor do Kaleido) para todas as provas do ano
+    if png:
+        print(f"🎻 Violinos: {motor_violino}")
+    if motor_violino == 'kaleido':
+        import kaleido
+        kaleido.start_sync_server(silence_warnings=True)
+
+    # Pool e Chrome são encerrados mesmo se uma prova falhar no meio
+    try:
+        _processar_provas(files_tri, input_dir, output_dir, ranking, saida, pool, motor_violino)
+        if png:
+            # WebP/AVIF, larguras do srcset e paleta (enem_imagens), só das figuras novas ou alteradas
+            imagens = imagens or enem_imagens.CONFIG_IMAGENS
+            figuras = sorted(glob.glob(os.path.join(output_dir, '*_fig_*.png')))
+            n_otimizadas = enem_imagens.otimizar_pasta(figuras, imagens, pool)
+            if n_otimizadas:
+                print(f"\n🗜️  {n_otimizadas} figuras convertidas ({imagens['formato']})")
+            enem_imagens.salvar_manifesto(output_dir, 'fig', imagens)
+            enem_imagens.relatorio_imagens(output_dir, imagens['orcamento_kb'])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if motor_violino == 'kaleido':
+            kaleido.stop_sync_server(silence_warnings=True)
+    print(f"\n✅ Concluído! Imagens em: {output_dir}")
+
+def _processar_provas(files_tri, input_dir, output_dir, ranking, saida, pool, motor_violino):
+    """Estatísticas, curvas e figuras de cada _TRI.csv do ano (laço do genStatistics)."""
+    png = saida in ('png', 'ambos')
+    # Origens da amostra adaptativa (_04 --adaptativo): a prova é desenhada pelo prefixo final
+    origens = origens_adaptativas(input_dir)
+
     for f_tri in files_tri:
         print(f"\nProcessando: {os.path.basename(f_tri)}")
-        f_data = f_tri.replace('_TRI.csv', '.csv')
+        # Matriz de acertos: *_data.npy (compactada, via memmap) ou *_data.csv (legado)
+        f_data = localizar_matriz(f_tri)
+        if f_data and base_matriz(f_data) in origens:
+            print("   ↪ origem da amostra adaptativa (figuras pelo prefixo final)")
+            continue
+
+        # _TRI.csv de uma cor gerado como visão da matriz agrupada: figuras vêm por link
+        f_info = f_tri[:-len('.csv')] + '.json'
+        if os.path.exists(f_info):
+            with open(f_info, 'r', encoding='utf-8') as f:
+                if json.load(f).get('visao_de'):
+                    print("   ↪ visão da matriz agrupada por CO_ITEM (figuras ligadas)")
+                    continue
       
-        if not os.path.exists(f_data):
-            print(f"❌ Erro: Dados brutos não encontrados: {f_data}")
+        if not f_data:
+            print(f"❌ Erro: Dados brutos não encontrados para: {os.path.basename(f_tri)}")
             continue
 
         try:
-            df_mat = pd.read_csv(f_data, sep=',', header=None)
+            mat_respostas = carregar_matriz(f_data)
             df_tri = pd.read_csv(f_tri, sep=',')
         except Exception as e:
             print(f"Erro CSV: {e}")
             continue
-
-        mat_respostas = df_mat.to_numpy()
         
         # Atualiza o tamanho da amostra com o valor real da matriz
         n_amostras_real = mat_respostas.shape[0]
@@ -449,18 +1097,66 @@ def genStatistics(ano):
         # Para garantir consistência, podemos atualizar o nome do arquivo ficticiamente 
         # ou apenas confiar na validação feita aqui. Vamos manter a chamada original,
         # mas a função draw_signoits terá uma verificação redundante (segurança).
-        draw_signoits(output_dir, f_tri, mat_final, mat_respostas, ranking)
-        
-    print(f"\n✅ Concluído! Imagens em: {output_dir}")
+        cabecalho = ler_cabecalho(f_data)
+        bootstrap = carregar_bootstrap(f_data, n_min)
+        ajuste_itens = carregar_ajuste_itens(f_data, n_min)
+        co_prova = cabecalho.get('referencia') or str(cabecalho.get('co_prova', os.path.basename(f_tri).split('_')[0]))
+        ctt = carregar_ctt(input_dir, co_prova, n_min)
+        amostra = str(cabecalho.get('amostra') or os.path.basename(f_tri).split('_')[1]).zfill(6)
+        empirica = calcular_empirica(output_dir, f_tri, f_data, mat_respostas, mat_tri_params, cabecalho, ranking,
+                                     amostra)
+        # Informação, erro-padrão e escore esperado da prova (figura e JSON)
+        destinos = salvar_curvas_teste(output_dir, f_tri, mat_final, cabecalho, ranking, amostra,
+                                       png=saida in ('png', 'ambos'))
+        if destinos:
+            print(f"   📈 {', '.join(os.path.basename(d) for d in destinos)}")
+        if saida in ('json', 'ambos'):
+            # Estatísticas por prova para a página desenhar as CCIs no navegador
+            destinos = salvar_estatisticas(output_dir, f_tri, mat_final, cabecalho, ranking, amostra, input_dir,
+                                           bootstrap=bootstrap, ajuste_itens=ajuste_itens, empirica=empirica)
+            print(f"   📦 {', '.join(os.path.basename(d) for d in destinos)}")
+        if not png:
+            continue
+        if cabecalho.get('agrupada'):
+            # Uma figura por item (todas as cores), com o nome do caderno de referência
+            tam = str(cabecalho['amostra']).zfill(6)
+            draw_signoits(output_dir, f_tri, mat_final, mat_respostas, ranking,
+                          codigo_ref=cabecalho['referencia'], cor_ref='TODAS AS CORES',
+                          bootstrap=bootstrap, ajuste_itens=ajuste_itens, ctt=ctt, empirica=empirica, pool=pool,
+                          motor_violino=motor_violino)
+            ligar_figuras(output_dir, cabecalho, ranking, tam)
+        else:
+            draw_signoits(output_dir, f_tri, mat_final, mat_respostas, ranking, bootstrap=bootstrap,
+                          ajuste_itens=ajuste_itens, ctt=ctt, empirica=empirica, pool=pool,
+                          motor_violino=motor_violino)
 
 if __name__ == "__main__":
     names = [str(i) for i in range(2009, 2030)]
-    if len(sys.argv) < 2:
-        print("Uso: python _09_matriz2graficos.py [ano]")
-        sys.exit(1)
-    
-    for arg in sys.argv[1:]:
+    parser = argparse.ArgumentParser(description='Gráficos (CCI e violino) das matrizes ajustadas pelo _04')
+    parser.add_argument('anos', nargs='+', help='Ano(s) do ENEM')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processos desenhando as CCIs em paralelo (padrão: nº de CPUs)')
+    parser.add_argument('--violino', choices=MOTORES_VIOLINO, default=MOTOR_VIOLINO,
+                        help="Motor dos violinos: 'kaleido' (plotly, exportação em lote; requer Chrome), "
+                             f"'matplotlib' (sem navegador) ou 'auto' (padrão: {MOTOR_VIOLINO})")
+    parser.add_argument('--saida', choices=SAIDAS, default=SAIDA,
+                        help="'png' (figuras por item), 'json' (estatísticas por prova; CCI desenhada "
+                             f"na página) ou 'ambos' (padrão: {SAIDA})")
+    enem_imagens.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    try:
+        imagens = enem_imagens.configuracao_dos_argumentos(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.saida in ('png', 'ambos'):
+        try:
+            resolver_motor_violino(args.violino)  # 'kaleido' explícito sem Chrome: erro antes de começar
+        except RuntimeError as e:
+            parser.error(str(e))
+
+    for arg in args.anos:
         if arg in names:
-            genStatistics(arg)
+            genStatistics(arg, args.workers, args.violino, args.saida, imagens)
         else:
             print(f"Ano inválido: {arg}")
\ No newline at end of file
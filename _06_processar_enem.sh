@@ -69,7 +69,8 @@ rm -rf "$TEMP_FATIAS"
 # 4. Itera sobre cada CO_PROVA para gerar as imagens data individuais [cite: 13, 16]
 for CID in $CO_PROVAS; do
     log_info "      → Gerando imagens para ID: $CID"
-    log_info "Comando: \npython3 _06b_gerar_img_data.py \"$ANO\" \"$CID\" \"$NOME_PROVA_TEXTO\""
+    log_info "Comando: \npython3 _06b_gerar_img_data.py \"$ANO\" \"$CID\" \"$NOME_PROVA_TEXTO\" $OPCOES_IMAGENS"
 
-    python3 _06b_gerar_img_data.py "$ANO" "$CID" "$NOME_PROVA_TEXTO"
+    # OPCOES_IMAGENS (exportada pelo _00_all.sh) sem aspas: várias opções
+    python3 _06b_gerar_img_data.py "$ANO" "$CID" "$NOME_PROVA_TEXTO" $OPCOES_IMAGENS
 done
@@ -34,7 +34,10 @@ MT 136 – 180 ==> ex. 1409_136_img_data.png
 
 ─────────────────────────────────────────────────────────────────────────────
 USO:
-  python3 _06b_gerar_img_data.py <ANO> <CO_PROVA> <NOME_PROVA>
+  python3 _06b_gerar_img_data.py <ANO> <CO_PROVA> <NOME_PROVA> [opções de imagem]
+
+  Opções de imagem (enem_imagens): --formato webp|avif, --largura-max PX,
+  --paleta, --orcamento-kb KB, --srcset 640,1280
 
   Exemplos:
     python3 _06b_gerar_img_data.py 2024 1386 ENEM_2024_P1_CAD_04_DIA_1_VERDE
@@ -42,12 +45,13 @@ USO:
 =============================================================================
 """
 #!/usr/bin/env python3
-import sys
 import os
+import argparse
 import json
 import glob
 import re
 from PIL import Image
+import enem_imagens
 
 INI_JOIN_THRESHOLD = 0.25 
 
@@ -58,7 +62,7 @@ def juntar_vertical(img_top, img_bot):
     combined.paste(img_bot, (0, img_top.height))
     return combined
 
-def gerar_img_data(ano, co_prova, nome_prova):
+def gerar_img_data(ano, co_prova, nome_prova, imagens=None):
     dir_imagens = os.path.join('ENEM', ano, 'PROVAS_E_GABARITOS', 'imagens', nome_prova)
     dir_figs = os.path.join('ENEM', ano, 'FIGS')
     os.makedirs(dir_figs, exist_ok=True)
@@ -144,9 +148,22 @@ def gerar_img_data(ano, co_prova, nome_prova):
         else:
             img_final = img_principal
 
-        img_final.save(os.path.join(dir_figs, dest_nome), 'PNG')
+        enem_imagens.salvar_imagem(img_final, os.path.join(dir_figs, dest_nome), imagens)
         print(f"✅ Salvo: {dest_nome} (Base: {os.path.basename(fatia)})")
 
+    imagens = imagens or enem_imagens.CONFIG_IMAGENS
+    enem_imagens.salvar_manifesto(dir_figs, 'img_data', imagens)
+    enem_imagens.relatorio_imagens(dir_figs, imagens['orcamento_kb'])
+
 if __name__ == "__main__":
-    if len(sys.argv) == 4:
-        gerar_img_data(sys.argv[1], sys.argv[2], sys.argv[3])
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Imagens das questões (img_data) a partir das fatias do PDF')
+    parser.add_argument('ano')
+    parser.add_argument('co_prova')
+    parser.add_argument('nome_prova')
+    enem_imagens.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    try:
+        imagens = enem_imagens.configuracao_dos_argumentos(args)
+    except ValueError as e:
+        parser.error(str(e))
+    gerar_img_data(args.ano, args.co_prova, args.nome_prova, imagens)
\ No newline at end of file
@@ -0,0 +1,338 @@
+'''
+=============================================================================
+enem_imagens.py
+=============================================================================
+Saída otimizada das imagens de ENEM/<ANO>/FIGS, usada por _05 (CCIs e
+violinos) e _06b (fatias das questões).
+
+O PNG de cada figura continua com o nome de sempre (links do
+ITENS_PROVA_<ANO>.json, uso offline). Conforme a configuração, ao lado dele:
+
+  <BASE>.<FMT>        ← WebP/AVIF com no máximo `largura_max` px de largura e
+                        qualidade reduzida (e, no limite, a largura) até caber
+                        em `orcamento_kb`
+  <BASE>_<L>w.<FMT>   ← variantes menores para o srcset (larguras `srcset`),
+                        também dentro de `orcamento_kb`; a variante que não
+                        sairia mais estreita que a principal não é gravada
+
+Com formato 'png' não há versão à parte: `largura_max` e `orcamento_kb` valem
+para o próprio PNG.
+
+`paleta`: o próprio PNG é quantizado para até 256 cores, sem pontilhado —
+gráficos de cores chapadas ficam várias vezes menores sem diferença visível —
+e o WebP sai sem perdas a partir dessa paleta.
+Desligado (padrão), o PNG sai byte a byte como antes.
+
+─────────────────────────────────────────────────────────────────────────────
+FIGS/imagens.json         ← configuração por tipo ('fig' do _05, 'img_data'
+                            do _06b) e as larguras reais das versões de cada
+                            figura, para a página montar o <picture>/srcset
+FIGS/relatorio_imagens.json
+                          ← bytes e nº de arquivos por tipo de figura e
+                            formato, e as imagens acima do orçamento
+=============================================================================
+'''
+
+import io
+import os
+import re
+import glob
+import json
+
+from PIL import Image, features
+
+FORMATOS = ('png', 'webp', 'avif')
+
+CONFIG_IMAGENS = {
+    'formato': 'png',       # formato das versões para a página ('png': nenhuma além do PNG)
+    'largura_max': None,    # px; None mantém a largura original
+    'paleta': False,        # PNG quantizado (até 256 cores)
+    'orcamento_kb': None,   # teto de bytes da versão principal
+    'srcset': (),           # larguras das variantes menores
+    'qualidade': 85,        # qualidade inicial do WebP/AVIF
+}
+QUALIDADE_MIN = 40          # abaixo disso, reduz a largura em vez da qualidade
+LARGURA_MIN   = 320
+
+_VARIANTE = re.compile(r'_\d+w\.(png|webp|avif)$')
+
+
+def configuracao_imagens(**opcoes):
+    """CONFIG_IMAGENS com as `opcoes` dadas (None = padrão); ValueError se o formato não é suportado."""
+    config = dict(CONFIG_IMAGENS)
+    config.update({k: v for k, v in opcoes.items() if v is not None})
+    if config['formato'] not in FORMATOS:
+        raise ValueError(f"Formato de imagem desconhecido: {config['formato']} (use {', '.join(FORMATOS)})")
+    if config['formato'] != 'png' and not features.check(config['formato']):
+        raise ValueError(f"O Pillow instalado não grava {config['formato'].upper()}")
+    config['srcset'] = tuple(sorted(int(l) for l in config['srcset']))
+    return config
+
+def otimizacao_ativa(config):
+    """True se a configuração muda algo em relação ao PNG puro."""
+    return config is not None and (config['formato'] != 'png' or config['paleta']
+                                   or bool(config['largura_max']) or bool(config['srcset']))
+
+def eh_variante(caminho):
+    """True para as variantes do srcset (<BASE>_<L>w.<FMT>)."""
+    return bool(_VARIANTE.search(caminho))
+
+def caminhos_variantes(caminho_png, config):
+    """{largura ou None (principal): caminho} das versões de um PNG na configuração."""
+    base, ext = os.path.splitext(caminho_png)[0], config['formato']
+    caminhos = {l: f"{base}_{l}w.{ext}" for l in config['srcset']}
+    if ext != 'png':
+        caminhos[None] = f"{base}.{ext}"
+    elif config['largura_max']:
+        caminhos[None] = caminho_png
+    return caminhos
+
+
+def _reduzir(img, largura):
+    if not largura or img.width <= largura:
+        return img
+    return img.resize((largura, round(img.height * largura / img.width)), Image.LANCZOS)
+
+def _quantizar(img):
+    # FASTOCTREE aceita RGBA (figuras do matplotlib); sem pontilhado nas cores chapadas
+    return img.quantize(colors=256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+
+def _codificar(img, formato, qualidade, paleta=False):
+    buffer = io.BytesIO()
+    if formato == 'png':
+        (_quantizar(img) if paleta else img).save(buffer, 'PNG', optimize=paleta)
+    elif formato == 'webp' and paleta:
+        # Cores chapadas: WebP sem perdas da imagem quantizada (menor que o PNG e que o WebP com perdas)
+        _quantizar(img).save(buffer, 'WEBP', lossless=True, quality=80, method=4)
+    elif formato == 'webp':
+        img.save(buffer, 'WEBP', quality=qualidade, method=4)
+    else:
+        img.save(buffer, 'AVIF', quality=qualidade, speed=6)
+    return buffer.getvalue()
+
+def _no_orcamento(img, config):
+    """Bytes da versão principal: qualidade e, se preciso, largura reduzidas até o orçamento."""
+    formato, orcamento = config['formato'], config['orcamento_kb']
+    qualidade = config['qualidade']
+    while True:
+        dados = _codificar(img, formato, qualidade, config['paleta'])
+        if not orcamento or len(dados) <= orcamento * 1024:
+            return dados, img.width, True
+        com_perdas = formato == 'avif' or (formato == 'webp' and not config['paleta'])
+        if com_perdas and qualidade - 10 >= QUALIDADE_MIN:
+            qualidade -= 10
+        elif img.width * 0.85 >= LARGURA_MIN:
+            img, qualidade = _reduzir(img, int(img.width * 0.85)), config['qualidade']
+        else:
+            return dados, img.width, False
+
+def _gravar(caminho, dados):
+    with open(caminho, 'wb') as f:
+        f.write(dados)
+
+def salvar_imagem(img, caminho_png, config=None, regravar_png=True):
+    """
+    Grava o PNG (quantizado se `paleta`) e as versões da configuração.
+    Retorna os registros [{arquivo, formato, largura, bytes, no_orcamento}].
+    """
+    config = config or CONFIG_IMAGENS
+    if img.mode not in ('RGB', 'RGBA', 'L', 'P'):
+        img = img.convert('RGBA')
+    registros = []
+    if regravar_png:
+        if config['paleta']:
+            _gravar(caminho_png, _codificar(img, 'png', None, paleta=True))
+        else:
+            img.save(caminho_png, 'PNG')
+    if img.mode == 'P':
+        img = img.convert('RGBA')
+
+    def registrar(destino, dados, largura, ok):
+        _gravar(destino, dados)
+        registros.append({'arquivo': os.path.basename(destino), 'formato': config['formato'],
+                          'largura': largura, 'bytes': len(dados), 'no_orcamento': ok})
+
+    caminhos = caminhos_variantes(caminho_png, config)
+    principal = caminhos.pop(None, None)
+    if principal:
+        dados, largura_principal, ok = _no_orcamento(_reduzir(img, config['largura_max']), config)
+        registrar(principal, dados, largura_principal, ok)
+    else:
+        largura_principal = img.width
+    for largura, destino in caminhos.items():
+        if largura >= largura_principal:
+            # Não sairia mais estreita que a principal (figura pequena ou reduzida pelo orçamento)
+            if os.path.lexists(destino):
+                os.remove(destino)
+            continue
+        registrar(destino, *_no_orcamento(_reduzir(img, largura), config))
+    return registros
+
+def pendente(caminho_png, config):
+    """True se o PNG (já gravado) ainda não tem as versões atuais da configuração."""
+    if not otimizacao_ativa(config):
+        return False
+    with Image.open(caminho_png) as img:
+        if config['paleta'] and img.mode != 'P':
+            return True
+        if config['formato'] == 'png' and config['largura_max'] and img.width > config['largura_max']:
+            return True
+    mtime = os.path.getmtime(caminho_png)
+    caminhos = caminhos_variantes(caminho_png, config)
+    principal = caminhos.pop(None, caminho_png)
+    if not os.path.exists(principal) or os.path.getmtime(principal) < mtime:
+        return True
+    largura_principal = _largura(principal)
+    for largura, destino in caminhos.items():
+        if largura >= largura_principal:
+            continue  # variante descartada em salvar_imagem
+        if not os.path.exists(destino) or os.path.getmtime(destino) < mtime:
+            return True
+    return False
+
+def _largura(caminho):
+    with Image.open(caminho) as img:  # só o cabeçalho
+        return img.width
+
+def otimizar_png(caminho_png, config):
+    """Versões de um PNG já gravado (figuras do matplotlib/Kaleido); o PNG só é regravado com `paleta`."""
+    with Image.open(caminho_png) as img:
+        img.load()
+        regravar = config['paleta'] and img.mode != 'P'
+        return salvar_imagem(img, caminho_png, config, regravar_png=regravar)
+
+def _ligar_variantes(link, config):
+    """Figura ligada (symlink do _05): as versões apontam para as do alvo."""
+    alvo = os.readlink(link)
+    for l, destino in caminhos_variantes(link, config).items():
+        if destino == link:
+            continue
+        alvo_variante = os.path.basename(caminhos_variantes(alvo, config)[l])
+        if os.path.lexists(destino):
+            os.remove(destino)
+        if os.path.exists(os.path.join(os.path.dirname(link), alvo_variante)):
+            os.symlink(alvo_variante, destino)
+
+def otimizar_pasta(arquivos, config, pool=None):
+    """
+    Gera as versões que faltam (ou estão desatualizadas) dos PNGs `arquivos`,
+    no `pool` de processos quando houver. Retorna o nº de PNGs processados.
+    """
+    if not otimizacao_ativa(config):
+        return 0
+    pngs  = [f for f in arquivos if not eh_variante(f)]
+    links = [f for f in pngs if os.path.islink(f)]
+    tarefas = [(f, config) for f in pngs if not os.path.islink(f) and pendente(f, config)]
+    if pool is not None:
+        list(pool.map(_otimizar_tarefa, tarefas))
+    else:
+        for tarefa in tarefas:
+            _otimizar_tarefa(tarefa)
+    for link in links:
+        _ligar_variantes(link, config)
+    return len(tarefas)
+
+def _otimizar_tarefa(tarefa):
+    caminho_png, config = tarefa
+    return otimizar_png(caminho_png, config)
+
+
+def larguras_reais(dir_figs, tipo, config):
+    """
+    {<BASE>: [[sufixo, largura], ...]} das versões WebP/AVIF gravadas das figuras
+    do `tipo` (sufixo '' da principal e '_<L>w' das variantes, da mais estreita
+    para a mais larga): a largura real depois de `largura_max` e do orçamento.
+    """
+    larguras = {}
+    if config['formato'] == 'png':
+        return larguras
+    for png in sorted(glob.glob(os.path.join(dir_figs, '*.png'))):
+        nome = os.path.basename(png)
+        if eh_variante(nome) or not _tipo_imagem(nome).startswith(tipo):
+            continue
+        versoes = [[f"_{l}w" if l else '', _largura(destino)]
+                   for l, destino in caminhos_variantes(png, config).items() if os.path.exists(destino)]
+        if versoes:
+            larguras[os.path.splitext(nome)[0]] = sorted(versoes, key=lambda v: v[1])
+    return larguras
+
+def salvar_manifesto(dir_figs, tipo, config):
+    """
+    Registra em FIGS/imagens.json a configuração das imagens do `tipo` ('fig' ou 'img_data')
+    e as larguras reais das versões de cada figura (larguras_reais).
+    """
+    caminho = os.path.join(dir_figs, 'imagens.json')
+    manifesto = {}
+    if os.path.exists(caminho):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+    if otimizacao_ativa(config):
+        manifesto[tipo] = {k: (list(v) if isinstance(v, tuple) else v) for k, v in config.items()}
+        manifesto[tipo]['larguras'] = larguras_reais(dir_figs, tipo, config)
+    else:
+        manifesto.pop(tipo, None)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+
+def _tipo_imagem(nome):
+    for tipo in ('fig_tri', 'fig_box', 'fig_teste', 'img_data'):
+        if f"_{tipo}" in nome:
+            return tipo
+    return 'outros'
+
+def relatorio_imagens(dir_figs, orcamento_kb=None):
+    """
+    Bytes e nº de arquivos por tipo (fig_tri, fig_box, fig_teste, img_data) e formato
+    (png, webp, avif; variantes do srcset à parte) de FIGS; links simbólicos
+    são contados, mas não somados. Grava FIGS/relatorio_imagens.json.
+    """
+    totais, acima, n_links = {}, [], 0
+    for caminho in sorted(glob.glob(os.path.join(dir_figs, '*'))):
+        ext = os.path.splitext(caminho)[1].lstrip('.').lower()
+        if ext not in FORMATOS:
+            continue
+        if os.path.islink(caminho):
+            n_links += 1
+            continue
+        nome = os.path.basename(caminho)
+        chave = f"{ext}_srcset" if eh_variante(nome) else ext
+        tamanho = os.path.getsize(caminho)
+        grupo = totais.setdefault(_tipo_imagem(nome), {}).setdefault(chave, {'arquivos': 0, 'bytes': 0})
+        grupo['arquivos'] += 1
+        grupo['bytes'] += tamanho
+        if orcamento_kb and ext != 'png' and tamanho > orcamento_kb * 1024:
+            acima.append({'arquivo': nome, 'kb': round(tamanho / 1024, 1)})
+
+    relatorio = {'orcamento_kb': orcamento_kb, 'links': n_links, 'tipos': totais, 'acima_do_orcamento': acima}
+    with open(os.path.join(dir_figs, 'relatorio_imagens.json'), 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+
+    print(f"📏 Imagens em {dir_figs}:")
+    for tipo, formatos in totais.items():
+        partes = [f"{fmt} {g['arquivos']} arq. {g['bytes'] / 2**20:.1f} MB" for fmt, g in sorted(formatos.items())]
+        print(f"   {tipo:9s} " + " | ".join(partes))
+    if acima:
+        print(f"   ⚠️  {len(acima)} imagens acima de {orcamento_kb} KB mesmo com qualidade e largura mínimas")
+    return relatorio
+
+
+def adicionar_argumentos(parser):
+    """Opções de imagem comuns ao _05 e ao _06b."""
+    grupo = parser.add_argument_group('imagens')
+    grupo.add_argument('--formato', choices=FORMATOS, default=CONFIG_IMAGENS['formato'],
+                       help="Versão das figuras para a página: webp, avif ou png (padrão: só o PNG)")
+    grupo.add_argument('--largura-max', type=int, default=None,
+                       help='Largura máxima (px) da versão principal')
+    grupo.add_argument('--paleta', action='store_true',
+                       help='Quantiza o PNG para até 256 cores (gráficos de cores chapadas)')
+    grupo.add_argument('--orcamento-kb', type=int, default=None,
+                       help='Teto de KB da versão principal (reduz qualidade e, se preciso, a largura)')
+    grupo.add_argument('--srcset', default='',
+                       help='Larguras das variantes para srcset, separadas por vírgula (ex.: 640,1280)')
+    return parser
+
+def configuracao_dos_argumentos(args):
+    """configuracao_imagens() a partir das opções de adicionar_argumentos."""
+    return configuracao_imagens(formato=args.formato, largura_max=args.largura_max, paleta=args.paleta,
+                                orcamento_kb=args.orcamento_kb,
+                                srcset=[int(l) for l in args.srcset.split(',') if l.strip()])
@@ -0,0 +1,325 @@
+'''
+=============================================================================
+enem_matriz.py
+=============================================================================
+Matrizes de acertos (0/1) dos alunos, usadas por _03, _04 e _05.
+
+pontuar_respostas(): correção vetorizada das strings TX_RESPOSTAS_* contra o
+gabarito. As respostas viram um array de bytes de largura fixa (S45 → uint8)
+e a comparação com o gabarito é feita em uma única operação, produzindo a
+matriz uint8 diretamente (viável para milhões de alunos).
+
+  RESPOSTAS (N strings)      "ABCDE..."   → uint8 (N x 45)
+  GABARITO                   "ABDCE..."   → uint8 (45,)
+  ACERTOS                    resp == gab  → uint8 (N x 45) com 0/1
+
+─────────────────────────────────────────────────────────────────────────────
+FORMATO EM DISCO — ENEM/<ANO>/DADOS/MATRIZ/
+
+  <CO_PROVA>_<AMOSTRA>_data.npy    ← bits compactados (np.packbits por linha)
+  <CO_PROVA>_<AMOSTRA>_data.json   ← cabeçalho: CO_PROVA, língua, amostra,
+                                     amostragem (método/semente),
+                                     n_alunos, n_itens, hash do gabarito
+  <CO_PROVA>_<AMOSTRA>_data.csv    ← formato texto legado (ainda aceito)
+  <CO_PROVA>_<AMOSTRA>_data_padroes.npz
+                                   ← padrões de resposta distintos (bits
+                                     compactados) + nº de alunos de cada um
+  <CO_PROVA>_<AMOSTRA>_data_TRI.csv← saída do _04 (mesmo nome nos 2 formatos)
+  <CO_PROVA>_<AMOSTRA>_data_TRI_IC.csv / _TRI_boot.npz
+                                   ← intervalos bootstrap e réplicas (_04c)
+  <CO_PROVA>_CTT.csv / .json      ← TCT (p, ponto-bisserial, item-resto,
+                                     alfa) de TODOS os alunos da prova (_04d)
+  <CO_PROVA>_<AMOSTRA>_data_TRI_ajuste.csv / _TRI_Q3.csv
+                                   ← ajuste dos itens (S-X²) e dependência
+                                     local (Q3), gerados pelo _04
+  ITENS-<AREA>-<REF>_<AMOSTRA>_data.npy
+                                   ← matriz agrupada por CO_ITEM: alunos de
+                                     todas as cores de uma área, colunas na
+                                     ordem do caderno de referência REF
+                                     (ver agrupar_cores)
+
+Uma matriz 1M x 45 ocupa ~6 MB (6 bytes por aluno) em vez de ~90 MB em CSV,
+e é aberta via np.memmap (np.load(..., mmap_mode='r')) em milissegundos.
+Como muitos alunos repetem o mesmo vetor de 45 acertos (sobretudo nos
+extremos), o _04 estima a TRI sobre a tabela de padrões distintos, com o nº
+de alunos como peso: o custo passa a depender dos padrões, não dos alunos.
+=============================================================================
+'''
+
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+FORMATO_VERSAO = 1
+
+
+def _como_bytes(resps):
+    """Converte as respostas para um array de bytes (dtype S), sem laço por aluno."""
+    resps = np.asarray(resps, dtype=object)
+    try:
+        return resps.astype('S')
+    except UnicodeEncodeError:
+        # Microdados são latin1: caracteres fora do ASCII (raros) exigem encode explícito
+        return np.array([str(r).encode('latin1', errors='replace') for r in resps], dtype='S')
+
+def pontuar_respostas(resps, gabarito):
+    """
+    Corrige as respostas contra o gabarito.
+    Respostas com tamanho diferente do gabarito são descartadas (mesmo critério
+    do laço original `len(r) == len(gabarito)`).
+    Retorna (matriz uint8 N_validos x J, máscara booleana das respostas válidas).
+    """
+    n_itens = len(gabarito)
+    if len(resps) == 0:
+        return np.zeros((0, n_itens), dtype=np.uint8), np.zeros(0, dtype=bool)
+
+    arr     = _como_bytes(resps)
+    validos = np.char.str_len(arr) == n_itens
+
+    bloco   = arr[validos].astype(f'S{n_itens}').view(np.uint8).reshape(-1, n_itens)
+    gab     = np.frombuffer(gabarito.encode('latin1'), dtype=np.uint8)
+
+    return (bloco == gab).astype(np.uint8), validos
+
+
+def montar_gabarito(questions):
+    """
+    Gabarito dos alunos de Inglês a partir de QUESTIONS (ITENS_PROVA_<ANO>.json):
+    as chaves de Espanhol ("01" a "05") são ignoradas para que o tamanho do
+    gabarito (45) bata com a string TX_RESPOSTAS_LC (45).
+    Retorna (gabarito, chaves em ordem de questão).
+    """
+    chaves_validas = [k for k in questions.keys() if k not in ["01", "02", "03", "04", "05"]]
+    chaves_ord     = sorted(chaves_validas, key=lambda x: int(x))
+    return "".join([questions[k]['answer'] for k in chaves_ord]), chaves_ord
+
+
+# ==================== FORMATO BINÁRIO (.npy + .json) ====================
+
+def base_matriz(caminho):
+    """Remove a extensão: .../1221_002000_data.npy → .../1221_002000_data"""
+    for ext in ('.npy', '.json', '.csv'):
+        if caminho.endswith(ext):
+            return caminho[:-len(ext)]
+    return caminho
+
+def hash_gabarito(gabarito):
+    return hashlib.sha1(gabarito.encode('latin1')).hexdigest()
+
+def salvar_matriz(caminho_base, matriz, **meta):
+    """Salva a matriz 0/1 com bits compactados (.npy) e o cabeçalho (.json)."""
+    caminho_base = base_matriz(caminho_base)
+    matriz = np.asarray(matriz, dtype=np.uint8)
+
+    np.save(caminho_base + '.npy', np.packbits(matriz, axis=1))
+    salvar_cabecalho(caminho_base, matriz.shape, **meta)
+    return caminho_base + '.npy'
+
+def salvar_cabecalho(caminho_base, forma, formato='packbits', **meta):
+    """Grava o cabeçalho .json da matriz (também usado pelo CSV legado)."""
+    cabecalho = {**meta,
+                 'n_alunos': int(forma[0]),
+                 'n_itens': int(forma[1]),
+                 'formato': formato,
+                 'versao': FORMATO_VERSAO}
+    with open(base_matriz(caminho_base) + '.json', 'w', encoding='utf-8') as f:
+        json.dump(cabecalho, f, indent=2, ensure_ascii=False)
+
+def ler_cabecalho(caminho):
+    caminho_json = base_matriz(caminho) + '.json'
+    if not os.path.exists(caminho_json):
+        return {}
+    with open(caminho_json, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def abrir_matriz(caminho):
+    """Abre a matriz compactada via np.memmap, sem copiar. Retorna (bits, cabecalho)."""
+    bits = np.load(base_matriz(caminho) + '.npy', mmap_mode='r')
+    return bits, ler_cabecalho(caminho)
+
+def carregar_matriz(caminho, linhas=None):
+    """Matriz uint8 (N x J) do .npy compactado ou do CSV legado; `linhas` seleciona alunos."""
+    if caminho.endswith('.csv'):
+        matriz = pd.read_csv(caminho, sep=',', header=None).to_numpy(dtype=np.uint8)
+        return matriz if linhas is None else matriz[linhas]
+
+    bits, cabecalho = abrir_matriz(caminho)
+    if linhas is not None:
+        bits = bits[linhas]
+    return np.unpackbits(bits, axis=1, count=cabecalho['n_itens'])
+
+def listar_matrizes(dir_matriz):
+    """Matrizes *_data.npy e *_data.csv (legado), uma por nome base, preferindo o .npy."""
+    if not os.path.isdir(dir_matriz):
+        return []
+    por_base = {}
+    for nome in sorted(os.listdir(dir_matriz)):
+        if nome.endswith('_data.npy') or nome.endswith('_data.csv'):
+            base = base_matriz(os.path.join(dir_matriz, nome))
+            if base not in por_base or nome.endswith('.npy'):
+                por_base[base] = os.path.join(dir_matriz, nome)
+    return [por_base[b] for b in sorted(por_base)]
+
+def compactar_padroes(matriz):
+    """Padrões de resposta distintos (uint8 P x J) e quantos alunos têm cada um."""
+    matriz = np.asarray(matriz, dtype=np.uint8)
+    if not len(matriz):
+        return matriz, np.zeros(0, dtype=np.int64)
+    # np.unique sobre as linhas já compactadas: 6 bytes por aluno em vez de 45
+    bits, contagens = np.unique(np.packbits(matriz, axis=1), axis=0, return_counts=True)
+    return np.unpackbits(bits, axis=1, count=matriz.shape[1]), contagens.astype(np.int64)
+
+def caminho_padroes(caminho_matriz):
+    """.../1221_002000_data.npy (ou .csv) → .../1221_002000_data_padroes.npz"""
+    return base_matriz(caminho_matriz) + '_padroes.npz'
+
+def hash_bits(bits, n_itens, bloco=1 << 20):
+    """sha1 do conteúdo da matriz compactada (N x ⌈J/8⌉, como no .npy), em blocos de alunos."""
+    h = hashlib.sha1(f"{bits.shape[0]}x{int(n_itens)}".encode())
+    for inicio in range(0, len(bits), bloco):
+        h.update(np.ascontiguousarray(bits[inicio:inicio + bloco]).tobytes())
+    return h.hexdigest()
+
+def hash_conteudo_matriz(caminho_matriz):
+    """hash_bits da matriz gravada (.npy por memmap, ou CSV legado compactado na hora)."""
+    if caminho_matriz.endswith('.csv'):
+        matriz = carregar_matriz(caminho_matriz)
+        return hash_bits(np.packbits(matriz, axis=1), matriz.shape[1])
+    bits, cabecalho = abrir_matriz(caminho_matriz)
+    return hash_bits(bits, cabecalho['n_itens'])
+
+def _gravar_padroes(caminho_base, matriz):
+    matriz = np.asarray(matriz, dtype=np.uint8)
+    padroes, contagens = compactar_padroes(matriz)
+    np.savez(caminho_padroes(caminho_base), padroes=np.packbits(padroes, axis=1),
+             contagens=contagens, n_itens=np.int64(padroes.shape[1]),
+             sha1=np.array(hash_bits(np.packbits(matriz, axis=1), matriz.shape[1])))
+    return padroes, contagens
+
+def salvar_padroes(caminho_base, matriz):
+    """Grava a tabela de padrões distintos da matriz (e o hash do conteúdo dela). Retorna o nº de padrões."""
+    return len(_gravar_padroes(caminho_base, matriz)[0])
+
+def carregar_padroes(caminho_matriz):
+    """(padrões uint8 P x J, contagens) salvos pelo _03; recalcula a partir da matriz se faltarem."""
+    caminho = caminho_padroes(caminho_matriz)
+    if os.path.exists(caminho):
+        with np.load(caminho) as z:
+            sha1 = str(z['sha1']) if 'sha1' in z.files else None
+            padroes, contagens = np.unpackbits(z['padroes'], axis=1, count=int(z['n_itens'])), z['contagens']
+        # Tabela de outra matriz (ex.: sorteio anterior com o mesmo N) ou sem hash é refeita
+        if sha1 is not None and sha1 == hash_conteudo_matriz(caminho_matriz):
+            return padroes, contagens
+    return _gravar_padroes(caminho_matriz, carregar_matriz(caminho_matriz))
+
+def caminho_tri(caminho_matriz):
+    """.../1221_002000_data.npy (ou .csv) → .../1221_002000_data_TRI.csv"""
+    return base_matriz(caminho_matriz) + '_TRI.csv'
+
+def caminho_ic(caminho_matriz):
+    """.../1221_002000_data.npy → .../1221_002000_data_TRI_IC.csv (intervalos bootstrap)"""
+    return base_matriz(caminho_matriz) + '_TRI_IC.csv'
+
+def caminho_reamostras(caminho_matriz):
+    """.../1221_002000_data.npy → .../1221_002000_data_TRI_boot.npz (a, b, c de cada réplica)"""
+    return base_matriz(caminho_matriz) + '_TRI_boot.npz'
+
+def caminho_ctt(dir_matriz, co_prova):
+    """.../MATRIZ + 1221 → .../MATRIZ/1221_CTT.csv (TCT da população inteira, _04d)"""
+    return os.path.join(dir_matriz, f"{co_prova}_CTT.csv")
+
+def caminho_ajuste_itens(caminho_matriz):
+    """.../1221_002000_data.npy → .../1221_002000_data_TRI_ajuste.csv (S-X² e Q3 por item)"""
+    return base_matriz(caminho_matriz) + '_TRI_ajuste.csv'
+
+def caminho_q3(caminho_matriz):
+    """.../1221_002000_data.npy → .../1221_002000_data_TRI_Q3.csv (Q3 de todos os pares de itens)"""
+    return base_matriz(caminho_matriz) + '_TRI_Q3.csv'
+
+def localizar_matriz(caminho_tri_csv):
+    """Inverso de caminho_tri(): prefere o .npy, cai para o CSV legado."""
+    base = caminho_tri_csv[:-len('_TRI.csv')]
+    for ext in ('.npy', '.csv'):
+        if os.path.exists(base + ext):
+            return base + ext
+    return None
+
+
+# ==================== AGRUPAMENTO DAS CORES POR CO_ITEM ====================
+#
+# Os cadernos coloridos de uma área (AZUL/AMARELO/BRANCO/ROSA...) têm os
+# mesmos itens em posições diferentes. Cadernos com o mesmo conjunto de
+# CO_ITEM (cabeçalho 'co_itens', gravado pelo _03) são empilhados em uma
+# única matriz por item, com as colunas reordenadas para o caderno de
+# referência (menor CO_PROVA). O cabeçalho guarda, para cada caderno, a
+# posição na referência de cada uma das suas colunas ('membros'): o _04
+# ajusta só a matriz agrupada e gera o _TRI.csv de cada cor como visão,
+# e o _05 desenha uma figura por item e liga as das outras cores a ela.
+
+PREFIXO_AGRUPADA = 'ITENS-'
+
+def eh_agrupada(caminho):
+    return os.path.basename(caminho).startswith(PREFIXO_AGRUPADA)
+
+def caminho_membro(caminho_agrupada, co_prova):
+    """Base da matriz de um caderno membro: .../<CO_PROVA>_<AMOSTRA>_data"""
+    cabecalho = ler_cabecalho(caminho_agrupada)
+    return os.path.join(os.path.dirname(caminho_agrupada),
+                        f"{co_prova}_{str(cabecalho['amostra']).zfill(6)}_data")
+
+def agrupar_cores(dir_matriz, amostra):
+    """Gera as matrizes agrupadas (uma por área e conjunto de itens) da AMOSTRA. Retorna os caminhos."""
+    grupos = {}
+    for m in listar_matrizes(dir_matriz):
+        cabecalho = ler_cabecalho(m)
+        if eh_agrupada(m) or cabecalho.get('amostra') != amostra or not cabecalho.get('co_itens'):
+            continue
+        chave = (cabecalho.get('sg_area'), frozenset(cabecalho['co_itens']))
+        grupos.setdefault(chave, []).append((str(cabecalho['co_prova']), m, cabecalho))
+
+    gerados = []
+    for (area, _), membros in sorted(grupos.items(), key=lambda g: (str(g[0][0]), min(m[0] for m in g[1]))):
+        if len(membros) < 2:
+            continue
+        membros.sort(key=lambda m: int(m[0]) if m[0].isdigit() else m[0])
+        ref_pid, _, ref_cab = membros[0]
+        itens_ref = ref_cab['co_itens']
+        pos_ref   = {item: j for j, item in enumerate(itens_ref)}
+
+        blocos, mapas = [], {}
+        for pid, m, cabecalho in membros:
+            pos = {item: k for k, item in enumerate(cabecalho['co_itens'])}
+            blocos.append(carregar_matriz(m)[:, [pos[item] for item in itens_ref]])
+            mapas[pid] = [pos_ref[item] for item in cabecalho['co_itens']]
+
+        matriz = np.vstack(blocos)
+        base   = os.path.join(dir_matriz, f"{PREFIXO_AGRUPADA}{area}-{ref_pid}_{str(amostra).zfill(6)}_data")
+        gerados.append(salvar_matriz(base, matriz, sg_area=area, amostra=amostra, agrupada=True,
+                                     referencia=ref_pid, membros=mapas, co_itens=itens_ref,
+                                     amostragem=ref_cab.get('amostragem'),
+                                     n_padroes=salvar_padroes(base, matriz)))
+    return gerados
+
+def origens_adaptativas(dir_matriz):
+    """
+    Bases das matrizes de origem (AMOSTRA máxima do _03) que já têm prefixo
+    final da amostra adaptativa (_04 --adaptativo) com outro nome: a prova
+    passa a ser representada só pelo prefixo final.
+    """
+    origens = set()
+    for m in listar_matrizes(dir_matriz):
+        origem = (ler_cabecalho(m).get('adaptativa') or {}).get('origem')
+        if origem and origem != os.path.basename(m):
+            origens.add(base_matriz(os.path.join(dir_matriz, origem)))
+    return origens
+
+def membros_agrupados(dir_matriz):
+    """{base da matriz de um caderno: caminho da matriz agrupada que o contém}."""
+    membros = {}
+    for m in listar_matrizes(dir_matriz):
+        if eh_agrupada(m):
+            for pid in ler_cabecalho(m).get('membros', {}):
+                membros[caminho_membro(m, pid)] = m
+    return membros
@@ -0,0 +1,682 @@
+#!/usr/bin/env python3
+'''
+=============================================================================
+enem_microdados.py
+=============================================================================
+Acesso centralizado aos microdados do ENEM:
+
+  <ANO>/DADOS/RESULTADOS_<ANO>.csv          (padrão 2024+)
+  <ANO>/DADOS/MICRODADOS_ENEM_<ANO>.csv     (padrão antigo)
+
+O CSV original (latin1, ';', vários GB) é lido uma única vez e convertido
+para um dataset Parquet tipado e comprimido (zstd), em formato "longo"
+(uma linha por aluno x área), particionado por área e CO_PROVA:
+
+  ENEM/<ANO>/DADOS/MICRODADOS_<ANO>.parquet/
+      SG_AREA=CN/CO_PROVA=1221/part-0.parquet
+      SG_AREA=LC/CO_PROVA=1201/part-0.parquet
+      ...
+      _SUCESSO.json        ← marcador de conversão completa (tamanho/mtime do CSV)
+
+Colunas de cada partição:
+  NU_LINHA      int64   posição da linha no CSV original (ordem do arquivo)
+  NU_INSCRICAO  int64   identificador do participante (se existir no CSV)
+  TP_LINGUA     int8    0: Inglês | 1: Espanhol | -1: não informado
+  TX_RESPOSTAS  string  respostas do aluno para a área
+
+Os scripts _01a e _03 usam buscar_path_microdados(), que prefere o cache
+Parquet automaticamente e cai para o CSV quando ele não existe (ou está
+desatualizado em relação ao CSV).
+
+Amostragem das respostas por CO_PROVA (ver AMOSTRADORES): "primeiros"
+(ordem do arquivo) ou "reservatorio" (uniforme, reprodutível pela semente).
+iterar_respostas() percorre a população inteira em lotes (escores θ do _04b).
+
+─────────────────────────────────────────────────────────────────────────────
+USO:
+  python3 enem_microdados.py <ANO> [--forcar]
+
+  Exemplos:
+    python3 enem_microdados.py 2024
+    python3 enem_microdados.py 2024 --forcar   # refaz a conversão
+=============================================================================
+'''
+
+import io
+import os
+import sys
+import json
+import shutil
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Silencia avisos de performance do pandas
+warnings.filterwarnings("ignore")
+
+AREAS       = ['CN', 'CH', 'LC', 'MT']
+COLS_PROVAS = {area: f'CO_PROVA_{area}' for area in AREAS}
+COLS_RESPS  = {area: f'TX_RESPOSTAS_{area}' for area in AREAS}
+COLS_ID     = ['NU_INSCRICAO', 'NU_SEQUENCIAL']
+
+CHUNKSIZE      = 100000
+MARCADOR_CACHE = '_SUCESSO.json'
+
+
+# ==================== LOCALIZAÇÃO DOS ARQUIVOS ====================
+
+def buscar_csv_microdados(ano):
+    """Retorna o CSV original (padrão novo ou antigo) ou None."""
+    for nome in (f"RESULTADOS_{ano}.csv", f"MICRODADOS_ENEM_{ano}.csv"):
+        caminho = os.path.join(ano, "DADOS", nome)
+        if os.path.exists(caminho):
+            return caminho
+    return None
+
+def caminho_parquet(ano):
+    return os.path.join("ENEM", ano, "DADOS", f"MICRODADOS_{ano}.parquet")
+
+def _assinatura_csv(path_csv):
+    st = os.stat(path_csv)
+    return {'arquivo': os.path.basename(path_csv), 'bytes': st.st_size, 'mtime': int(st.st_mtime)}
+
+def buscar_parquet_microdados(ano):
+    """Retorna o cache Parquet se a conversão terminou e ainda corresponde ao CSV."""
+    destino  = caminho_parquet(ano)
+    marcador = os.path.join(destino, MARCADOR_CACHE)
+    if not os.path.exists(marcador):
+        return None
+
+    path_csv = buscar_csv_microdados(ano)
+    if path_csv:
+        with open(marcador, 'r', encoding='utf-8') as f:
+            origem = json.load(f).get('origem', {})
+        if origem != _assinatura_csv(path_csv):
+            print(f"⚠️  Cache Parquet desatualizado em relação a {path_csv}. Usando o CSV.")
+            return None
+    return destino
+
+def buscar_path_microdados(ano):
+    """Prefere o cache Parquet; cai para o CSV original."""
+    return buscar_parquet_microdados(ano) or buscar_csv_microdados(ano)
+
+def eh_parquet(path_dados):
+    return os.path.isdir(path_dados)
+
+
+# ==================== CONVERSÃO CSV → PARQUET ====================
+
+def _schema_parquet():
+    import pyarrow as pa
+    return pa.schema([
+        ('NU_LINHA', pa.int64()),
+        ('NU_INSCRICAO', pa.int64()),
+        ('TP_LINGUA', pa.int8()),
+        ('TX_RESPOSTAS', pa.string()),
+        ('SG_AREA', pa.string()),
+        ('CO_PROVA', pa.int32()),
+    ])
+
+def _lotes_longos(path_csv, schema):
+    """Lê o CSV em chunks e gera RecordBatches no formato (aluno x área)."""
+    import pyarrow as pa
+
+    cabecalho = pd.read_csv(path_csv, sep=';', encoding='latin1', nrows=0).columns
+    col_id    = next((c for c in COLS_ID if c in cabecalho), None)
+    usecols   = [c for c in [col_id, 'TP_LINGUA', *COLS_PROVAS.values(), *COLS_RESPS.values()]
+                 if c and c in cabecalho]
+    dtypes    = {c: str for c in COLS_RESPS.values() if c in cabecalho}
+
+    inicio = 0
+    reader = pd.read_csv(path_csv, sep=';', encoding='latin1', usecols=usecols,
+                         dtype=dtypes, chunksize=CHUNKSIZE, low_memory=False)
+    for chunk in reader:
+        linhas = np.arange(inicio, inicio + len(chunk), dtype=np.int64)
+        inicio += len(chunk)
+
+        lingua = (chunk['TP_LINGUA'].fillna(-1).astype(np.int8).to_numpy()
+                  if 'TP_LINGUA' in chunk.columns else np.full(len(chunk), -1, dtype=np.int8))
+        ids    = (pd.to_numeric(chunk[col_id], errors='coerce').to_numpy()
+                  if col_id else None)
+
+        for area in AREAS:
+            cp, cr = COLS_PROVAS[area], COLS_RESPS[area]
+            if cp not in chunk.columns or cr not in chunk.columns:
+                continue
+            mask = chunk[cp].notna().to_numpy()
+            if not mask.any():
+                continue
+
+            df = pd.DataFrame({
+                'NU_LINHA': linhas[mask],
+                'NU_INSCRICAO': pd.array(ids[mask], dtype='Int64') if ids is not None
+                                else pd.array([None] * int(mask.sum()), dtype='Int64'),
+                'TP_LINGUA': lingua[mask],
+                'TX_RESPOSTAS': chunk.loc[mask, cr].to_numpy(dtype=object),
+                'SG_AREA': area,
+                'CO_PROVA': chunk.loc[mask, cp].astype(np.int32).to_numpy(),
+            })
+            yield pa.RecordBatch.from_pandas(df, schema=schema, preserve_index=False)
+
+def converter_para_parquet(ano, forcar=False):
+    """Conversão única do CSV de microdados para o dataset Parquet particionado."""
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        print("❌ Erro: pacote 'pyarrow' não instalado. Instale com: pip install pyarrow")
+        return None
+
+    path_csv = buscar_csv_microdados(ano)
+    if not path_csv:
+        print(f"❌ Erro: Microdados não encontrados em {ano}/DADOS/")
+        return None
+
+    destino = caminho_parquet(ano)
+    if not forcar and buscar_parquet_microdados(ano):
+        print(f"✅ Cache Parquet já existe: {destino}")
+        return destino
+
+    print(f"🚀 Convertendo: {path_csv}")
+    print(f"   Destino:     {destino}")
+    inicio = datetime.now()
+
+    # Escrita numa pasta temporária, com o marcador por último: uma conversão
+    # interrompida nunca deixa em `destino` um dataset parcial com marcador
+    # válido, e partições que o CSV novo não tem não sobram da versão anterior
+    parcial = destino + '.parcial'
+    shutil.rmtree(parcial, ignore_errors=True)
+
+    schema  = _schema_parquet()
+    formato = ds.ParquetFileFormat()
+    ds.write_dataset(
+        _lotes_longos(path_csv, schema),
+        parcial,
+        schema=schema,
+        format=formato,
+        file_options=formato.make_write_options(compression='zstd'),
+        partitioning=ds.partitioning(
+            pa.schema([('SG_AREA', pa.string()), ('CO_PROVA', pa.int32())]), flavor='hive'),
+        existing_data_behavior='delete_matching',
+        use_threads=False,  # preserva a ordem original das linhas em cada partição
+    )
+
+    with open(os.path.join(parcial, MARCADOR_CACHE), 'w', encoding='utf-8') as f:
+        json.dump({'origem': _assinatura_csv(path_csv),
+                   'gerado_em': datetime.now().isoformat()}, f, indent=2, ensure_ascii=False)
+
+    marcador = os.path.join(destino, MARCADOR_CACHE)
+    if os.path.exists(marcador):
+        os.remove(marcador)  # sem marcador, o cache antigo deixa de valer antes de ser apagado
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(parcial, destino)
+
+    segundos = (datetime.now() - inicio).total_seconds()
+    print(f"✅ Parquet gerado em {segundos:.0f}s: {destino}")
+    return destino
+
+
+# ==================== LEITURA ====================
+
+def _dataset(path_parquet):
+    import pyarrow.dataset as ds
+    return ds.dataset(path_parquet, format='parquet', partitioning='hive')
+
+def contar_provas(path_dados):
+    """Conta participantes por CO_PROVA (todas as áreas) → {co_prova_str: total}."""
+    counts_dict = {}
+
+    if eh_parquet(path_dados):
+        serie = _dataset(path_dados).to_table(columns=['CO_PROVA']).column('CO_PROVA').to_pandas()
+        for pid, qtd in serie.value_counts().items():
+            counts_dict[str(int(pid))] = int(qtd)
+        return counts_dict
+
+    cols = list(COLS_PROVAS.values())
+    df = pd.read_csv(path_dados, sep=';', encoding='latin1', usecols=cols, low_memory=False)
+    for col in cols:
+        counts = df[col].dropna().value_counts().to_dict()
+        for pid, qtd in counts.items():
+            pid_str = str(int(pid))
+            counts_dict[pid_str] = counts_dict.get(pid_str, 0) + int(qtd)
+    return counts_dict
+
+# ==================== AMOSTRADORES ====================
+#
+# "primeiros"    → as primeiras AMOSTRA respostas de cada prova, em ordem de
+#                  arquivo (comportamento original; permite parar a leitura cedo).
+# "reservatorio" → amostra uniforme, com semente, de tamanho fixo por prova.
+#                  Cada aluno recebe uma chave pseudoaleatória derivada de
+#                  (semente, CO_PROVA, NU_INSCRICAO) — ou NU_LINHA quando o CSV
+#                  não tem identificador — e o reservatório guarda as AMOSTRA
+#                  menores chaves (bottom-k). A memória é limitada a AMOSTRA
+#                  respostas por prova, a mesclagem entre workers é exata e o
+#                  resultado é idêntico bit a bit para a mesma semente,
+#                  independente de CSV/Parquet ou do número de workers.
+#                  A saída é ordenada pela chave: qualquer prefixo da matriz
+#                  também é uma amostra uniforme.
+
+METODOS_AMOSTRAGEM = ['primeiros', 'reservatorio']
+
+_K_OURO = np.uint64(0x9E3779B97F4A7C15)
+
+def _splitmix64(z):
+    """Mistura de bits splitmix64 (vetorizada, aritmética módulo 2^64)."""
+    with np.errstate(over='ignore'):
+        z = z + _K_OURO
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+def chaves_uniformes(ids, semente, pid):
+    """Chaves em [0, 1) determinísticas por (semente, CO_PROVA, id do aluno)."""
+    ids  = np.asarray(ids).astype(np.uint64)
+    sal  = _splitmix64(np.uint64(semente) ^ (np.uint64(int(pid)) << np.uint64(32)))
+    bits = _splitmix64(ids ^ sal)
+    return (bits >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+class AmostradorPrimeiros:
+    """Primeiras `amostra_alvo` respostas por prova, em ordem de chegada."""
+    metodo = 'primeiros'
+
+    def __init__(self, amostra_alvo, semente=None):
+        self.amostra_alvo = amostra_alvo
+        self.semente = None
+        self._amostras = {}
+
+    def adicionar(self, pid, resps, ids=None):
+        lista = self._amostras.setdefault(pid, [])
+        vagas = self.amostra_alvo - len(lista)
+        if vagas > 0:
+            lista.extend(list(resps[:vagas]))
+
+    def cheio(self, pid):
+        return len(self._amostras.get(pid, [])) >= self.amostra_alvo
+
+    def mesclar(self, outro):
+        """`outro` deve cobrir um trecho posterior do arquivo."""
+        for pid, lista in outro._amostras.items():
+            self.adicionar(pid, lista)
+
+    def resultado(self):
+        return {pid: list(lista) for pid, lista in self._amostras.items()}
+
+class AmostradorReservatorio:
+    """Reservatório uniforme (bottom-k por chave pseudoaleatória) por prova."""
+    metodo = 'reservatorio'
+
+    def __init__(self, amostra_alvo, semente=0):
+        self.amostra_alvo = amostra_alvo
+        self.semente = int(semente)
+        self._res = {}  # pid -> (chaves, ids, resps)
+
+    def _inserir(self, pid, chaves, ids, resps):
+        if pid in self._res:
+            atual = self._res[pid]
+            if len(atual[0]) >= self.amostra_alvo:
+                # Só interessam candidatos abaixo da maior chave já guardada
+                sel = chaves < atual[0].max()
+                chaves, ids, resps = chaves[sel], ids[sel], resps[sel]
+                if not len(chaves):
+                    return
+            chaves = np.concatenate([atual[0], chaves])
+            ids    = np.concatenate([atual[1], ids])
+            resps  = np.concatenate([atual[2], resps])
+
+        if len(chaves) > self.amostra_alvo:
+            ordem = np.lexsort((ids, chaves))[:self.amostra_alvo]
+            chaves, ids, resps = chaves[ordem], ids[ordem], resps[ordem]
+        self._res[pid] = (chaves, ids, resps)
+
+    def adicionar(self, pid, resps, ids):
+        ids = np.asarray(ids).astype(np.uint64)
+        self._inserir(pid, chaves_uniformes(ids, self.semente, pid), ids,
+                      np.asarray(resps, dtype=object))
+
+    def cheio(self, pid):
+        return False  # amostra uniforme exige ler a prova inteira
+
+    def mesclar(self, outro):
+        for pid, (chaves, ids, resps) in outro._res.items():
+            self._inserir(pid, chaves, ids, resps)
+
+    def resultado(self):
+        saida = {}
+        for pid, (chaves, ids, resps) in self._res.items():
+            ordem = np.lexsort((ids, chaves))
+            saida[pid] = resps[ordem].tolist()
+        return saida
+
+def criar_amostrador(metodo, amostra_alvo, semente=0):
+    if metodo == 'reservatorio':
+        return AmostradorReservatorio(amostra_alvo, semente)
+    return AmostradorPrimeiros(amostra_alvo)
+
+
+def _respostas_parquet(dataset, pid, lingua, amostrador):
+    """Alimenta o amostrador com uma partição CO_PROVA (ordem de arquivo)."""
+    import pyarrow.dataset as ds
+    filtro = ((ds.field('CO_PROVA') == int(pid)) & (ds.field('TP_LINGUA') == lingua)
+              & ds.field('TX_RESPOSTAS').is_valid())
+
+    if amostrador.metodo == 'primeiros':
+        tabela = dataset.head(amostrador.amostra_alvo, columns=['TX_RESPOSTAS'], filter=filtro)
+        amostrador.adicionar(pid, tabela.column('TX_RESPOSTAS').to_pylist())
+        return
+
+    for lote in dataset.to_batches(columns=['NU_LINHA', 'NU_INSCRICAO', 'TX_RESPOSTAS'], filter=filtro):
+        df  = lote.to_pandas()
+        ids = df['NU_INSCRICAO'].fillna(df['NU_LINHA']).to_numpy(dtype=np.int64)
+        amostrador.adicionar(pid, df['TX_RESPOSTAS'].to_numpy(dtype=object), ids)
+
+def coletar_respostas(path_dados, pid_para_colunas, amostra_alvo, lingua=0, workers=1,
+                      metodo='primeiros', semente=0):
+    """
+    Coleta até `amostra_alvo` strings de resposta por CO_PROVA, somente de alunos
+    com TP_LINGUA == lingua, pelo `metodo` de amostragem escolhido.
+    `pid_para_colunas`: {pid: (col_prova, col_resp)}.
+    `workers` > 1 processa o CSV em intervalos de bytes paralelos (ver _varrer_csv).
+    """
+    if eh_parquet(path_dados):
+        dataset    = _dataset(path_dados)
+        amostrador = criar_amostrador(metodo, amostra_alvo, semente)
+        for pid in pid_para_colunas:
+            _respostas_parquet(dataset, pid, lingua, amostrador)
+        amostras = amostrador.resultado()
+    else:
+        # Cada pid sabe exatamente qual coluna usar — sem testar as 4 áreas
+        areas = [a for a in AREAS if COLS_PROVAS[a] in {cp for cp, _ in pid_para_colunas.values()}]
+        _, amostras = _varrer_csv(path_dados, amostra_alvo, lingua, areas=areas,
+                                  pids=set(pid_para_colunas), contar=False, workers=workers,
+                                  metodo=metodo, semente=semente)
+    return {pid: amostras.get(pid, []) for pid in pid_para_colunas}
+
+
+# ==================== POPULAÇÃO COMPLETA (ESCORES θ) ====================
+
+def iterar_respostas(path_dados, pid_para_colunas, linguas=None):
+    """
+    Percorre TODOS os alunos das provas de `pid_para_colunas` ({pid: (col_prova, col_resp)}),
+    sem amostragem, em lotes de até CHUNKSIZE alunos: gera (pid, ids, respostas).
+    `linguas`: {pid: TP_LINGUA exigido}; provas fora dele aceitam qualquer língua.
+    ids = NU_INSCRICAO (ou NU_LINHA quando o CSV não tem identificador).
+    A memória fica limitada a um lote; o CSV é lido uma única vez para todas as provas.
+    """
+    linguas = linguas or {}
+
+    if eh_parquet(path_dados):
+        import pyarrow.dataset as ds
+        dataset = _dataset(path_dados)
+        for pid in pid_para_colunas:
+            filtro = (ds.field('CO_PROVA') == int(pid)) & ds.field('TX_RESPOSTAS').is_valid()
+            if linguas.get(pid) is not None:
+                filtro = filtro & (ds.field('TP_LINGUA') == linguas[pid])
+            for lote in dataset.to_batches(columns=['NU_LINHA', 'NU_INSCRICAO', 'TX_RESPOSTAS'],
+                                           filter=filtro, batch_size=CHUNKSIZE):
+                if lote.num_rows:
+                    df  = lote.to_pandas()
+                    ids = df['NU_INSCRICAO'].fillna(df['NU_LINHA']).to_numpy(dtype=np.int64)
+                    yield pid, ids, df['TX_RESPOSTAS'].to_numpy(dtype=object)
+        return
+
+    cabecalho = list(pd.read_csv(path_dados, sep=';', encoding='latin1', nrows=0).columns)
+    col_id    = next((c for c in COLS_ID if c in cabecalho), None)
+    pares     = sorted(set(pid_para_colunas.values()))
+    usecols   = [c for c in [col_id, 'TP_LINGUA', *(c for par in pares for c in par)] if c and c in cabecalho]
+    dtypes    = {c: str for c in usecols if c.startswith('TX_RESPOSTAS_')}
+
+    linha  = 0
+    reader = pd.read_csv(path_dados, sep=';', encoding='latin1', usecols=usecols, dtype=dtypes,
+                         chunksize=CHUNKSIZE, low_memory=False)
+    for chunk in reader:
+        ids = np.arange(linha, linha + len(chunk), dtype=np.int64)
+        linha += len(chunk)
+        if col_id:
+            ids = pd.to_numeric(chunk[col_id], errors='coerce').fillna(pd.Series(ids, index=chunk.index)).to_numpy(dtype=np.int64)
+        lingua_chunk = chunk['TP_LINGUA'].to_numpy() if 'TP_LINGUA' in chunk.columns else None
+
+        for cp, cr in pares:
+            if cp not in chunk.columns or cr not in chunk.columns:
+                continue
+            sel = (chunk[cp].notna() & chunk[cr].notna()).to_numpy()
+            sub = chunk.loc[sel, [cp, cr]]
+            for pid, posicoes in sub.groupby(cp, sort=False).indices.items():
+                pid_str = str(int(pid))
+                if pid_para_colunas.get(pid_str) != (cp, cr):
+                    continue
+                linhas = np.flatnonzero(sel)[posicoes]
+                if linguas.get(pid_str) is not None and lingua_chunk is not None:
+                    manter  = lingua_chunk[linhas] == linguas[pid_str]
+                    linhas, posicoes = linhas[manter], posicoes[manter]
+                if len(linhas):
+                    yield pid_str, ids[linhas], sub[cr].to_numpy(dtype=object)[posicoes]
+
+
+# ==================== VARREDURA ÚNICA (RANKING + AMOSTRAS) ====================
+
+def varrer_microdados(path_dados, amostra_alvo, lingua=0, workers=1, metodo='primeiros', semente=0):
+    """
+    Varredura única dos microdados para _01a e _03:
+      - conta participantes por CO_PROVA (todas as línguas), como contar_provas();
+      - no mesmo passe, coleta até `amostra_alvo` respostas (TP_LINGUA == lingua)
+        de cada CO_PROVA, como coletar_respostas().
+    Como o TOP ainda não é conhecido, todas as provas são amostradas
+    (memória limitada a amostra_alvo x nº de provas).
+    Retorna (counts_dict, amostras) → ({pid: total}, {pid: [respostas]}).
+    """
+    if eh_parquet(path_dados):
+        counts_dict = contar_provas(path_dados)
+        dataset     = _dataset(path_dados)
+        amostrador  = criar_amostrador(metodo, amostra_alvo, semente)
+        for pid in counts_dict:
+            _respostas_parquet(dataset, pid, lingua, amostrador)
+        return counts_dict, amostrador.resultado()
+
+    return _varrer_csv(path_dados, amostra_alvo, lingua, areas=AREAS, pids=None, contar=True,
+                       workers=workers, metodo=metodo, semente=semente)
+
+
+# ==================== CSV EM INTERVALOS DE BYTES (PARALELO) ====================
+#
+# O CSV é dividido em `workers` intervalos [inicio, fim) alinhados a quebras de
+# linha (o ENEM não tem campos com quebra de linha entre aspas). Cada processo
+# lê apenas o seu intervalo com pd.read_csv em chunks, filtra TP_LINGUA, agrupa
+# por CO_PROVA e devolve contagens + o seu amostrador parcial. A mesclagem
+# segue a ordem dos intervalos (= ordem do arquivo), então o resultado é
+# idêntico ao da leitura serial, qualquer que seja `workers`.
+
+class _JanelaArquivo(io.RawIOBase):
+    """Arquivo binário restrito ao intervalo de bytes [inicio, fim)."""
+
+    def __init__(self, path, inicio, fim):
+        self._f = open(path, 'rb')
+        self._f.seek(inicio)
+        self._restante = fim - inicio
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self._restante)
+        if n <= 0:
+            return 0
+        lidos = self._f.readinto(memoryview(buffer)[:n])
+        self._restante -= lidos
+        return lidos
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+def _intervalos_bytes(path_csv, n_partes):
+    """Divide o CSV (após o cabeçalho) em até n_partes intervalos alinhados a linhas."""
+    tamanho = os.path.getsize(path_csv)
+    with open(path_csv, 'rb') as f:
+        f.readline()
+        cortes = [f.tell()]
+        for k in range(1, n_partes):
+            alvo = cortes[0] + (tamanho - cortes[0]) * k // n_partes
+            f.seek(max(alvo - 1, cortes[-1]))
+            f.readline()  # avança até o início da próxima linha
+            if cortes[-1] < f.tell() < tamanho:
+                cortes.append(f.tell())
+    cortes.append(tamanho)
+    return list(zip(cortes[:-1], cortes[1:]))
+
+def _contar_linhas_intervalo(tarefa):
+    """Nº de linhas de um intervalo (para numerar NU_LINHA globalmente em paralelo)."""
+    path_csv, inicio, fim = tarefa
+    total = 0
+    with open(path_csv, 'rb') as f:
+        f.seek(inicio)
+        restante = fim - inicio
+        while restante > 0:
+            bloco = f.read(min(restante, 1 << 24))
+            if not bloco:
+                break
+            total += bloco.count(b'\n')
+            restante -= len(bloco)
+    return total
+
+def _acumular_chunk(chunk, areas, pids, contar, lingua, counts, amostrador, ids):
+    """Atualiza contagens (todas as línguas) e o amostrador (somente `lingua`) com um chunk."""
+    mask_lingua = (chunk['TP_LINGUA'] == lingua) if 'TP_LINGUA' in chunk.columns else True
+
+    for area in areas:
+        cp, cr = COLS_PROVAS[area], COLS_RESPS[area]
+        if cp not in chunk.columns:
+            continue
+
+        # Ranking: todas as línguas
+        if contar:
+            for pid, qtd in chunk[cp].dropna().astype(int).value_counts().items():
+                pid_str = str(pid)
+                counts[pid_str] = counts.get(pid_str, 0) + int(qtd)
+
+        if cr not in chunk.columns:
+            continue
+
+        # Amostras: somente a língua escolhida, agrupadas por CO_PROVA
+        sel = (chunk[cp].notna() & chunk[cr].notna() & mask_lingua).to_numpy()
+        sub = chunk.loc[sel, [cp, cr]]
+        ids_sel = ids[sel]
+        for pid, posicoes in sub.groupby(cp, sort=False).indices.items():
+            pid_str = str(int(pid))
+            if (pids is not None and pid_str not in pids) or amostrador.cheio(pid_str):
+                continue
+            amostrador.adicionar(pid_str, sub[cr].to_numpy(dtype=object)[posicoes], ids_sel[posicoes])
+
+def _varrer_intervalo(tarefa):
+    """Processa um intervalo de bytes do CSV (executado em processo separado)."""
+    (path_csv, inicio, fim, linha_inicial, cabecalho, areas, pids, contar,
+     amostra_alvo, lingua, metodo, semente) = tarefa
+
+    col_id  = next((c for c in COLS_ID if c in cabecalho), None)
+    usecols = [c for c in [col_id, 'TP_LINGUA', *(COLS_PROVAS[a] for a in areas),
+                           *(COLS_RESPS[a] for a in areas)] if c and c in cabecalho]
+    dtypes  = {c: str for c in usecols if c.startswith('TX_RESPOSTAS_')}
+
+    counts, amostrador = {}, criar_amostrador(metodo, amostra_alvo, semente)
+    linha = linha_inicial
+    janela = io.BufferedReader(_JanelaArquivo(path_csv, inicio, fim), buffer_size=1 << 20)
+    with janela:
+        reader = pd.read_csv(janela, sep=';', encoding='latin1', header=None, names=cabecalho,
+                             usecols=usecols, dtype=dtypes, chunksize=CHUNKSIZE, low_memory=False)
+        for chunk in reader:
+            # Identificador do aluno para as chaves do reservatório: NU_INSCRICAO ou NU_LINHA
+            ids = np.arange(linha, linha + len(chunk), dtype=np.int64)
+            linha += len(chunk)
+            if col_id:
+                ids = pd.to_numeric(chunk[col_id], errors='coerce').fillna(pd.Series(ids, index=chunk.index)).to_numpy(dtype=np.int64)
+
+            _acumular_chunk(chunk, areas, pids, contar, lingua, counts, amostrador, ids)
+
+            # Sem contagem, para assim que o intervalo já tem a amostra de todas as provas
+            if not contar and pids and all(amostrador.cheio(p) for p in pids):
+                break
+    return counts, amostrador
+
+def _varrer_csv(path_csv, amostra_alvo, lingua, areas, pids, contar, workers=1,
+                metodo='primeiros', semente=0):
+    """Executa _varrer_intervalo em `workers` processos e mescla em ordem de arquivo."""
+    cabecalho  = list(pd.read_csv(path_csv, sep=';', encoding='latin1', nrows=0).columns)
+    intervalos = _intervalos_bytes(path_csv, max(1, workers))
+
+    # Sem identificador no CSV, o reservatório usa NU_LINHA: numera as linhas globalmente
+    linhas_iniciais = [0] * len(intervalos)
+    precisa_linhas  = (metodo == 'reservatorio' and len(intervalos) > 1
+                       and not any(c in cabecalho for c in COLS_ID))
+
+    if len(intervalos) == 1:
+        tarefas    = [(path_csv, *intervalos[0], 0, cabecalho, areas, pids, contar,
+                       amostra_alvo, lingua, metodo, semente)]
+        resultados = [_varrer_intervalo(tarefas[0])]
+    else:
+        print(f"⚙️  Processando {len(intervalos)} intervalos do CSV em paralelo ({workers} workers)...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            if precisa_linhas:
+                n_linhas = list(pool.map(_contar_linhas_intervalo,
+                                         [(path_csv, ini, fim) for ini, fim in intervalos]))
+                linhas_iniciais = np.concatenate([[0], np.cumsum(n_linhas)[:-1]]).tolist()
+            tarefas = [(path_csv, ini, fim, int(l0), cabecalho, areas, pids, contar,
+                        amostra_alvo, lingua, metodo, semente)
+                       for (ini, fim), l0 in zip(intervalos, linhas_iniciais)]
+            resultados = list(pool.map(_varrer_intervalo, tarefas))
+
+    counts_dict, amostrador = {}, criar_amostrador(metodo, amostra_alvo, semente)
+    for counts, parcial in resultados:
+        for pid, qtd in counts.items():
+            counts_dict[pid] = counts_dict.get(pid, 0) + qtd
+        amostrador.mesclar(parcial)
+    return counts_dict, amostrador.resultado()
+
+def _caminho_amostras(ano, amostra_alvo):
+    return os.path.join("ENEM", ano, "DADOS", f"amostras_respostas_{str(amostra_alvo).zfill(6)}.json")
+
+def _assinatura_fonte(path_dados):
+    return {'fonte': os.path.basename(os.path.normpath(path_dados)), 'mtime': int(os.path.getmtime(path_dados))}
+
+def salvar_amostras(ano, amostra_alvo, amostras, path_dados, lingua=0, metodo='primeiros', semente=0):
+    """Persiste as amostras da varredura para o _03 (execução em outro processo)."""
+    destino = _caminho_amostras(ano, amostra_alvo)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump({'origem': _assinatura_fonte(path_dados), 'lingua': lingua,
+                   'amostra': amostra_alvo, 'amostragem': descrever_amostragem(metodo, semente),
+                   'amostras': amostras}, f, ensure_ascii=False)
+    return destino
+
+def carregar_amostras(ano, amostra_alvo, lingua=0, metodo='primeiros', semente=0):
+    """Amostras salvas pela varredura do ranking, se ainda válidas; senão None."""
+    origem  = _caminho_amostras(ano, amostra_alvo)
+    path_dados = buscar_path_microdados(ano)
+    if not os.path.exists(origem) or not path_dados:
+        return None
+
+    with open(origem, 'r', encoding='utf-8') as f:
+        salvo = json.load(f)
+    if (salvo.get('origem') != _assinatura_fonte(path_dados) or salvo.get('lingua') != lingua
+            or salvo.get('amostragem', descrever_amostragem('primeiros')) != descrever_amostragem(metodo, semente)):
+        return None
+    return salvo['amostras']
+
+def descrever_amostragem(metodo, semente=0):
+    """Registro do método/semente gravado junto das amostras e das matrizes."""
+    if metodo == 'reservatorio':
+        return {'metodo': metodo, 'semente': int(semente)}
+    return {'metodo': 'primeiros', 'semente': None}
+
+
+if __name__ == "__main__":
+    anos_validos = [str(i) for i in range(2009, 2030)]
+    anos = [a for a in sys.argv[1:] if a in anos_validos]
+
+    if not anos:
+        print("Uso: python3 enem_microdados.py <ANO> [--forcar]")
+        sys.exit(1)
+
+    for ano in anos:
+        converter_para_parquet(ano, forcar='--forcar' in sys.argv)
@@ -0,0 +1,1241 @@
+'''
+=============================================================================
+enem_tri.py
+=============================================================================
+Estimador nativo (NumPy/SciPy) do modelo logístico de 3 parâmetros (3PL),
+usado pelo _04 no lugar do Rscript + ltm::tpm().
+
+  P(acerto | θ) = c + (1 - c) / (1 + exp(-a (θ - b)))       θ ~ N(0, 1)
+
+Máxima verossimilhança marginal (MML) via EM com quadratura de Gauss–Hermite:
+
+  Passo E  verossimilhança de cada aluno em cada nó θ_q, em bloco:
+           L (N x Q) = X @ log(P/(1-P)) + Σ_j log(1-P)   (uma multiplicação
+           de matrizes por bloco de alunos) → posteriores → contagens
+           esperadas n_q (Q,) e r_jq (J x Q).
+  Passo M  maximiza Σ_q r_jq log P_jq + (n_q - r_jq) log(1 - P_jq) para todos
+           os itens de uma vez (L-BFGS-B, com c ∈ [0, max_guessing]).
+
+Com `pesos` (nº de alunos de cada padrão de resposta distinto, ver
+enem_matriz.compactar_padroes) o passo E roda sobre os padrões: o custo
+depende do nº de padrões, não do nº de alunos.
+
+Modo "streaming" (matrizes com a população inteira da prova): a matriz
+compactada é lida em lotes direto do memmap, com memória limitada ao lote,
+qualquer que seja o nº de alunos:
+  1. EM estocástico — a cada lote (em ordem aleatória), as estatísticas
+     suficientes n_q / r_jq são atualizadas por aproximação estocástica
+     S ← (1-γ_k) S + γ_k S_lote, γ_k = k^-0.6, seguida de um passo M;
+  2. EM em lote por varredura — passo E acumulado sobre todos os lotes,
+     até a mesma tolerância TOL do ajuste em memória.
+A fase 2 é o mesmo EM do ajuste em memória, só que particionado; a fase 1
+apenas encurta o caminho até lá. Como a verossimilhança é muito plana na
+direção b–c de itens fáceis, os dois caminhos param em pontos ligeiramente
+diferentes da mesma crista: os parâmetros finais coincidem com os do ajuste
+em lote dentro de TOL_STREAMING (diferença absoluta máxima em a, b e c,
+abaixo do erro-padrão das estimativas) e a log-verossimilhança com erro
+relativo < 1e-7. Diagnósticos por época vão para o _TRI.json.
+
+CACHE: cada ajuste é guardado em MATRIZ/_cache_tri/<chave>.json, onde a
+chave é o sha1 do conteúdo da matriz + configuração do ajuste (motor,
+modelo, nº de nós, max_guessing, tolerância, modo). O _04 só reajusta uma
+matriz se a chave gravada no _TRI.json mudou; num acerto de cache o
+_TRI.csv é regravado sem ajuste. Num erro de cache, o EM parte do ajuste
+mais próximo já guardado: mesmo CO_PROVA com outra AMOSTRA ou, item a
+item, o mesmo CO_ITEM em outro caderno (cor) — após aumentar a AMOSTRA,
+o reajuste converge em uma fração das iterações. As entradas são gravadas
+num temporário e publicadas com os.replace (processos do pool nunca leem
+uma entrada pela metade); entradas ilegíveis são ignoradas com aviso, e
+cada processo só lê as entradas novas desde a última partida quente.
+
+ESCORES θ: pontuar_theta() calcula EAP e MAP (com erros-padrão) de blocos
+de alunos a partir de tabelas pré-calculadas na grade de θ (usado pelo _04b);
+cci_empirica() dá a proporção de acerto de cada item por grupo de θ ou de
+escore bruto (pontos sobre a CCI do _05).
+
+AJUSTE DOS ITENS: salvar_ajuste_itens() grava o S-X² de cada item e o Q3 de
+todos os pares (dependência local) ao lado do _TRI.csv (chamado pelo _04).
+
+Mesma parametrização do ltm com IRT.param = TRUE (sem a constante D = 1.7)
+e o mesmo limite max.guessing = 0.3 do script R original.
+
+─────────────────────────────────────────────────────────────────────────────
+SAÍDA — ENEM/<ANO>/DADOS/MATRIZ/
+
+  <CO_PROVA>_<AMOSTRA>_data_TRI.csv   ← mesmo layout do R (fwrite):
+                                        ,Discrimination,Difficulty,Guessing
+                                        V1,1.23,0.45,0.18 ...
+  <CO_PROVA>_<AMOSTRA>_data_TRI.json  ← log-verossimilhança, iterações,
+                                        convergência, nº de nós, motor, chave
+  <CO_PROVA>_<AMOSTRA>_data_TRI_ajuste.csv / .json
+                                      ← S-X², gl, p, Q3* máximo por item e
+                                        sinalizações (ver AJUSTE DOS ITENS)
+  <CO_PROVA>_<AMOSTRA>_data_TRI_Q3.csv← Q3 de todos os pares de itens (J x J)
+  _cache_tri/<chave>.json             ← cache de ajustes (ver CACHE abaixo)
+=============================================================================
+'''
+
+import os
+import json
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.special import expit, logit, logsumexp
+from scipy.stats import chi2
+
+from enem_matriz import (carregar_padroes, abrir_matriz, ler_cabecalho, caminho_tri, caminho_membro,
+                         base_matriz, caminho_ic, caminho_reamostras, carregar_matriz,
+                         compactar_padroes, salvar_matriz, salvar_padroes, listar_matrizes,
+                         salvar_cabecalho, caminho_ajuste_itens, caminho_q3)
+
+N_QUAD       = 21       # nós de Gauss–Hermite (GHk padrão do ltm)
+MAX_GUESSING = 0.3      # max.guessing do tpm() original
+MAX_ITER     = 500
+TOL          = 1e-4     # maior variação absoluta de parâmetro entre iterações
+TOL_LL       = 1e-8     # ou variação relativa da log-verossimilhança (reltol do optim/ltm)
+BLOCO        = 100000   # alunos por bloco no passo E (limita a memória N x Q)
+LIMITE_A     = 10.0     # |a| máximo (evita divergência de itens quase constantes)
+EPS          = 1e-10
+
+LOTE         = 50000    # alunos por lote no modo streaming
+EPOCAS_SA    = 3        # épocas de EM estocástico antes das varreduras completas
+TOL_STREAMING = 0.05   # concordância com o ajuste em lote (máx. |Δ| em a, b, c)
+
+MIN_ITENS    = 5
+MIN_ALUNOS   = 100
+
+# Processos de um pool (ajuste de várias matrizes, bootstrap) rodam com BLAS
+# de 1 thread: com N workers, as threads do BLAS de cada um (N por padrão)
+# disputariam os mesmos N núcleos
+THREADS_BLAS_WORKER = 1
+VARIAVEIS_THREADS   = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+
+def limitar_threads_blas(n=THREADS_BLAS_WORKER):
+    """Limita as threads do BLAS/OpenMP do processo (inicializador dos workers de um pool)."""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        # Sem threadpoolctl, só vale se o BLAS ainda não foi carregado (processos 'spawn')
+        for variavel in VARIAVEIS_THREADS:
+            os.environ[variavel] = str(n)
+        return
+    threadpool_limits(limits=n)
+
+
+def quadratura(n_quad=N_QUAD):
+    """Nós e pesos de Gauss–Hermite para θ ~ N(0, 1) (pesos somam 1)."""
+    nos, pesos = np.polynomial.hermite_e.hermegauss(n_quad)
+    return nos, pesos / pesos.sum()
+
+def prob_3pl(theta, a, d, c):
+    """P (J x Q) com a parametrização de inclinação/intercepto: σ(a θ + d), b = -d/a."""
+    return c[:, None] + (1 - c[:, None]) * expit(np.outer(a, theta) + d[:, None])
+
+def _valores_iniciais(X, w, max_guessing):
+    """Partida pelos p-valores e correlações item-resto (ponderados pelos pesos w)."""
+    w     = w / w.sum()
+    xf    = X.astype(np.float64)
+    p     = w @ xf
+    resto = xf.sum(axis=1)[:, None] - xf
+    m_r   = w @ resto
+    cov   = w @ (xf * resto) - p * m_r
+    var_r = w @ resto ** 2 - m_r ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.nan_to_num(cov / np.sqrt(p * (1 - p) * var_r), nan=0.0, posinf=0.0, neginf=0.0)
+    p     = np.clip(p, 0.01, 0.99)
+
+    a = np.clip(1.7 * r / np.sqrt(np.maximum(1 - r ** 2, 1e-3)), 0.2, 3.0)
+    c = np.full(X.shape[1], min(0.1, max_guessing))
+    d = logit(np.clip((p - c) / (1 - c), 0.02, 0.98)) * np.sqrt(1 + a ** 2 / 2.89)
+    return a, d, c
+
+def _convergiu(variacao, loglik, loglik_ant, tol):
+    """
+    Parada do EM: parâmetros estáveis (variação < tol) ou log-verossimilhança
+    estável (variação relativa < TOL_LL). O segundo critério importa na crista
+    plana b–c dos itens fáceis, onde o EM ainda desliza devagar sem ganho real.
+    """
+    if variacao < tol:
+        return True
+    return loglik_ant is not None and abs(loglik - loglik_ant) <= TOL_LL * abs(loglik)
+
+def _partida(X, w, max_guessing, inicial=None, modelo='3PL'):
+    """
+    Valores iniciais (a, d, c). `inicial` = (a, b, c) de um ajuste anterior
+    (partida a quente); itens com NaN recebem a partida pelos p-valores.
+    1PL/2PL partem de c = 0; o 1PL, da discriminação média.
+    """
+    limite_c = max_guessing if modelo == '3PL' else 0.0
+    a, d, c = _valores_iniciais(X, w, limite_c)
+    if inicial is not None:
+        a_q, b_q, c_q = (np.asarray(v, dtype=np.float64) for v in inicial)
+        ok = np.isfinite(a_q) & np.isfinite(b_q) & np.isfinite(c_q)
+        a[ok], d[ok], c[ok] = a_q[ok], -a_q[ok] * b_q[ok], np.clip(c_q[ok], 0.0, limite_c)
+    if modelo == '1PL':
+        a = np.full(len(a), a.mean())
+    return a, d, c
+
+def _passo_e(X, w, a, d, c, theta, log_pesos, bloco):
+    """Contagens esperadas n_q (Q,), r_jq (J x Q) e a log-verossimilhança marginal (pesos w)."""
+    P     = np.clip(prob_3pl(theta, a, d, c), EPS, 1 - EPS)
+    log_r = np.log(P) - np.log1p(-P)             # J x Q
+    base  = np.log1p(-P).sum(axis=0) + log_pesos  # Q
+
+    n_q, r_jq, loglik = np.zeros(len(theta)), np.zeros((X.shape[1], len(theta))), 0.0
+    for ini in range(0, X.shape[0], bloco):
+        xb  = X[ini:ini + bloco].astype(np.float64)
+        wb  = w[ini:ini + bloco, None]
+        L   = xb @ log_r + base                   # N_b x Q
+        lse = logsumexp(L, axis=1, keepdims=True)
+        W   = np.exp(L - lse) * wb                # posteriores x nº de alunos do padrão
+        loglik += (lse * wb).sum()
+        n_q    += W.sum(axis=0)
+        r_jq   += xb.T @ W
+    return n_q, r_jq, loglik
+
+def _passo_m(n_q, r_jq, a, d, c, theta, max_guessing, modelo='3PL'):
+    """
+    Maximiza a verossimilhança completa esperada para todos os itens (L-BFGS-B).
+    `modelo`: '3PL' (a, d, c), '2PL' (a, d; c = 0) ou '1PL' (a comum, d; c = 0).
+    """
+    J = len(a)
+    f_q = n_q[None, :] - r_jq
+
+    # Vetor otimizado → (a, d, c) completos, conforme o modelo
+    if modelo == '1PL':
+        completo = lambda v: (np.full(J, v[0]), v[1:], np.zeros(J))
+        v0, limites = np.concatenate([[a.mean()], d]), [(-LIMITE_A, LIMITE_A)] + [(None, None)] * J
+    elif modelo == '2PL':
+        completo = lambda v: (v[:J], v[J:], np.zeros(J))
+        v0, limites = np.concatenate([a, d]), [(-LIMITE_A, LIMITE_A)] * J + [(None, None)] * J
+    else:
+        completo = lambda v: (v[:J], v[J:2 * J], v[2 * J:])
+        v0 = np.concatenate([a, d, c])
+        limites = [(-LIMITE_A, LIMITE_A)] * J + [(None, None)] * J + [(0.0, max_guessing)] * J
+
+    def objetivo(v):
+        a_, d_, c_ = completo(v)
+        s  = expit(np.outer(a_, theta) + d_[:, None])
+        P  = np.clip(c_[:, None] + (1 - c_[:, None]) * s, EPS, 1 - EPS)
+        g  = r_jq / P - f_q / (1 - P)             # dℓ/dP
+        ds = g * (1 - c_[:, None]) * s * (1 - s)  # dℓ/d(a θ + d)
+        nll = -(r_jq * np.log(P) + f_q * np.log1p(-P)).sum()
+        g_a, g_d = (ds * theta).sum(axis=1), ds.sum(axis=1)
+        if modelo == '1PL':
+            grad = np.concatenate([[g_a.sum()], g_d])
+        elif modelo == '2PL':
+            grad = np.concatenate([g_a, g_d])
+        else:
+            grad = np.concatenate([g_a, g_d, (g * (1 - s)).sum(axis=1)])
+        return nll, -grad
+
+    res = minimize(objetivo, v0, jac=True, method='L-BFGS-B', bounds=limites, options={'maxiter': 50})
+    return completo(res.x)
+
+def ajustar_3pl(matriz, pesos=None, n_quad=N_QUAD, max_iter=MAX_ITER, tol=TOL,
+                max_guessing=MAX_GUESSING, inicial=None, bloco=BLOCO, modelo='3PL'):
+    """
+    Ajusta o 3PL (ou, com `modelo`, o 2PL/1PL) a uma matriz 0/1 (alunos x itens) por MML-EM.
+    `pesos`: nº de alunos de cada linha (tabela de padrões distintos); padrão 1.
+    `inicial`: (a, b, c) de um ajuste anterior (partida a quente; NaN = sem partida), opcional.
+    Retorna dict com a, b, c (arrays), loglik, iteracoes, convergiu, n_quad e modelo.
+    """
+    X = np.asarray(matriz, dtype=np.uint8)
+    w = np.ones(len(X)) if pesos is None else np.asarray(pesos, dtype=np.float64)
+    theta, pesos = quadratura(n_quad)
+    log_pesos    = np.log(pesos)
+
+    a, d, c = _partida(X, w, max_guessing, inicial, modelo)
+
+    convergiu, loglik_ant = False, None
+    for iteracao in range(1, max_iter + 1):
+        n_q, r_jq, loglik = _passo_e(X, w, a, d, c, theta, log_pesos, bloco)
+        a_n, d_n, c_n = _passo_m(n_q, r_jq, a, d, c, theta, max_guessing, modelo)
+        variacao = np.max(np.abs(np.concatenate([a_n - a, d_n - d, c_n - c])))
+        a, d, c = a_n, d_n, c_n
+        if _convergiu(variacao, loglik, loglik_ant, tol):
+            convergiu = True
+            break
+        loglik_ant = loglik
+
+    # Log-verossimilhança final com os parâmetros devolvidos
+    _, _, loglik = _passo_e(X, w, a, d, c, theta, log_pesos, bloco)
+    return {'a': a, 'b': _dificuldade(a, d), 'c': c, 'loglik': float(loglik), 'iteracoes': iteracao,
+            'convergiu': convergiu, 'n_quad': n_quad, 'modelo': modelo}
+
+def _dificuldade(a, d):
+    """b = -d/a (indefinida para a ≈ 0)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.abs(a) > 1e-8, -d / a, np.nan)
+
+def ajustar_3pl_streaming(caminho_matriz, lote=LOTE, epocas=EPOCAS_SA, n_quad=N_QUAD,
+                          max_iter=MAX_ITER, tol=TOL, max_guessing=MAX_GUESSING,
+                          inicial=None, semente=0, relatar=None, modelo='3PL'):
+    """
+    Ajusta o 3PL lendo a matriz compactada (.npy) em lotes do memmap (ver
+    "Modo streaming" acima). `relatar(diagnostico)` é chamado a cada época.
+    Retorna o mesmo dict de ajustar_3pl(), com a lista `diagnosticos`.
+    """
+    if not caminho_matriz.endswith('.npy'):
+        raise ValueError("O modo streaming requer a matriz compactada (_data.npy)")
+    bits, cabecalho = abrir_matriz(caminho_matriz)
+    N, J = int(cabecalho['n_alunos']), int(cabecalho['n_itens'])
+    inicios = np.arange(0, N, lote)
+    rng = np.random.default_rng(semente)
+
+    theta, pesos = quadratura(n_quad)
+    log_pesos    = np.log(pesos)
+
+    def ler(ini):
+        return np.unpackbits(np.asarray(bits[ini:ini + lote]), axis=1, count=J)
+
+    primeiro = ler(0)
+    a, d, c = _partida(primeiro, np.ones(len(primeiro)), max_guessing, inicial, modelo)
+
+    diagnosticos = []
+    def registrar(**diag):
+        diagnosticos.append(diag)
+        if relatar:
+            relatar(diag)
+
+    # Fase 1: EM estocástico sobre lotes em ordem aleatória
+    S_n = S_r = None
+    k = 0
+    for epoca in range(1, epocas + 1 if len(inicios) > 1 else 1):
+        partida, loglik = np.concatenate([a, d, c]), 0.0
+        for ini in rng.permutation(inicios):
+            xb = ler(ini)
+            n_q, r_jq, ll = _passo_e(xb, np.ones(len(xb)), a, d, c, theta, log_pesos, len(xb))
+            k += 1
+            gama = k ** -0.6
+            S_n = n_q / len(xb) if S_n is None else (1 - gama) * S_n + gama * n_q / len(xb)
+            S_r = r_jq / len(xb) if S_r is None else (1 - gama) * S_r + gama * r_jq / len(xb)
+            a, d, c = _passo_m(S_n * N, S_r * N, a, d, c, theta, max_guessing, modelo)
+            loglik += ll
+        registrar(fase='estocastica', epoca=epoca, loglik=float(loglik),
+                  variacao=float(np.max(np.abs(np.concatenate([a, d, c]) - partida))))
+
+    # Fase 2: EM em lote, passo E acumulado por varredura completa
+    convergiu, loglik_ant = False, None
+    for iteracao in range(1, max_iter + 1):
+        n_q, r_jq, loglik = np.zeros(len(theta)), np.zeros((J, len(theta))), 0.0
+        for ini in inicios:
+            xb = ler(ini)
+            nb, rb, ll = _passo_e(xb, np.ones(len(xb)), a, d, c, theta, log_pesos, len(xb))
+            n_q, r_jq, loglik = n_q + nb, r_jq + rb, loglik + ll
+        a_n, d_n, c_n = _passo_m(n_q, r_jq, a, d, c, theta, max_guessing, modelo)
+        variacao = float(np.max(np.abs(np.concatenate([a_n - a, d_n - d, c_n - c]))))
+        a, d, c = a_n, d_n, c_n
+        registrar(fase='lote', epoca=iteracao, loglik=float(loglik), variacao=variacao)
+        if _convergiu(variacao, loglik, loglik_ant, tol):
+            convergiu = True
+            break
+        loglik_ant = loglik
+
+    # loglik da última varredura (parâmetros anteriores ao último passo M, já convergido)
+    return {'a': a, 'b': _dificuldade(a, d), 'c': c, 'loglik': float(loglik),
+            'iteracoes': iteracao, 'convergiu': convergiu, 'n_quad': n_quad,
+            'modelo': modelo, 'diagnosticos': diagnosticos}
+
+# ==================== SELEÇÃO DE MODELO (1PL / 2PL / 3PL) ====================
+#
+# 'auto': ajusta primeiro os modelos baratos e só sobe de 1PL → 2PL → 3PL
+# quando o critério de informação (BIC, ou AIC) melhora; cada degrau parte
+# do anterior. Um 3PL (ou 2PL) que não converge é descartado em favor do
+# modelo mais simples. Modelo fixo ('3PL', '2PL', '1PL'): ajusta o pedido e,
+# se ele falhar ou não convergir, cai para o mais simples seguinte. Os
+# candidatos avaliados (log-verossimilhança, AIC, BIC, convergência) vão
+# para o _TRI.json; o _TRI.csv mantém o layout (c = 0 no 1PL/2PL).
+
+MODELOS       = ['1PL', '2PL', '3PL']
+MODELO_PADRAO = 'auto'
+CRITERIO      = 'bic'
+
+def n_parametros(modelo, n_itens):
+    return {'1PL': n_itens + 1, '2PL': 2 * n_itens, '3PL': 3 * n_itens}[modelo]
+
+def criterios_informacao(loglik, n_par, n_alunos):
+    """(AIC, BIC)."""
+    return 2 * n_par - 2 * loglik, n_par * np.log(n_alunos) - 2 * loglik
+
+def selecionar_modelo(ajustar, n_alunos, modelo=MODELO_PADRAO, criterio=CRITERIO, inicial=None):
+    """
+    `ajustar(modelo, inicial)` devolve um ajuste (ajustar_3pl ou streaming).
+    Retorna o ajuste escolhido, com 'modelo' e 'selecao' (modo, critério,
+    candidatos e motivo). ValueError se nenhum modelo puder ser ajustado.
+    """
+    candidatos = []
+
+    def tentar(m, partida):
+        try:
+            ajuste = ajustar(m, partida)
+        except Exception as e:
+            candidatos.append({'modelo': m, 'erro': str(e)})
+            return None
+        ajuste['aic'], ajuste['bic'] = criterios_informacao(
+            ajuste['loglik'], n_parametros(m, len(ajuste['a'])), n_alunos)
+        candidatos.append({'modelo': m, 'loglik': ajuste['loglik'], 'aic': float(ajuste['aic']),
+                           'bic': float(ajuste['bic']), 'convergiu': ajuste['convergiu'],
+                           'iteracoes': ajuste['iteracoes']})
+        return ajuste
+
+    escolhido, motivo = None, None
+    if modelo == 'auto':
+        partida = inicial
+        for m in MODELOS:
+            ajuste = tentar(m, partida)
+            if ajuste is None:
+                # Falha de um modelo não encerra a busca: tenta o próximo
+                continue
+            if escolhido is not None and not ajuste['convergiu']:
+                motivo = f"{m} não convergiu"
+                break
+            if escolhido is not None and ajuste[criterio] >= escolhido[criterio]:
+                motivo = f"{m} não melhora o {criterio.upper()}"
+                break
+            escolhido = ajuste
+            partida   = (ajuste['a'], ajuste['b'], ajuste['c'])
+        else:
+            ajustados = [c['modelo'] for c in candidatos if 'erro' not in c]
+            falhos    = [c['modelo'] for c in candidatos if 'erro' in c]
+            if len(ajustados) > 1 and ajustados[-1] == MODELOS[-1]:
+                motivo = f"3PL melhora o {criterio.upper()}"
+            elif ajustados:
+                motivo = f"{ajustados[-1]} (falha de {', '.join(falhos)})"
+    else:
+        reserva = None
+        for m in reversed(MODELOS[:MODELOS.index(modelo) + 1]):
+            ajuste = tentar(m, inicial)
+            if ajuste is not None and ajuste['convergiu']:
+                escolhido = ajuste
+                motivo = "pedido" if m == modelo else f"queda: {modelo} sem convergência ou com erro"
+                break
+            reserva = reserva or ajuste
+        if escolhido is None and reserva is not None:
+            escolhido, motivo = reserva, "nenhum modelo convergiu"
+
+    if escolhido is None:
+        raise ValueError("Nenhum modelo TRI pôde ser ajustado: "
+                         + "; ".join(f"{c['modelo']}: {c.get('erro')}" for c in candidatos))
+    escolhido['selecao'] = {'modo': modelo, 'criterio': criterio, 'motivo': motivo,
+                            'candidatos': candidatos}
+    return escolhido
+
+
+# ==================== CACHE DE AJUSTES ====================
+
+def configuracao_ajuste(streaming=False, **opcoes):
+    """Configuração que, junto com o conteúdo da matriz, identifica um ajuste."""
+    config = {'motor': 'python', 'modelo': opcoes.get('modelo', MODELO_PADRAO),
+              'criterio': opcoes.get('criterio', CRITERIO),
+              'n_quad': opcoes.get('n_quad', N_QUAD),
+              'max_guessing': opcoes.get('max_guessing', MAX_GUESSING),
+              'tol': opcoes.get('tol', TOL), 'tol_ll': TOL_LL,
+              'streaming': bool(streaming)}
+    if streaming:
+        config.update(lote=opcoes.get('lote', LOTE), epocas=opcoes.get('epocas', EPOCAS_SA),
+                      semente=opcoes.get('semente', 0))
+    return config
+
+def hash_matriz(caminho_matriz):
+    """sha1 do arquivo da matriz (.npy compactada ou CSV legado), lido em blocos."""
+    h = hashlib.sha1()
+    with open(caminho_matriz, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 22), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def chave_ajuste(caminho_matriz, config):
+    texto = hash_matriz(caminho_matriz) + json.dumps(config, sort_keys=True)
+    return hashlib.sha1(texto.encode()).hexdigest()
+
+def dir_cache(caminho_matriz):
+    return os.path.join(os.path.dirname(caminho_matriz), '_cache_tri')
+
+def _ler_entrada(caminho):
+    """Entrada do cache, ou None (com aviso) se o arquivo estiver ilegível (truncado, corrompido)."""
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Cache TRI ilegível, ignorado: {os.path.basename(caminho)} ({e})")
+        return None
+
+def ler_cache(caminho_matriz, chave):
+    caminho = os.path.join(dir_cache(caminho_matriz), f"{chave}.json")
+    if not os.path.exists(caminho):
+        return None
+    return _ler_entrada(caminho)
+
+def gravar_cache(caminho_matriz, chave, ajuste, cabecalho, config):
+    os.makedirs(dir_cache(caminho_matriz), exist_ok=True)
+    entrada = {'chave': chave, 'config': config,
+               'co_prova': cabecalho.get('co_prova'), 'amostra': cabecalho.get('amostra'),
+               'co_itens': cabecalho.get('co_itens'),
+               'a': ajuste['a'].tolist(), 'b': ajuste['b'].tolist(), 'c': ajuste['c'].tolist(),
+               'loglik': ajuste['loglik'], 'iteracoes': ajuste['iteracoes'],
+               'convergiu': ajuste['convergiu'], 'n_quad': ajuste['n_quad'],
+               'modelo': ajuste.get('modelo', '3PL'), 'selecao': ajuste.get('selecao')}
+    # Temporário + os.replace: outro processo do pool nunca lê uma entrada pela metade
+    destino = os.path.join(dir_cache(caminho_matriz), f"{chave}.json")
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    try:
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(entrada, f, ensure_ascii=False)
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+def _ajuste_do_cache(entrada):
+    return {'a': np.array(entrada['a'], dtype=float), 'b': np.array(entrada['b'], dtype=float),
+            'c': np.array(entrada['c'], dtype=float), 'loglik': entrada['loglik'],
+            'iteracoes': entrada['iteracoes'], 'convergiu': entrada['convergiu'],
+            'n_quad': entrada['n_quad'], 'modelo': entrada.get('modelo', '3PL'),
+            'selecao': entrada.get('selecao')}
+
+# Entradas do cache já lidas neste processo: {pasta: {nome: (mtime, entrada ou None se ilegível)}}.
+# A cada falta só os arquivos novos ou regravados são lidos (e só o que a partida quente usa).
+_ENTRADAS_CACHE = {}
+
+def _entradas_cache(pasta):
+    lidas = _ENTRADAS_CACHE.setdefault(pasta, {})
+    for nome in sorted(os.listdir(pasta)):
+        if not nome.endswith('.json'):
+            continue
+        caminho = os.path.join(pasta, nome)
+        try:
+            mtime = os.path.getmtime(caminho)
+        except OSError:
+            continue
+        if nome in lidas and lidas[nome][0] == mtime:
+            continue
+        e = _ler_entrada(caminho)
+        lidas[nome] = (mtime, e and {k: e.get(k) for k in ('co_prova', 'amostra', 'co_itens', 'a', 'b', 'c')})
+    return [e for _, e in lidas.values() if e is not None]
+
+def partida_quente(caminho_matriz, cabecalho, n_itens):
+    """
+    (a, b, c) do ajuste guardado mais próximo, e a sua descrição; (None, None) sem candidatos.
+      1. mesmo CO_PROVA, AMOSTRA mais próxima (empate → a maior);
+      2. item a item, o mesmo CO_ITEM em qualquer ajuste guardado (outra cor).
+    """
+    pasta = dir_cache(caminho_matriz)
+    if not os.path.isdir(pasta):
+        return None, None
+    entradas = _entradas_cache(pasta)
+
+    co_prova, amostra = cabecalho.get('co_prova'), cabecalho.get('amostra') or 0
+    mesma_prova = [e for e in entradas if co_prova and e.get('co_prova') == co_prova
+                   and len(e['a']) == n_itens]
+    if mesma_prova:
+        e = min(mesma_prova, key=lambda e: (abs((e.get('amostra') or 0) - amostra), -(e.get('amostra') or 0)))
+        return (e['a'], e['b'], e['c']), f"CO_PROVA {co_prova} (amostra {e.get('amostra')})"
+
+    co_itens = cabecalho.get('co_itens')
+    if not co_itens:
+        return None, None
+    por_item = {}
+    for e in entradas:
+        for j, item in enumerate(e.get('co_itens') or []):
+            por_item.setdefault(item, (e['a'][j], e['b'][j], e['c'][j]))
+    achados = [por_item.get(item, (np.nan, np.nan, np.nan)) for item in co_itens]
+    n_achados = sum(np.isfinite(v[0]) for v in achados)
+    if not n_achados:
+        return None, None
+    a, b, c = (np.array(v, dtype=float) for v in zip(*achados))
+    return (a, b, c), f"CO_ITEM ({n_achados}/{len(co_itens)} itens)"
+
+def tri_atualizado(caminho_matriz, config):
+    """True se o _TRI.json existente foi gerado desta mesma matriz e configuração."""
+    caminho_json = caminho_tri(caminho_matriz)[:-len('.csv')] + '.json'
+    if not os.path.exists(caminho_tri(caminho_matriz)) or not os.path.exists(caminho_json):
+        return False
+    with open(caminho_json, 'r', encoding='utf-8') as f:
+        return json.load(f).get('chave') == chave_ajuste(caminho_matriz, config)
+
+
+def tabela_parametros(ajuste):
+    """DataFrame no layout do _TRI.csv do R (linhas V1..VJ, como o fread nomeia as colunas)."""
+    J = len(ajuste['a'])
+    return pd.DataFrame({'Discrimination': ajuste['a'],
+                         'Difficulty': ajuste['b'],
+                         'Guessing': ajuste['c']},
+                        index=[f"V{j + 1}" for j in range(J)])
+
+def salvar_tri(caminho_csv, ajuste, **meta):
+    """Grava o _TRI.csv (mesmo layout do R) e o _TRI.json com os metadados do ajuste."""
+    tabela_parametros(ajuste).to_csv(caminho_csv, index_label='')
+    info = {**meta,
+            'modelo': ajuste.get('modelo', '3PL'),
+            'selecao': ajuste.get('selecao'),
+            'loglik': ajuste['loglik'],
+            'iteracoes': ajuste['iteracoes'],
+            'convergiu': ajuste['convergiu'],
+            'n_quad': ajuste['n_quad']}
+    with open(caminho_csv[:-len('.csv')] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2, ensure_ascii=False)
+    return caminho_csv
+
+def ajustar_matriz(caminho_matriz, streaming=False, usar_cache=True, **opcoes):
+    """
+    Ajusta a TRI sobre a tabela de padrões distintos da matriz (.npy compactada
+    ou CSV legado) e grava o _TRI.csv. `modelo` ('auto', '3PL', '2PL', '1PL')
+    e `criterio` ('bic', 'aic') seguem selecionar_modelo. Com `streaming`, lê a matriz .npy em
+    lotes (ajustar_3pl_streaming), com memória limitada.
+    Com `usar_cache`, reaproveita um ajuste idêntico já guardado ou parte do
+    ajuste guardado mais próximo (ver CACHE). O ajuste devolvido traz `origem`
+    ('cache' ou 'ajuste') e `partida` (descrição da partida a quente, se houve).
+    Mesmas recusas do script R (poucos itens/respondentes → ValueError).
+    Retorna (caminho do _TRI.csv, ajuste).
+    """
+    cabecalho = ler_cabecalho(caminho_matriz)
+    if streaming:
+        n_alunos, n_itens = int(cabecalho.get('n_alunos', 0)), int(cabecalho.get('n_itens', 0))
+        extras = {'modo': 'streaming'}
+    else:
+        padroes, contagens = carregar_padroes(caminho_matriz)
+        n_alunos, n_itens = int(contagens.sum()), int(padroes.shape[1])
+        extras = {'n_padroes': int(len(padroes))}
+
+    if n_itens < MIN_ITENS:
+        raise ValueError("Menos de 5 itens na prova")
+    if n_alunos < MIN_ALUNOS:
+        raise ValueError("Menos de 100 respondentes")
+
+    config = configuracao_ajuste(streaming, **opcoes)
+    chave  = chave_ajuste(caminho_matriz, config)
+    salvo  = ler_cache(caminho_matriz, chave) if usar_cache else None
+
+    if salvo is not None:
+        ajuste = {**_ajuste_do_cache(salvo), 'origem': 'cache', 'partida': None}
+    else:
+        partida = None
+        if usar_cache and opcoes.get('inicial') is None:
+            opcoes['inicial'], partida = partida_quente(caminho_matriz, cabecalho, n_itens)
+        modelo   = opcoes.pop('modelo', MODELO_PADRAO)
+        criterio = opcoes.pop('criterio', CRITERIO)
+        inicial  = opcoes.pop('inicial', None)
+
+        def ajustar(m, partida_m):
+            if streaming:
+                return ajustar_3pl_streaming(caminho_matriz, inicial=partida_m, modelo=m, **opcoes)
+            return ajustar_3pl(padroes, pesos=contagens, inicial=partida_m, modelo=m, **opcoes)
+
+        ajuste = selecionar_modelo(ajustar, n_alunos, modelo, criterio, inicial)
+        if streaming:
+            extras['diagnosticos'] = ajuste['diagnosticos']
+        ajuste.update(origem='ajuste', partida=partida)
+        if usar_cache:
+            gravar_cache(caminho_matriz, chave, ajuste, cabecalho, config)
+
+    return salvar_tri(caminho_tri(caminho_matriz), ajuste, motor='python',
+                      n_alunos=n_alunos, n_itens=n_itens, **extras,
+                      co_prova=cabecalho.get('co_prova'), amostragem=cabecalho.get('amostragem'),
+                      chave=chave, origem=ajuste['origem'], partida=ajuste['partida']), ajuste
+
+def salvar_visoes(caminho_agrupada, sufixo='_TRI'):
+    """
+    _TRI.csv/_TRI.json de cada caderno de uma matriz agrupada por CO_ITEM
+    (enem_matriz.agrupar_cores): os parâmetros do item, na posição que ele
+    ocupa em cada cor. `sufixo='_TRI_IC'` faz o mesmo com os intervalos
+    bootstrap (_04c), '_TRI_ajuste' com o S-X²/Q3 e '_TRI_Q3' com a matriz
+    item x item (linhas e colunas recortadas). Retorna os caminhos gravados.
+    """
+    cabecalho = ler_cabecalho(caminho_agrupada)
+    tri_csv   = base_matriz(caminho_agrupada) + sufixo + '.csv'
+    tabela    = pd.read_csv(tri_csv, index_col=0)
+    quadrada  = list(tabela.columns) == list(tabela.index)
+    info      = None
+    if os.path.exists(tri_csv[:-len('.csv')] + '.json'):
+        with open(tri_csv[:-len('.csv')] + '.json', 'r', encoding='utf-8') as f:
+            info = json.load(f)
+
+    gravados = []
+    for co_prova, mapa in cabecalho['membros'].items():
+        visao = tabela.iloc[mapa].copy()
+        visao.index = [f"V{k + 1}" for k in range(len(mapa))]
+        if quadrada:
+            visao = visao.iloc[:, mapa]
+            visao.columns = visao.index
+        destino = caminho_membro(caminho_agrupada, co_prova) + sufixo + '.csv'
+        visao.to_csv(destino, index_label='')
+        gravados.append(destino)
+        if info is None:
+            continue
+        with open(destino[:-len('.csv')] + '.json', 'w', encoding='utf-8') as f:
+            json.dump({**info, 'co_prova': co_prova,
+                       'visao_de': os.path.basename(tri_csv)}, f, indent=2, ensure_ascii=False)
+    return gravados
+
+
+# ==================== ESCORES θ DOS ALUNOS (EAP / MAP) ====================
+#
+# Com os itens calibrados, θ de cada aluno sai de tabelas pré-calculadas na
+# grade de θ (uma vez por prova): log(P/(1-P)) (J x G) e Σ_j log(1-P) (G,).
+# A log-posterior de um bloco de alunos é uma multiplicação de matrizes,
+#   log p(θ_g | x) = X @ log(P/(1-P)) + Σ_j log(1-P) - θ_g²/2 + const,
+# da qual saem EAP (média a posteriori) e o seu erro-padrão (dp a posteriori).
+# O MAP parte do vértice da parábola nos nós em torno do máximo da grade e é
+# refinado por Fisher scoring vetorizado (priori N(0, 1)), só nos alunos que
+# ainda não convergiram; o erro-padrão é 1/√(I(θ) + 1) no ponto final.
+
+N_GRADE_THETA = 81     # nós da grade de θ em [-LIMITE_THETA, LIMITE_THETA] (passo 0,1)
+LIMITE_THETA  = 4.0
+ITER_MAP      = 8      # máximo de passos de Fisher scoring no MAP
+TOL_MAP       = 1e-5   # |Δθ| abaixo do qual o aluno sai do Fisher scoring
+
+def ler_parametros(caminho_tri_csv):
+    """(a, b, c) de um _TRI.csv (motor python ou R)."""
+    tabela = pd.read_csv(caminho_tri_csv, index_col=0)
+    return tuple(tabela[col].to_numpy(dtype=np.float64)
+                 for col in ('Discrimination', 'Difficulty', 'Guessing'))
+
+def grade_theta(n=N_GRADE_THETA, limite=LIMITE_THETA):
+    """Nós da grade de θ e a log-priori N(0, 1) (sem constante) em cada nó."""
+    grade = np.linspace(-limite, limite, n)
+    return grade, -grade ** 2 / 2
+
+def tabelas_theta(a, b, c, grade):
+    """Tabelas da grade: log(P/(1-P)) (J x G) e Σ_j log(1-P) (G,)."""
+    P = np.clip(prob_3pl(grade, a, -a * b, c), EPS, 1 - EPS)
+    return np.log(P) - np.log1p(-P), np.log1p(-P).sum(axis=0)
+
+def pontuar_theta(X, a, b, c, tabelas=None, grade=None, iter_map=ITER_MAP):
+    """
+    Escores de um bloco de alunos X (N x J, 0/1). `tabelas`/`grade` (de
+    tabelas_theta/grade_theta) são calculadas uma vez por prova e reusadas
+    em todos os blocos. Retorna {acertos, eap, ep_eap, map, ep_map} (N,).
+    """
+    grade, log_priori = grade if grade is not None else grade_theta()
+    logito_P, base = tabelas if tabelas is not None else tabelas_theta(a, b, c, grade)
+    xf = X.astype(np.float64)
+
+    # EAP: posterior na grade (N x G) por uma multiplicação de matrizes
+    log_post = xf @ logito_P + base + log_priori
+    melhor   = log_post.argmax(axis=1)
+    post     = np.exp(log_post - log_post[np.arange(len(xf)), melhor][:, None])
+    post    /= post.sum(axis=1, keepdims=True)
+    eap      = post @ grade
+    ep_eap   = np.sqrt(np.maximum(post @ grade ** 2 - eap ** 2, 0))
+
+    # MAP: vértice da parábola pelos 3 nós em torno do melhor, depois Fisher
+    # scoring só nos alunos que ainda não convergiram
+    d, limite = -a * b, grade[-1]
+    k  = np.clip(melhor, 1, len(grade) - 2)
+    lp = log_post[np.arange(len(xf))[:, None], k[:, None] + np.array([-1, 0, 1])]
+    curv  = lp[:, 0] - 2 * lp[:, 1] + lp[:, 2]
+    passo = grade[1] - grade[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        desloc = np.where(curv < 0, 0.5 * (lp[:, 0] - lp[:, 2]) / curv, 0.0)
+    theta = np.clip(grade[k] + np.clip(desloc, -1, 1) * passo, -limite, limite)
+
+    info  = np.ones(len(xf))
+    ativo = np.arange(len(xf))
+    for _ in range(max(1, iter_map)):
+        t   = theta[ativo]
+        s   = expit(np.outer(t, a) + d)
+        P   = np.clip(c + (1 - c) * s, EPS, 1 - EPS)
+        dP  = (1 - c) * a * s * (1 - s)
+        inf = (dP ** 2 / (P * (1 - P))).sum(axis=1) + 1
+        grad = ((xf[ativo] - P) * dP / (P * (1 - P))).sum(axis=1) - t
+        novo = np.clip(t + grad / inf, -limite, limite)
+        theta[ativo], info[ativo] = novo, inf
+        ativo = ativo[np.abs(novo - t) > TOL_MAP]
+        if not len(ativo):
+            break
+
+    return {'acertos': X.sum(axis=1), 'eap': eap, 'ep_eap': ep_eap,
+            'map': theta, 'ep_map': 1 / np.sqrt(info)}
+
+N_GRUPOS_EMPIRICA = 20
+
+def cci_empirica(X, theta, por='theta', n_grupos=N_GRUPOS_EMPIRICA):
+    """
+    CCI empírica: proporção de acerto de todos os itens por grupo de alunos.
+    `por='theta'`: `n_grupos` grupos de tamanho igual na ordem de θ;
+    `por='acertos'`: um grupo por escore bruto. Uma única ordenação dos
+    alunos e somas acumuladas por segmento (np.add.reduceat) da matriz
+    inteira — nenhum laço por item.
+    Retorna {theta (G,): θ médio do grupo, n (G,), acertos_min/acertos_max (G,),
+    proporcao (J x G)}.
+    """
+    X = np.asarray(X, dtype=np.uint8)
+    theta   = np.asarray(theta, dtype=np.float64)
+    acertos = X.sum(axis=1)
+    ordem   = np.argsort(theta if por == 'theta' else acertos, kind='stable')
+    if por == 'theta':
+        inicios = np.unique(np.linspace(0, len(X), n_grupos + 1).astype(np.int64)[:-1])
+    else:
+        inicios = np.r_[0, np.flatnonzero(np.diff(acertos[ordem])) + 1]
+    n = np.diff(np.r_[inicios, len(X)])
+    somas = np.add.reduceat(X[ordem], inicios, axis=0, dtype=np.int64)   # G x J
+    ordenados = acertos[ordem]
+    return {'theta': np.add.reduceat(theta[ordem], inicios) / n, 'n': n,
+            'acertos_min': ordenados[inicios], 'acertos_max': ordenados[np.r_[inicios[1:], len(X)] - 1],
+            'proporcao': (somas / n[:, None]).T}
+
+
+# Curvas da prova: P_j(θ) de todos os itens na grade de θ numa única
+# operação (J x G) e, dela, a informação de cada item
+#   I_j(θ) = a_j² (1 - P_j)/P_j · ((P_j - c_j)/(1 - c_j))²
+# e as curvas da prova inteira — informação I(θ) = Σ_j I_j(θ), erro-padrão
+# condicional EP(θ) = 1/√I(θ) e escore esperado Σ_j P_j(θ). A confiabilidade
+# marginal pondera EP² pela priori N(0, 1): ρ = 1 / (1 + E[EP²]).
+
+def curvas_teste(a, b, c, grade=None):
+    """
+    Curvas da prova em `grade` (padrão: grade_theta()). Retorna {theta (G,),
+    P e info_itens (J x G), info, ep, escore (G,), theta_info_max,
+    info_max, confiabilidade}.
+    """
+    theta, log_priori = grade if grade is not None else grade_theta()
+    a, b, c = (np.asarray(v, dtype=np.float64) for v in (a, b, c))
+    P = np.clip(prob_3pl(theta, a, -a * b, c), EPS, 1 - EPS)
+    info_itens = a[:, None] ** 2 * (1 - P) / P * ((P - c[:, None]) / (1 - c[:, None])) ** 2
+    info = info_itens.sum(axis=0)
+    ep = 1 / np.sqrt(np.maximum(info, EPS))
+    priori = np.exp(log_priori - log_priori.max())
+    priori /= priori.sum()
+    k = info.argmax()
+    return {'theta': theta, 'P': P, 'info_itens': info_itens, 'info': info, 'ep': ep,
+            'escore': P.sum(axis=0), 'theta_info_max': float(theta[k]), 'info_max': float(info[k]),
+            'confiabilidade': float(1 / (1 + priori @ ep ** 2))}
+
+
+# ==================== AJUSTE DOS ITENS (S-X²) E DEPENDÊNCIA LOCAL (Q3) ====================
+#
+# S-X² (Orlando & Thissen): por grupo de escore bruto k, a proporção de
+# acerto observada no item j contra a esperada pelo modelo,
+#   E_jk = ∫ P_j(θ) f_{-j}(k-1 | θ) φ(θ) dθ / ∫ f(k | θ) φ(θ) dθ,
+# onde f(k | θ) é a distribuição do escore bruto (recursão de Lord–Wingersky)
+# e f_{-j} a mesma sem o item j. As J recursões "sem o item j" rodam juntas:
+# o tensor (J, J, G) começa com P_jj = 0 e cada passo adiciona um item a
+# todas elas. Grupos com contagem esperada < MIN_ESPERADO são fundidos ao
+# vizinho; gl = nº de grupos - nº de parâmetros do item.
+# Q3 (Yen): correlação, entre pares de itens, dos resíduos x_ij - P_j(θ̂_i)
+# com θ̂ = EAP; sai de uma única passada em blocos sobre a tabela de padrões
+# (Σw, Σw·d e Σw·d dᵀ). Q3* = Q3 - média dos Q3 fora da diagonal.
+# Item sinalizado: p(S-X²) < ALFA_SX2 (desajuste) ou |Q3*| > LIMITE_Q3 com
+# algum outro item (dependência local).
+
+ALFA_SX2     = 0.01
+LIMITE_Q3    = 0.2
+MIN_ESPERADO = 1.0
+
+def distribuicoes_escore(P):
+    """
+    Lord–Wingersky para P (J x G): f (J+1 x G), distribuição do escore bruto,
+    e f_sem (J x J x G), f_sem[j, k] = P(escore k sem o item j | θ_g).
+    """
+    J, G  = P.shape
+    P_sem = np.broadcast_to(P, (J, J, G)).copy()
+    P_sem[np.arange(J), np.arange(J)] = 0.0
+    f_sem = np.zeros((J, J, G))
+    f_sem[:, 0] = 1.0
+    for i in range(J):
+        p = P_sem[:, i][:, None, :]
+        f_sem[:, 1:] = f_sem[:, 1:] * (1 - p) + f_sem[:, :-1] * p
+        f_sem[:, 0] *= 1 - p[:, 0]
+    f = np.zeros((J + 1, G))
+    f[:-1] += f_sem[0] * (1 - P[0])
+    f[1:]  += f_sem[0] * P[0]
+    return f, f_sem
+
+def _agrupar_escores(n_k, o_k, e_k, minimo=MIN_ESPERADO):
+    """Funde grupos de escore vizinhos até N·E e N·(1-E) ≥ `minimo`; devolve (N, O, NE) por grupo."""
+    grupos, atual = [], np.zeros(3)
+    for n, o, e in zip(n_k, o_k, n_k * e_k):
+        atual += (n, o, e)
+        if atual[2] >= minimo and atual[0] - atual[2] >= minimo:
+            grupos.append(atual)
+            atual = np.zeros(3)
+    if atual[0] > 0:
+        if grupos:
+            grupos[-1] = grupos[-1] + atual
+        else:
+            grupos.append(atual)
+    return np.array(grupos).reshape(-1, 3)
+
+def estatisticas_ajuste(padroes, pesos, a, b, c, n_parametros_item=3, bloco=BLOCO):
+    """
+    S-X² e Q3 de todos os itens, da tabela de padrões (P x J, 0/1) com o nº de
+    alunos de cada padrão em `pesos`. Retorna (DataFrame por item no layout
+    do _TRI.csv: S_X2, gl, p_SX2, Q3_max, Q3_par; matriz Q3 J x J; média Q3).
+    """
+    J = len(a)
+    grade, log_priori = grade_theta()
+    priori = np.exp(log_priori - log_priori.max())
+    priori /= priori.sum()
+    P = np.clip(prob_3pl(grade, a, -a * b, c), EPS, 1 - EPS)
+    logito_P, base = np.log(P) - np.log1p(-P), np.log1p(-P).sum(axis=0)
+
+    # Uma passada em blocos: acertos por grupo de escore e somas dos resíduos
+    n_k, o_jk = np.zeros(J + 1), np.zeros((J, J + 1))
+    s_w, s_d, s_dd = 0.0, np.zeros(J), np.zeros((J, J))
+    for ini in range(0, len(padroes), bloco):
+        xb = np.asarray(padroes[ini:ini + bloco], dtype=np.float64)
+        wb = np.asarray(pesos[ini:ini + bloco], dtype=np.float64)
+        k  = xb.sum(axis=1).astype(int)
+        grupos = (k[:, None] == np.arange(J + 1)) * wb[:, None]
+        n_k  += grupos.sum(axis=0)
+        o_jk += xb.T @ grupos
+
+        log_post = xb @ logito_P + base + log_priori
+        post = np.exp(log_post - log_post.max(axis=1, keepdims=True))
+        eap  = (post @ grade) / post.sum(axis=1)
+        d    = xb - prob_3pl(eap, a, -a * b, c).T
+        s_w += wb.sum()
+        s_d += wb @ d
+        s_dd += (d * wb[:, None]).T @ d
+
+    # S-X²: proporções esperadas por escore (k = 1..J-1) em todos os itens
+    f, f_sem = distribuicoes_escore(P)
+    esperado = np.einsum('jg,jkg,g->jk', P, f_sem, priori) / (f @ priori)[None, 1:]
+    sx2, gl = np.full(J, np.nan), np.zeros(J, dtype=int)
+    for j in range(J):
+        n_g, o_g, ne_g = _agrupar_escores(n_k[1:J], o_jk[j, 1:J], esperado[j, :J - 1]).T
+        gl[j] = len(n_g) - n_parametros_item
+        if gl[j] > 0:
+            e_g = ne_g / n_g
+            sx2[j] = np.sum((o_g - ne_g) ** 2 / (n_g * e_g * (1 - e_g)))
+    with np.errstate(invalid='ignore'):
+        p_valor = chi2.sf(sx2, np.maximum(gl, 1))
+
+    # Q3: correlação ponderada dos resíduos
+    media = s_d / s_w
+    cov   = s_dd / s_w - np.outer(media, media)
+    dp    = np.sqrt(np.clip(np.diag(cov), EPS, None))
+    q3    = cov / np.outer(dp, dp)
+    fora  = ~np.eye(J, dtype=bool)
+    q3_medio = float(q3[fora].mean())
+    desvio   = np.where(fora, np.abs(q3 - q3_medio), -np.inf)
+    par      = desvio.argmax(axis=1)
+
+    tabela = pd.DataFrame({'S_X2': sx2, 'gl': gl, 'p_SX2': p_valor,
+                           'Q3_max': q3[np.arange(J), par] - q3_medio, 'Q3_par': par},
+                          index=[f"V{j + 1}" for j in range(J)])
+    return tabela, q3, q3_medio
+
+def salvar_ajuste_itens(caminho_matriz):
+    """
+    Grava _TRI_ajuste.csv (por item: S-X², gl, p, Q3* máximo e o item do par,
+    sinalizações), _TRI_ajuste.json e _TRI_Q3.csv a partir da matriz e do
+    _TRI.csv. O item do par é o CO_ITEM (cabeçalho), ou V<k> sem ele.
+    Retorna a tabela por item.
+    """
+    cabecalho = ler_cabecalho(caminho_matriz)
+    padroes, contagens = carregar_padroes(caminho_matriz)
+    a, b, c = ler_parametros(caminho_tri(caminho_matriz))
+    with open(caminho_tri(caminho_matriz)[:-len('.csv')] + '.json', 'r', encoding='utf-8') as f:
+        info_tri = json.load(f)
+    modelo = info_tri.get('modelo', '3PL')
+
+    tabela, q3, q3_medio = estatisticas_ajuste(padroes, contagens, a, b, c,
+                                               n_parametros_item={'1PL': 1, '2PL': 2}.get(modelo, 3))
+    nomes = [str(item) for item in cabecalho.get('co_itens') or []] or list(tabela.index)
+    if len(nomes) != len(tabela):
+        nomes = list(tabela.index)
+    tabela['Q3_par']      = [nomes[k] for k in tabela['Q3_par']]
+    tabela['desajuste']   = tabela['p_SX2'] < ALFA_SX2
+    tabela['dependencia'] = tabela['Q3_max'].abs() > LIMITE_Q3
+    tabela.to_csv(caminho_ajuste_itens(caminho_matriz), index_label='')
+    pd.DataFrame(q3, index=tabela.index, columns=tabela.index).to_csv(caminho_q3(caminho_matriz),
+                                                                      index_label='')
+
+    info = {'chave': info_tri.get('chave'), 'modelo': modelo,
+            'co_prova': cabecalho.get('co_prova'), 'alfa_sx2': ALFA_SX2, 'limite_q3': LIMITE_Q3,
+            'q3_medio': q3_medio, 'n_alunos': int(contagens.sum()),
+            'desajuste': int(tabela['desajuste'].sum()), 'dependencia': int(tabela['dependencia'].sum())}
+    with open(caminho_ajuste_itens(caminho_matriz)[:-len('.csv')] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2, ensure_ascii=False)
+    return tabela
+
+def ajuste_itens_atualizado(caminho_matriz):
+    """True se o _TRI_ajuste.json existente foi calculado do _TRI.json atual (mesma chave)."""
+    caminho_json = caminho_ajuste_itens(caminho_matriz)[:-len('.csv')] + '.json'
+    caminho_tri_json = caminho_tri(caminho_matriz)[:-len('.csv')] + '.json'
+    if not os.path.exists(caminho_json) or not os.path.exists(caminho_tri_json):
+        return False
+    with open(caminho_json, 'r', encoding='utf-8') as f, open(caminho_tri_json, 'r', encoding='utf-8') as g:
+        return json.load(f).get('chave') == json.load(g).get('chave')
+
+
+# ==================== BOOTSTRAP (INTERVALOS DOS PARÂMETROS) ====================
+#
+# Cada réplica reamostra os N alunos com reposição e reajusta o 3PL partindo
+# do ajuste original (_TRI.csv). A matriz não é copiada para os workers: a
+# tabela de padrões distintos (P x J) e as contagens acumuladas são gravadas
+# uma vez como .npy e abertas por memmap em cada processo; uma réplica é só
+# um vetor de índices de alunos (N,) — o aluno i pertence ao padrão
+# searchsorted(Σ contagens, i) —, convertido no peso de cada padrão.
+# A réplica b usa a semente (semente, b): o resultado não depende do nº de
+# workers nem da ordem de conclusão.
+
+N_BOOT   = 200
+NIVEL_IC = 0.95
+
+_BASE_BOOT = {}
+
+def _iniciar_bootstrap(caminho_padroes, caminho_limites, em_pool=False):
+    """Inicializador de cada processo: abre a base compartilhada (memmap, sem cópia)."""
+    if em_pool:
+        limitar_threads_blas()
+    _BASE_BOOT['padroes'] = np.load(caminho_padroes, mmap_mode='r')
+    _BASE_BOOT['limites'] = np.load(caminho_limites, mmap_mode='r')
+
+def _ajustar_reamostra(tarefa):
+    """Ajusta uma réplica bootstrap; devolve (b, a, b_dif, c, convergiu)."""
+    b, semente, inicial, opcoes = tarefa
+    limites = _BASE_BOOT['limites']
+    n_alunos = int(limites[-1])
+    rng     = np.random.default_rng([semente, b])
+    indices = rng.integers(0, n_alunos, n_alunos)
+    pesos   = np.bincount(np.searchsorted(limites, indices, side='right'), minlength=len(limites))
+    usados  = np.flatnonzero(pesos)
+    ajuste  = ajustar_3pl(_BASE_BOOT['padroes'][usados], pesos=pesos[usados], inicial=inicial, **opcoes)
+    return b, ajuste['a'], ajuste['b'], ajuste['c'], ajuste['convergiu']
+
+def bootstrap_3pl(caminho_matriz, n_boot=N_BOOT, workers=1, semente=0, relatar=None, **opcoes):
+    """
+    Reajusta o modelo do _TRI.json (3PL, 2PL ou 1PL) em `n_boot` reamostras
+    da matriz, em `workers` processos. `relatar(concluidas, n_boot)` é chamado a cada réplica concluída.
+    Retorna {a, b, c: arrays (n_boot x J), convergiu: (n_boot,)}.
+    """
+    padroes, contagens = carregar_padroes(caminho_matriz)
+    J = padroes.shape[1]
+    inicial = ler_parametros(caminho_tri(caminho_matriz)) if os.path.exists(caminho_tri(caminho_matriz)) else None
+    caminho_json = caminho_tri(caminho_matriz)[:-len('.csv')] + '.json'
+    if os.path.exists(caminho_json) and 'modelo' not in opcoes:
+        with open(caminho_json, 'r', encoding='utf-8') as f:
+            opcoes['modelo'] = json.load(f).get('modelo', '3PL')
+    reamostras = {k: np.full((n_boot, J), np.nan) for k in ('a', 'b', 'c')}
+    convergiu  = np.zeros(n_boot, dtype=bool)
+
+    with tempfile.TemporaryDirectory(prefix='_boot_tri_') as tmp:
+        base = (os.path.join(tmp, 'padroes.npy'), os.path.join(tmp, 'limites.npy'))
+        np.save(base[0], padroes)
+        np.save(base[1], np.cumsum(contagens))
+        tarefas = [(b, semente, inicial, opcoes) for b in range(n_boot)]
+
+        def guardar(resultado, concluidas):
+            b, a_b, b_b, c_b, conv = resultado
+            reamostras['a'][b], reamostras['b'][b], reamostras['c'][b], convergiu[b] = a_b, b_b, c_b, conv
+            if relatar:
+                relatar(concluidas, n_boot)
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_bootstrap,
+                                     initargs=(*base, True)) as pool:
+                futuros = [pool.submit(_ajustar_reamostra, t) for t in tarefas]
+                for k, futuro in enumerate(as_completed(futuros), 1):
+                    guardar(futuro.result(), k)
+        else:
+            _iniciar_bootstrap(*base)
+            for k, tarefa in enumerate(tarefas, 1):
+                guardar(_ajustar_reamostra(tarefa), k)
+            _BASE_BOOT.clear()
+
+    return {**reamostras, 'convergiu': convergiu}
+
+def intervalos_bootstrap(reamostras, nivel=NIVEL_IC):
+    """Intervalos percentis (e erro-padrão bootstrap) de a, b e c, no layout do _TRI.csv."""
+    alfa = (1 - nivel) / 2 * 100
+    colunas = {}
+    for chave, nome in (('a', 'Discrimination'), ('b', 'Difficulty'), ('c', 'Guessing')):
+        inf, sup = np.nanpercentile(reamostras[chave], [alfa, 100 - alfa], axis=0)
+        colunas.update({f"{nome}_inf": inf, f"{nome}_sup": sup,
+                        f"{nome}_ep": np.nanstd(reamostras[chave], axis=0, ddof=1)})
+    J = reamostras['a'].shape[1]
+    return pd.DataFrame(colunas, index=[f"V{j + 1}" for j in range(J)])
+
+def salvar_bootstrap(caminho_matriz, reamostras, nivel=NIVEL_IC, **meta):
+    """Grava _TRI_IC.csv/_TRI_IC.json (intervalos) e _TRI_boot.npz (réplicas) ao lado do _TRI.csv."""
+    destino = caminho_ic(caminho_matriz)
+    intervalos_bootstrap(reamostras, nivel).to_csv(destino, index_label='')
+    np.savez_compressed(caminho_reamostras(caminho_matriz), a=reamostras['a'],
+                        b=reamostras['b'], c=reamostras['c'], convergiu=reamostras['convergiu'])
+    info = {**meta, 'nivel': nivel, 'n_boot': int(len(reamostras['convergiu'])),
+            'nao_convergiram': int((~reamostras['convergiu']).sum())}
+    with open(destino[:-len('.csv')] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2, ensure_ascii=False)
+    return destino
+
+
+# ==================== AMOSTRA ADAPTATIVA ====================
+#
+# Em vez de um AMOSTRA fixo, o _03 gera uma única matriz com a amostra
+# máxima e o _04 (--adaptativo) ajusta prefixos crescentes dela
+# (INICIO_ADAPT, x2, x4, ... até a matriz inteira), cada passo partindo do
+# ajuste anterior. Para assim que TODOS os itens estiverem estáveis: erros-
+# padrão de a e b ≤ tol_ep ou maior variação de a, b, c entre passos ≤
+# tol_passo. Os prefixos são aninhados; com a amostragem "reservatorio" do
+# _03 cada prefixo também é uma amostra uniforme da prova.
+# O prefixo final é gravado como <CO_PROVA>_<AMOSTRA final>_data.npy, com o
+# histórico dos passos no cabeçalho ('adaptativa'), e ajustado normalmente
+# (cache, _TRI.csv, _05). Provas fáceis param cedo; difíceis usam mais alunos.
+
+INICIO_ADAPT    = 1000
+FATOR_ADAPT     = 2
+TOL_EP_ADAPT    = 0.10   # erro-padrão máximo de a e b (por item)
+TOL_PASSO_ADAPT = 0.05   # ou variação máxima de a, b, c entre passos (por item)
+BLOCO_EP        = 10000  # alunos por bloco no cálculo dos erros-padrão (N x J x Q)
+
+def erros_padrao_3pl(matriz, pesos, a, b, c, n_quad=N_QUAD, bloco=BLOCO_EP):
+    """
+    Erros-padrão de a, b e c pelo produto cruzado dos gradientes individuais
+    (XPD): I ≈ Σ_i w_i g_i g_iᵀ, g_i = ∂ log L_i / ∂(a, d, c). O de b = -d/a
+    sai pelo método delta. Retorna (ep_a, ep_b, ep_c).
+    """
+    X = np.asarray(matriz, dtype=np.uint8)
+    w = np.ones(len(X)) if pesos is None else np.asarray(pesos, dtype=np.float64)
+    J = X.shape[1]
+    theta, pq = quadratura(n_quad)
+    d  = -a * b
+    s  = expit(np.outer(a, theta) + d[:, None])
+    P  = np.clip(c[:, None] + (1 - c[:, None]) * s, EPS, 1 - EPS)
+    dP = (1 - c[:, None]) * s * (1 - s)                    # ∂P/∂(a θ + d)
+    derivadas = (dP * theta, dP, 1 - s)                    # ∂P/∂a, ∂P/∂d, ∂P/∂c (J x Q)
+    log_r, base = np.log(P) - np.log1p(-P), np.log1p(-P).sum(axis=0) + np.log(pq)
+
+    info = np.zeros((3 * J, 3 * J))
+    for ini in range(0, len(X), bloco):
+        xb   = X[ini:ini + bloco].astype(np.float64)
+        L    = xb @ log_r + base
+        post = np.exp(L - logsumexp(L, axis=1, keepdims=True))          # N_b x Q
+        R    = (xb[:, :, None] - P[None]) / (P * (1 - P))[None]         # N_b x J x Q
+        G    = np.concatenate([np.einsum('nq,njq->nj', post, R * der[None]) for der in derivadas], axis=1)
+        info += (G * w[ini:ini + bloco, None]).T @ G
+
+    cov = np.linalg.pinv(info)
+    var = np.diag(cov)
+    var_a, var_d, var_c = var[:J], var[J:2 * J], var[2 * J:]
+    cov_ad = np.diag(cov[:J, J:2 * J])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_b = (d / a ** 2) ** 2 * var_a + var_d / a ** 2 - 2 * (d / a ** 3) * cov_ad
+    return tuple(np.sqrt(np.maximum(v, 0)) for v in (var_a, var_b, var_c))
+
+def tamanhos_adaptativos(n_alunos, inicio=INICIO_ADAPT, fator=FATOR_ADAPT):
+    """inicio, inicio·fator, ... < n_alunos, e por último n_alunos."""
+    tamanhos, n = [], max(1, int(inicio))
+    while n < n_alunos:
+        tamanhos.append(n)
+        n *= fator
+    return tamanhos + [n_alunos]
+
+def configuracao_adaptativa(inicio=INICIO_ADAPT, fator=FATOR_ADAPT, tol_ep=TOL_EP_ADAPT,
+                            tol_passo=TOL_PASSO_ADAPT):
+    return {'inicio': inicio, 'fator': fator, 'tol_ep': tol_ep, 'tol_passo': tol_passo}
+
+def buscar_adaptativa(caminho_matriz, config):
+    """Prefixo final já gerado desta matriz de origem (mesmo conteúdo e configuração), ou None."""
+    nome, sha1 = os.path.basename(caminho_matriz), hash_matriz(caminho_matriz)
+    for m in listar_matrizes(os.path.dirname(caminho_matriz)):
+        info = ler_cabecalho(m).get('adaptativa') or {}
+        if info.get('origem') == nome and info.get('origem_sha1') == sha1 and info.get('config') == config:
+            return m
+    return None
+
+def _remover_prefixos_antigos(caminho_matriz, final):
+    """Apaga prefixos finais de execuções anteriores da mesma origem (outra AMOSTRA final)."""
+    nome = os.path.basename(caminho_matriz)
+    for m in listar_matrizes(os.path.dirname(caminho_matriz)):
+        cabecalho = ler_cabecalho(m)
+        if m == final or (cabecalho.get('adaptativa') or {}).get('origem') != nome:
+            continue
+        base = base_matriz(m)
+        if m == caminho_matriz:
+            # A própria origem foi o prefixo final antes: volta a ser só origem
+            cabecalho.pop('adaptativa')
+            salvar_cabecalho(base, (cabecalho.pop('n_alunos'), cabecalho.pop('n_itens')), **cabecalho)
+            sufixos = ('_TRI.csv', '_TRI.json')
+        else:
+            sufixos = ('.npy', '.csv', '.json', '_padroes.npz', '_TRI.csv', '_TRI.json')
+        for sufixo in sufixos:
+            if os.path.exists(base + sufixo):
+                os.remove(base + sufixo)
+
+def ajustar_adaptativo(matriz, inicio=INICIO_ADAPT, fator=FATOR_ADAPT, tol_ep=TOL_EP_ADAPT,
+                       tol_passo=TOL_PASSO_ADAPT, relatar=None, **opcoes):
+    """
+    Ajusta prefixos crescentes da matriz até todos os itens estabilizarem.
+    `relatar(passo)` é chamado a cada passo.
+    Retorna (amostra final, ajuste, passos, estabilizou).
+    """
+    X = np.asarray(matriz, dtype=np.uint8)
+    passos, anterior, estabilizou = [], None, False
+    for n in tamanhos_adaptativos(len(X), inicio, fator):
+        padroes, contagens = compactar_padroes(X[:n])
+        ajuste = ajustar_3pl(padroes, pesos=contagens, inicial=anterior, **opcoes)
+        ep_a, ep_b, _ = erros_padrao_3pl(padroes, contagens, ajuste['a'], ajuste['b'], ajuste['c'],
+                                         n_quad=ajuste['n_quad'])
+        max_ep = np.fmax(ep_a, ep_b)
+        if anterior is None:
+            variacao = np.full(X.shape[1], np.inf)
+        else:
+            variacao = np.max(np.abs(np.vstack([ajuste['a'], ajuste['b'], ajuste['c']])
+                                     - np.vstack(anterior)), axis=0)
+        estaveis = (max_ep <= tol_ep) | (variacao <= tol_passo)   # NaN → instável
+        passo = {'amostra': int(n), 'iteracoes': ajuste['iteracoes'],
+                 'max_ep': float(np.nanmax(max_ep)) if np.isfinite(max_ep).any() else None,
+                 'max_variacao': float(np.max(variacao)) if anterior is not None else None,
+                 'itens_estaveis': int(estaveis.sum())}
+        passos.append(passo)
+        if relatar:
+            relatar(passo)
+        anterior = (ajuste['a'], ajuste['b'], ajuste['c'])
+        if estaveis.all():
+            estabilizou = True
+            break
+    return int(n), ajuste, passos, estabilizou
+
+def ajustar_matriz_adaptativo(caminho_matriz, usar_cache=True, inicio=INICIO_ADAPT, fator=FATOR_ADAPT,
+                              tol_ep=TOL_EP_ADAPT, tol_passo=TOL_PASSO_ADAPT, **opcoes):
+    """
+    Amostra adaptativa sobre a matriz de origem (AMOSTRA máxima do _03): grava
+    o prefixo final (<CO_PROVA>_<AMOSTRA final>_data.npy, com o histórico no
+    cabeçalho) e o seu _TRI.csv. Retorna (caminho do _TRI.csv, ajuste), com
+    `amostra_final`, `passos` e `estabilizou` no ajuste. Os passos usam o 3PL
+    (erros-padrão XPD); a seleção de modelo roda no prefixo final.
+    """
+    modelo    = opcoes.pop('modelo', MODELO_PADRAO)
+    criterio  = opcoes.pop('criterio', CRITERIO)
+    config    = configuracao_adaptativa(inicio, fator, tol_ep, tol_passo)
+    cabecalho = ler_cabecalho(caminho_matriz)
+    matriz    = carregar_matriz(caminho_matriz)
+    if matriz.shape[1] < MIN_ITENS:
+        raise ValueError("Menos de 5 itens na prova")
+    if matriz.shape[0] < MIN_ALUNOS:
+        raise ValueError("Menos de 100 respondentes")
+
+    n, ajuste, passos, estabilizou = ajustar_adaptativo(matriz, inicio, fator, tol_ep, tol_passo, **opcoes)
+    info = {'origem': os.path.basename(caminho_matriz), 'origem_sha1': hash_matriz(caminho_matriz),
+            'amostra_maxima': int(len(matriz)), 'config': config,
+            'estabilizou': estabilizou, 'passos': passos}
+
+    # O prefixo final vira uma matriz comum (mesmo cabeçalho, AMOSTRA = n)
+    pid  = cabecalho.get('co_prova') or os.path.basename(caminho_matriz).split('_')[0]
+    base = os.path.join(os.path.dirname(caminho_matriz), f"{pid}_{str(n).zfill(6)}_data")
+    meta = {k: v for k, v in cabecalho.items() if k not in ('n_alunos', 'n_itens', 'formato', 'versao')}
+    meta.update(amostra=n, n_padroes=salvar_padroes(base, matriz[:n]), adaptativa=info)
+    final = salvar_matriz(base, matriz[:n], **meta)
+
+    _remover_prefixos_antigos(caminho_matriz, final)
+
+    # 3PL pedido e convergido: o ajuste do último passo entra no cache e
+    # ajustar_matriz só grava o _TRI.csv. Nos demais casos, a seleção parte dele.
+    config_ajuste = configuracao_ajuste(modelo=modelo, criterio=criterio, **opcoes)
+    if usar_cache and modelo == '3PL' and ajuste['convergiu']:
+        ultimo = ajuste
+        ajuste = selecionar_modelo(lambda m, partida: ultimo, n, modelo, criterio)
+        gravar_cache(final, chave_ajuste(final, config_ajuste), ajuste, ler_cabecalho(final), config_ajuste)
+        tri_csv, ajuste = ajustar_matriz(final, usar_cache=True, modelo=modelo, criterio=criterio, **opcoes)
+    else:
+        tri_csv, ajuste = ajustar_matriz(final, usar_cache=usar_cache, modelo=modelo, criterio=criterio,
+                                         inicial=(ajuste['a'], ajuste['b'], ajuste['c']), **opcoes)
+    ajuste.update(amostra_final=n, passos=passos, estabilizou=estabilizou)
+    return tri_csv, ajuste
@@ -0,0 +1,271 @@
+'''
+=============================================================================
+enem_tri_r.py
+=============================================================================
+Motor R do _04 (ltm::tpm) como processo persistente.
+
+Cada TrabalhadorR é um único `Rscript --vanilla` que instala/carrega ltm,
+irtoys, data.table e jsonlite UMA vez e depois fica lendo tarefas do stdin,
+uma por linha (JSON), respondendo no stdout também uma linha JSON:
+
+  Python → R   {"id": 3, "entrada": "_temp_tri/1221_002000_data.csv"}
+  R → Python   {"id": 3, "status": "sucesso", "itens": ["V1", ...],
+                "Discrimination": [...], "Difficulty": [...], "Guessing": [...],
+                "loglik": -51234.5, "convergiu": true, "modelo": "3PL"}
+               {"id": 3, "status": "erro", "erro": "Menos de 100 respondentes"}
+
+PoolR mantém N trabalhadores aquecidos e distribui matrizes entre eles;
+o mesmo pool atende vários anos na mesma execução do _04, sem pagar de novo
+a inicialização do R. Se o tpm falhar ou não convergir, o R cai para o 2PL
+(ltm) e, por último, para o 1PL (rasch); o modelo usado volta na resposta
+(Guessing = 0 nos dois). Um R que morre ou sai do protocolo é reiniciado
+(ou descartado, se não subir de novo) em vez de voltar ao pool. Os coeficientes voltam como JSON e o _TRI.csv é
+gravado pelo Python (enem_tri.salvar_tri), no mesmo layout do motor nativo.
+=============================================================================
+'''
+
+import os
+import json
+import time
+import queue
+import shutil
+import threading
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from enem_matriz import carregar_matriz, caminho_tri, ler_cabecalho
+from enem_tri import salvar_tri, chave_ajuste, N_QUAD
+
+# Identifica os ajustes do R no _TRI.json (o _04 só reajusta se a matriz mudar)
+CONFIG_R = {'motor': 'r', 'modelo': '3PL', 'queda': ['2PL', '1PL'], 'max_guessing': 0.3, 'iter_em': 150}
+
+R_SERVIDOR = r"""
+# Função para instalar pacotes se necessário
+ensure_package <- function(pkg) {
+    if (!require(pkg, character.only = TRUE)) {
+        cat(sprintf("INSTALLING:%s\n", pkg))
+        install.packages(pkg, repos = "https://cloud.r-project.org/", quiet = FALSE)
+        if (!require(pkg, character.only = TRUE)) {
+            stop(paste("Falha ao instalar pacote:", pkg))
+        }
+    }
+}
+
+tryCatch({
+    ensure_package("ltm")
+    ensure_package("irtoys")
+    ensure_package("data.table")
+    ensure_package("jsonlite")
+}, error = function(e) {
+    cat(sprintf("FATAL_ERROR:Erro na instalacao de pacotes: %s\n", e$message))
+    quit(save="no", status=1)
+})
+
+suppressMessages({
+  library(ltm)
+  library(irtoys)
+  library(data.table)
+  library(jsonlite)
+})
+
+setDTthreads(1) # Um processo R por worker: sem threads concorrentes
+
+ajustar <- function(f) {
+    data <- fread(f, showProgress = FALSE)
+
+    if(ncol(data) < 5) stop("Menos de 5 itens na prova")
+    if(nrow(data) < 100) stop("Menos de 100 respondentes")
+
+    X <- as.matrix(data)
+    tentar <- function(expr) tryCatch(expr, error = function(e) NULL)
+
+    # TPM (3PL); sem convergência ou com erro → 2PL (ltm) → 1PL (rasch)
+    modelo <- "3PL"
+    m3PL <- tentar(tpm(X, type = "latent.trait", IRT.param = TRUE,
+                       max.guessing = 0.3,
+                       control = list(iter.em = 150)))
+    if(is.null(m3PL) || m3PL$convergence != 0) {
+        m2PL <- tentar(ltm(X ~ z1, IRT.param = TRUE))
+        if(!is.null(m2PL)) { m3PL <- m2PL; modelo <- "2PL" }
+    }
+    if(is.null(m3PL)) {
+        m3PL <- rasch(X, IRT.param = TRUE); modelo <- "1PL"
+    }
+
+    coeffs_raw <- coef(m3PL)
+    cols <- colnames(coeffs_raw)
+    if("Dscrmn" %in% cols) {
+        a <- coeffs_raw[, "Dscrmn"]; b <- coeffs_raw[, "Dffclt"]
+        c <- if("Gussng" %in% cols) coeffs_raw[, "Gussng"] else rep(0, nrow(coeffs_raw))
+    } else {
+        a <- coeffs_raw[, 3]; b <- coeffs_raw[, 2]; c <- coeffs_raw[, 1]
+    }
+    list(status = "sucesso", itens = rownames(coeffs_raw),
+         Discrimination = unname(a), Difficulty = unname(b), Guessing = unname(c),
+         loglik = as.numeric(m3PL$log.Lik), convergiu = (m3PL$convergence == 0),
+         modelo = modelo)
+}
+
+cat("PRONTO\n")
+flush(stdout())
+
+con <- file("stdin", open = "r")
+while (length(linha <- readLines(con, n = 1)) > 0) {
+    job <- fromJSON(linha)
+    resp <- tryCatch(ajustar(job$entrada),
+                     error = function(e) list(status = "erro", erro = conditionMessage(e)))
+    resp$id <- job$id
+    cat(toJSON(resp, auto_unbox = TRUE, digits = NA), "\n", sep = "")
+    flush(stdout())
+}
+"""
+
+
+class TrabalhadorR:
+    """Um processo Rscript aquecido, atendendo uma tarefa por vez."""
+
+    def __init__(self, script_path):
+        self._proc = subprocess.Popen(['Rscript', '--vanilla', script_path],
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      text=True, bufsize=1)
+        self._proximo_id = 0
+        while True:
+            linha = self._ler_linha()
+            if linha == "PRONTO":
+                break
+            if linha.startswith("INSTALLING:"):
+                print(f"📦 Instalando pacote R: {linha.split(':')[1]}")
+            elif linha.startswith("FATAL_ERROR:"):
+                raise RuntimeError(linha.split(':', 1)[1])
+            elif linha:
+                print(f"[R log] {linha}")
+
+    def _ler_linha(self):
+        linha = self._proc.stdout.readline()
+        if not linha and self._proc.poll() is not None:
+            raise RuntimeError(f"O R terminou inesperadamente (código {self._proc.returncode})")
+        return linha.strip()
+
+    def ajustar(self, entrada):
+        """Envia uma matriz CSV ao R e devolve a resposta JSON já decodificada."""
+        self._proximo_id += 1
+        self._proc.stdin.write(json.dumps({'id': self._proximo_id, 'entrada': entrada}) + "\n")
+        self._proc.stdin.flush()
+        while True:
+            linha = self._ler_linha()
+            if linha.startswith('{'):
+                return json.loads(linha)
+            if linha:
+                print(f"[R log] {linha}")
+
+    def fechar(self):
+        if self._proc.poll() is None:
+            self._proc.stdin.close()
+            self._proc.wait()
+
+    def matar(self):
+        """Encerra à força (processo morto ou protocolo dessincronizado)."""
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc.wait()
+
+
+class PoolR:
+    """N trabalhadores R persistentes; use com `with PoolR(n) as pool:`."""
+
+    def __init__(self, n_workers=1):
+        self.n_workers = max(1, n_workers)
+        self._dir  = tempfile.mkdtemp(prefix="_temp_tri_")
+        self._script = os.path.join(self._dir, "servidor_tri.R")
+        self._livres = queue.Queue()
+        self._trabalhadores = []
+        self._trava = threading.Lock()
+
+    def __enter__(self):
+        with open(self._script, 'w') as f:
+            f.write(R_SERVIDOR)
+        print(f"🔥 Iniciando {self.n_workers} processo(s) R persistente(s)...")
+        try:
+            for _ in range(self.n_workers):
+                t = TrabalhadorR(self._script)
+                self._trabalhadores.append(t)
+                self._livres.put(t)
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        for t in self._trabalhadores:
+            t.fechar()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def _substituir(self, t):
+        """
+        Troca um trabalhador que falhou (R morto ou resposta fora do protocolo)
+        por um novo; se o R não subir de novo, o pool encolhe. Devolve o novo ou None.
+        """
+        t.matar()
+        try:
+            novo = TrabalhadorR(self._script)
+        except Exception as e:
+            novo = None
+            print(f"⚠️  Processo R descartado (não reiniciou: {e})")
+        with self._trava:
+            self._trabalhadores.remove(t)
+            if novo is not None:
+                self._trabalhadores.append(novo)
+        return novo
+
+    def _ajustar_arquivo(self, f):
+        inicio = time.time()
+        resultado = {'arquivo': os.path.basename(f), 'saida': os.path.basename(caminho_tri(f))}
+
+        # Matrizes compactadas (.npy) são exportadas para CSV temporário apenas para o R
+        entrada = f
+        if f.endswith('.npy'):
+            entrada = os.path.join(self._dir, os.path.basename(f).replace('.npy', '.csv'))
+            np.savetxt(entrada, carregar_matriz(f), fmt='%d', delimiter=',')
+
+        t = self._livres.get()
+        try:
+            if t is None:
+                resp = {'status': 'erro', 'erro': "Nenhum processo R disponível"}
+            else:
+                resp = t.ajustar(entrada)
+        except Exception as e:
+            # Não devolve ao pool um R morto ou dessincronizado: ele falharia todas as tarefas seguintes
+            resp = {'status': 'erro', 'erro': str(e)}
+            t = self._substituir(t)
+        finally:
+            # None (pool vazio) volta à fila: as tarefas seguintes falham sem esperar
+            if t is not None or not self._trabalhadores:
+                self._livres.put(t)
+            if entrada != f:
+                os.remove(entrada)
+
+        if resp['status'] == 'sucesso':
+            ajuste = {'a': np.array(resp['Discrimination'], dtype=float),
+                      'b': np.array(resp['Difficulty'], dtype=float),
+                      'c': np.array(resp['Guessing'], dtype=float),
+                      'loglik': resp['loglik'], 'iteracoes': None,
+                      'convergiu': bool(resp['convergiu']), 'n_quad': N_QUAD,
+                      'modelo': resp.get('modelo', '3PL')}
+            cabecalho = ler_cabecalho(f)
+            salvar_tri(caminho_tri(f), ajuste, motor='r', n_itens=len(ajuste['a']),
+                       co_prova=cabecalho.get('co_prova'), amostragem=cabecalho.get('amostragem'),
+                       chave=chave_ajuste(f, CONFIG_R))
+            resultado.update(status='sucesso', iteracoes=None, modelo=ajuste['modelo'],
+                             convergiu=ajuste['convergiu'], loglik=ajuste['loglik'])
+        else:
+            resultado.update(status='erro', erro=resp.get('erro'))
+        resultado['segundos'] = round(time.time() - inicio, 2)
+        return resultado
+
+    def mapear(self, file_list):
+        """Ajusta as matrizes entre os trabalhadores; gera os resultados na ordem de `file_list`."""
+        with ThreadPoolExecutor(max_workers=self.n_workers) as threads:
+            yield from threads.map(self._ajustar_arquivo, file_list)